@@ -0,0 +1,186 @@
+import os
+import csv
+import time
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from candles import T, O, H, L, C, V
+from indicadores import heikin_ashi
+from historico import abrir
+from estatisticas import Estatisticas
+from estrategia import (sinais_heikin_ashi, calcula_alvo, calcula_stop, resultado_operacao,
+                        tamanho_gale, PAUSA_EMERGENCIA, PAUSA_GALE)
+
+# Taxa de corretagem por lado (taker de futuros USDT-M), descontada do lucro
+TAXA = float(os.getenv('TAXA', 0.0004))
+COLUNAS = ('open_time', 'open', 'high', 'low', 'close', 'volume')
+CAMPOS_OPERACAO = ('data', 'preco_abertura', 'preco_fechamento', 'direcao', 'quantidade',
+                   'resultado', 'roi', 'lucro_usdt', 'symbol')
+
+
+# ================= DADOS ================= #
+
+def carregar_klines(caminho):
+    # CSV no formato de klines da Binance (com ou sem cabeçalho), Parquet com as
+    # colunas de COLUNAS ou diretório do histórico local (<dir>/<symbol>/<interval>).
+    # Devolve as linhas T..V de candles.py: um array (6, n) ou, do histórico
+    # local, a lista das colunas mapeadas do disco (sem cópia)
+    if os.path.isdir(caminho):
+        return abrir(caminho).colunas()
+    if caminho.endswith('.parquet'):
+        df = pd.read_parquet(caminho)
+        df = df[list(COLUNAS)] if set(COLUNAS) <= set(df.columns) else df.iloc[:, :6]
+    else:
+        with open(caminho) as f:
+            primeira = f.readline()
+        cabecalho = 0 if any(ch.isalpha() for ch in primeira.split(',')[0]) else None
+        df = pd.read_csv(caminho, header=cabecalho, usecols=range(6))
+    df.columns = COLUNAS
+    df = df.drop_duplicates('open_time').sort_values('open_time')
+    return np.ascontiguousarray(df.to_numpy(dtype=np.float64).T)
+
+
+def preparar(dados):
+    # Pré-cálculo vetorizado do Heikin-Ashi e dos sinais para a série inteira;
+    # o sinal no índice i é o que verificar_entrada veria com o candle i fechado
+    ha_open, _, _, ha_close = heikin_ashi(dados[O], dados[H], dados[L], dados[C])
+    return sinais_heikin_ashi(ha_open, ha_close)
+
+
+# ================= SIMULAÇÃO ================= #
+
+def _primeira_saida(high, low, inicio, alvo, stop, long):
+    # Procura em blocos crescentes o primeiro candle que toca alvo ou stop.
+    # Se os dois forem tocados no mesmo candle, conta o stop (não se sabe a ordem)
+    n = len(high)
+    bloco = 64
+    while inicio < n:
+        fim = min(inicio + bloco, n)
+        if long:
+            ganho = high[inicio:fim] >= alvo
+            perda = low[inicio:fim] <= stop
+        else:
+            ganho = low[inicio:fim] <= alvo
+            perda = high[inicio:fim] >= stop
+        toque = ganho | perda
+        if toque.any():
+            k = int(toque.argmax())
+            return inicio + k, 'LOSS' if perda[k] else 'GAIN'
+        inicio = fim
+        bloco *= 2
+    return None
+
+
+def _preco_saida(tipo, saida, alvo, stop, abertura):
+    # Gap na abertura do candle executa no preço de abertura, não no alvo/stop
+    if saida == 'GAIN':
+        return max(alvo, abertura) if tipo == 'long' else min(alvo, abertura)
+    return min(stop, abertura) if tipo == 'long' else max(stop, abertura)
+
+
+def simular(dados, sinais, profit_perc, loss_perc, gale, max_gale, emergency_stop_losses,
+            taxa=TAXA, symbol=None, registros=True):
+    # Reproduz executar_ciclo sobre candles fechados: entrada na abertura do
+    # candle seguinte ao sinal, saída intra-candle no alvo/stop e a mesma
+    # máquina de gale (pausas de emergência e de limite de gales).
+    # Devolve as Estatisticas e, se registros, as operações no formato de salvar_operacao
+    tempo, abertura, high, low = dados[T], dados[O], dados[H], dados[L]
+    # O último candle não tem candle seguinte para a entrada
+    idx_sinais = np.flatnonzero(sinais[:-1])
+    est = Estatisticas()
+    operacoes = []
+    perdas = 0
+    i = 0
+    while True:
+        if perdas >= emergency_stop_losses or perdas >= max_gale:
+            pausa = PAUSA_EMERGENCIA if perdas >= emergency_stop_losses else PAUSA_GALE
+            i = int(np.searchsorted(tempo, tempo[i] + pausa * 1000))
+            perdas = 0
+
+        p = np.searchsorted(idx_sinais, i)
+        if p == len(idx_sinais):
+            break
+        j = int(idx_sinais[p])
+        entrada = j + 1
+        tipo = 'long' if sinais[j] > 0 else 'short'
+        preco_entrada = abertura[entrada]
+        alvo = calcula_alvo(preco_entrada, tipo, profit_perc)
+        stop = calcula_stop(preco_entrada, tipo, loss_perc)
+
+        achou = _primeira_saida(high, low, entrada, alvo, stop, tipo == 'long')
+        if achou is None:
+            break  # posição ainda aberta no fim dos dados
+        i, saida = achou
+
+        quantidade = tamanho_gale(perdas, gale)
+        preco_fechamento = _preco_saida(tipo, saida, alvo, stop, abertura[i])
+        _, roi, lucro_usdt = resultado_operacao(preco_entrada, preco_fechamento, tipo, quantidade)
+        lucro_usdt = round(lucro_usdt - taxa * (preco_entrada + preco_fechamento) * quantidade, 2)
+        resultado = "GAIN" if lucro_usdt >= 0 else "LOSS"
+        # O contador de gale segue o gatilho (alvo/stop), como em monitorar_posicao
+        perdas = 0 if saida == 'GAIN' else perdas + 1
+
+        est.registrar(est.ultimo_id + 1, resultado, lucro_usdt)
+        if registros:
+            data = datetime.fromtimestamp(tempo[i] / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            operacoes.append((data, float(preco_entrada), float(preco_fechamento), tipo.upper(),
+                              quantidade, resultado, roi, lucro_usdt, symbol))
+    return est, operacoes
+
+
+# ================= CLI ================= #
+
+def salvar_csv(caminho, operacoes):
+    with open(caminho, 'w', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(CAMPOS_OPERACAO)
+        escritor.writerows(operacoes)
+
+
+def salvar_db(caminho, operacoes):
+    import db
+    db.DB_FILE = caminho
+    db.init_db()
+    for op in operacoes:
+        db.salvar_operacao(*op)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest da estratégia Heikin-Ashi + gale sobre klines históricos")
+    parser.add_argument('arquivo', help="klines em CSV (formato Binance), Parquet ou diretório do histórico local")
+    parser.add_argument('--symbol', default=os.getenv('SYMBOL', 'ETHUSDT'))
+    parser.add_argument('--profit', type=float, default=float(os.getenv('PROFIT_PERC', 0.0050)))
+    parser.add_argument('--loss', type=float, default=float(os.getenv('LOSS_PERC', 0.0045)))
+    parser.add_argument('--gale', default=os.getenv('GALE', '0.006,0.012,0.024,0.048,0.096'))
+    parser.add_argument('--max-gale', type=int, default=int(os.getenv('MAX_GALE', 5)))
+    parser.add_argument('--emergency', type=int, default=int(os.getenv('EMERGENCY_STOP_LOSSES', 5)))
+    parser.add_argument('--taxa', type=float, default=TAXA)
+    parser.add_argument('--csv', help="grava as operações simuladas neste CSV")
+    parser.add_argument('--db', help="grava as operações num banco SQLite (use um arquivo separado do bot)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    dados = carregar_klines(args.arquivo)
+    carregado = time.perf_counter()
+    sinais = preparar(dados)
+    est, operacoes = simular(dados, sinais, args.profit, args.loss,
+                             [float(x) for x in args.gale.split(',')],
+                             args.max_gale, args.emergency, args.taxa, args.symbol)
+    fim = time.perf_counter()
+
+    gains, losses, profit, taxa_acerto = est.resumo()
+    print(f"[{args.symbol}] {len(dados[T])} candles | leitura {carregado - inicio:.2f}s | simulação {fim - carregado:.2f}s")
+    print(f"Operações: {gains + losses} | Gains: {gains} | Losses: {losses} | Taxa de acerto: {taxa_acerto}%")
+    print(f"Lucro: {profit} USDT | Drawdown máximo: {round(est.max_drawdown, 2)} USDT | Maior sequência de perdas: {est.maior_sequencia_perdas}")
+
+    if args.csv:
+        salvar_csv(args.csv, operacoes)
+    if args.db:
+        salvar_db(args.db, operacoes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+import tracemalloc
+
+import numpy as np
+
+# Regressão aceita em relação à base antes de falhar (fração do tempo/pico)
+LIMITE = float(os.getenv('BENCHMARK_LIMITE', 0.25))
+# Diferenças de pico de memória abaixo disso são ruído do alocador (bytes)
+MEMORIA_MINIMA = 16 * 1024
+SYMBOLS = ('ETHUSDT', 'BTCUSDT')
+
+
+# ================= DADOS SINTÉTICOS ================= #
+
+def klines_sinteticos(n, semente=42, intervalo_ms=60_000):
+    # Passeio aleatório com candles coerentes (low <= open/close <= high)
+    rng = np.random.default_rng(semente)
+    fechamento = 3000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    abertura = np.concatenate(([3000.0], fechamento[:-1]))
+    pavio = np.abs(rng.normal(0, 0.001, (2, n))) * fechamento
+    t = np.arange(n, dtype=np.float64) * intervalo_ms + 1_700_000_000_000
+    return np.column_stack((t, abertura, np.maximum(abertura, fechamento) + pavio[0],
+                            np.minimum(abertura, fechamento) - pavio[1], fechamento, rng.uniform(1, 100, n)))
+
+
+def semear_operacoes(db, linhas, semente=42):
+    # Operações fictícias direto na tabela, em lotes, e agregados recalculados
+    rng = random.Random(semente)
+    inicio = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    conn = db.conexao()
+    lote = []
+    for i in range(linhas):
+        direcao = rng.choice(('LONG', 'SHORT'))
+        abertura = 3000 * (1 + rng.uniform(-0.1, 0.1))
+        roi = rng.choice((0.5, -0.45))
+        fechamento = abertura * (1 + roi / 100 if direcao == 'LONG' else 1 - roi / 100)
+        quantidade = rng.choice((0.006, 0.012, 0.024, 0.048, 0.096))
+        lote.append((time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(inicio + i * 60)), abertura, fechamento,
+                     direcao, quantidade, 'GAIN' if roi > 0 else 'LOSS', roi,
+                     round(abertura * roi / 100 * quantidade, 2), SYMBOLS[i % len(SYMBOLS)]))
+        if len(lote) == 10_000 or i == linhas - 1:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO operacoes (data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt, symbol)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', lote)
+            lote = []
+    with conn:
+        db.atualizar_estatisticas(conn)
+
+
+# ================= AMBIENTE ================= #
+
+def carregar_bot(diretorio, linhas):
+    # bot-v1 em modo papel: a exchange simulada local faz o papel do cliente
+    # Binance (sem rede nem credenciais), com banco e log num diretório
+    # temporário. Só o módulo é carregado; o motor não é iniciado
+    os.environ.update({
+        'MODO_PAPEL': '1',
+        'SYMBOLS': ','.join(SYMBOLS),
+        'DB_FILE_PAPEL': os.path.join(diretorio, 'benchmark.db'),
+        'LOG_FILE': os.path.join(diretorio, 'log.jsonl'),
+        'METRICAS_ARQUIVO': '',
+        'GRAVACAO_ARQUIVO': '',
+    })
+    bot = importlib.import_module('bot-v1')
+    import db
+    db.init_db()
+    semear_operacoes(db, linhas)
+    return bot
+
+
+def casos(bot, candles):
+    # nome -> função sem argumentos medida a cada chamada
+    from candles import BufferCandles, obter_buffer
+    from db import buscar_operacoes
+    from web import criar_app
+
+    klines = klines_sinteticos(candles)
+    lista = klines.tolist()
+    fechamentos = klines[:, 4].tolist()
+
+    buffer = BufferCandles(bot.INTERVAL, candles)
+    buffer.semear(klines)
+    proximo = klines[-1].copy()
+
+    def atualizar_kline():
+        # Mensagem do stream com o candle em formação (fechamento alternando
+        # em volta da abertura)
+        proximo[4] = 2 * proximo[1] - proximo[4]
+        buffer.atualizar(proximo)
+
+    def verificar_entrada():
+        # Buffer do bot sempre recente: mede só o caminho sem REST
+        bot_buffer.atualizado_em = time.time()
+        return bot.verificar_entrada(SYMBOLS[0], bot.INTERVAL)
+
+    bot_buffer = obter_buffer(SYMBOLS[0], bot.INTERVAL)
+    bot_buffer.semear(klines)
+    todas = buscar_operacoes()
+
+    app = criar_app(bot)
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['autenticado'] = True
+
+    def rota(caminho):
+        def get():
+            resposta = cliente.get(caminho)
+            if resposta.status_code != 200:
+                raise RuntimeError(f"{caminho}: HTTP {resposta.status_code}")
+        return get
+
+    return {
+        'calcular_heikin_ashi': lambda: bot.calcular_heikin_ashi(lista),
+        'calcular_media_movel': lambda: bot.calcular_media_movel(fechamentos, 200),
+        'buffer_semear': lambda: buffer.semear(klines),
+        'buffer_atualizar_kline': atualizar_kline,
+        'verificar_entrada': verificar_entrada,
+        'calcular_resumo_operacoes': lambda: bot.calcular_resumo_operacoes(todas),
+        'buscar_operacoes_pagina': lambda: buscar_operacoes(limite=100),
+        'buscar_operacoes_todas': lambda: buscar_operacoes(),
+        'rota_index': rota(f'/?symbol={SYMBOLS[0]}'),
+        'rota_status_json': rota(f'/status_json?symbol={SYMBOLS[0]}'),
+    }
+
+
+# ================= MEDIÇÃO ================= #
+
+def medir(funcao, repeticoes=5, tempo=0.2):
+    # Calibra o número de chamadas por repetição para ~`tempo` segundos e
+    # devolve os tempos por chamada de cada repetição e o pico de memória
+    # alocada numa chamada isolada (tracemalloc)
+    funcao()
+    chamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        duracao = time.perf_counter() - inicio
+        if duracao >= tempo / 10 or chamadas >= 1_000_000:
+            break
+        chamadas *= 10
+    chamadas = max(1, int(chamadas * tempo / duracao))
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / chamadas)
+
+    tracemalloc.start()
+    try:
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"chamadas": chamadas, "mediana": statistics.median(tempos), "minimo": min(tempos), "pico_memoria": pico}
+
+
+def comparar(resultados, base, limite):
+    # Regressões de tempo ou de memória (pico) acima do limite. O tempo
+    # comparado é o da melhor repetição: a mediana inclui o ruído da máquina
+    # (outros processos, frequência da CPU)
+    regressoes = []
+    for nome, r in resultados.items():
+        anterior = base.get(nome)
+        if not anterior:
+            continue
+        tempo = r["minimo"] / anterior["minimo"] - 1
+        if tempo > limite:
+            regressoes.append(f"{nome}: tempo {tempo:+.0%} ({_tempo(anterior['minimo'])} -> {_tempo(r['minimo'])})")
+        memoria = r["pico_memoria"] - anterior["pico_memoria"]
+        if memoria > MEMORIA_MINIMA and memoria > anterior["pico_memoria"] * limite:
+            regressoes.append(f"{nome}: memória {_bytes(anterior['pico_memoria'])} -> {_bytes(r['pico_memoria'])}")
+    return regressoes
+
+
+def _tempo(segundos):
+    for unidade, fator in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if segundos >= fator:
+            return f"{segundos / fator:.2f} {unidade}"
+    return f"{segundos / 1e-9:.0f} ns"
+
+
+def _bytes(n):
+    return f"{n / 1024:.1f} KiB" if n < 1024 * 1024 else f"{n / 1024 / 1024:.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do caminho da estratégia, do banco e do painel")
+    parser.add_argument('--linhas', type=int, default=10_000, help="operações no banco semeado")
+    parser.add_argument('--candles', type=int, default=610, help="candles sintéticos (tamanho do buffer)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--tempo', type=float, default=0.2, help="segundos por repetição")
+    parser.add_argument('--filtro', help="só os casos cujo nome contém este texto")
+    parser.add_argument('--salvar', help="grava os resultados neste JSON (nova base)")
+    parser.add_argument('--base', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--limite', type=float, default=LIMITE, help="regressão máxima aceita (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    diretorio = tempfile.mkdtemp(prefix='benchmark-')
+    bot = None
+    try:
+        inicio = time.perf_counter()
+        bot = carregar_bot(diretorio, args.linhas)
+        selecionados = {nome: f for nome, f in casos(bot, args.candles).items()
+                        if not args.filtro or args.filtro in nome}
+        print(f"Preparação: {time.perf_counter() - inicio:.2f}s | {args.linhas} operações | {args.candles} candles")
+
+        resultados = {}
+        for nome, funcao in selecionados.items():
+            r = resultados[nome] = medir(funcao, args.repeticoes, args.tempo)
+            print(f"{nome:<28} {_tempo(r['mediana']):>11} (mín {_tempo(r['minimo'])}) | pico {_bytes(r['pico_memoria']):>10}"
+                  f" | {r['chamadas']} chamadas x {args.repeticoes}")
+    finally:
+        if bot:
+            # Conexões com o simulador fechadas antes de o diretório do log sumir
+            bot.api.fechar()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    dados = {
+        "ambiente": {"python": platform.python_version(), "numpy": np.__version__, "plataforma": platform.platform(),
+                     "linhas": args.linhas, "candles": args.candles},
+        "resultados": resultados,
+    }
+    if args.salvar:
+        with open(args.salvar, 'w') as f:
+            json.dump(dados, f, indent=2)
+        print(f"Base gravada em {args.salvar}")
+
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        ambiente = base.get("ambiente", {})
+        if (ambiente.get("linhas"), ambiente.get("candles")) != (args.linhas, args.candles):
+            print(f"Aviso: base medida com {ambiente.get('linhas')} operações e {ambiente.get('candles')} candles")
+        regressoes = comparar(resultados, base.get("resultados", {}), args.limite)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        if regressoes:
+            sys.exit(1)
+        print(f"Sem regressões acima de {args.limite:.0%} em relação a {args.base}")
+
+
+if __name__ == '__main__':
+    main()
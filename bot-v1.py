@@ -1,612 +1,340 @@
 import os
 import time
 import logging
+import tempfile
 import threading
-import pandas as pd
+import numpy as np
 import math
-import traceback
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
-from flask import Flask, render_template_string, request, redirect, url_for, session, jsonify
-from db import init_db, salvar_operacao, buscar_operacoes
+import db
+import simulador
+import gravador
+from db import init_db, salvar_operacao, buscar_operacoes, contar_operacoes, buscar_estatisticas
+from mercado import StreamMercado, WS_URL
+from motor import Motor, status_inicial
+from simbolos import CacheSimbolos, SimboloDesconhecido, decimal_places, ajustar_preco
+from cliente_async import ClienteBinanceAsync, ClienteSincrono, ErroAPIBinance, REST_URL
+from stream_usuario import StreamUsuario
+from ordens import GerenciadorOrdens
+from relogio import SincronizadorRelogio
+import config
+from config import ArmazemConfig
+from candles import obter_buffer
+from historico import obter_historico, HISTORICO_DIR
+from eventos import Publicador
+import registro
+import metricas
+from metricas import cronometro, cronometrado
+from estado import ArmazemEstado
+from indicadores import sma_ultimo, heikin_ashi
+import estrategia
+from estrategia import sinal_heikin_ashi, verificar_saida, resultado_operacao, tamanho_gale, PAUSA_EMERGENCIA, PAUSA_GALE
 from datetime import datetime
 
-from werkzeug.middleware.proxy_fix import ProxyFix
-
 # ================= CONFIGURAÇÃO ================= #
 
 
 
+# Modo papel: ordens, posições e dados de mercado servidos por uma exchange
+# simulada local (simulador.py), sem credenciais nem capital
+MODO_PAPEL = db.MODO_PAPEL
+
 # Validação de variáveis de ambiente
-API_KEY = os.getenv('BINANCE_API_KEY')
-API_SECRET = os.getenv('BINANCE_API_SECRET')
+API_KEY = os.getenv('BINANCE_API_KEY') or ('papel' if MODO_PAPEL else None)
+API_SECRET = os.getenv('BINANCE_API_SECRET') or ('papel' if MODO_PAPEL else None)
 if not API_KEY or not API_SECRET:
     raise ValueError("API_KEY ou API_SECRET não configurados no .env")
 
-# Parâmetros configuráveis via .env
-SYMBOL = os.getenv('SYMBOL', 'ETHUSDT')
-INTERVAL = os.getenv('INTERVAL', '1m')
-PROFIT_PERC = float(os.getenv('PROFIT_PERC', 0.0050))
-LOSS_PERC = float(os.getenv('LOSS_PERC', 0.0045))
-GALE = [float(x) for x in os.getenv('GALE', '0.006,0.012,0.024,0.048,0.096').split(',')]
-MAX_GALE = int(os.getenv('MAX_GALE', 5))  # Limite de iterações do gale
-EMERGENCY_STOP_LOSSES = int(os.getenv('EMERGENCY_STOP_LOSSES', 5))  # Parada de emergência após X perdas
+# Símbolos (o primeiro é o exibido por padrão no painel), timeframe e
+# parâmetros da estratégia: versões imutáveis de config.py, a primeira vinda
+# do .env e substituída pela última gravada no banco na partida do motor
+configuracao = ArmazemConfig(config.do_ambiente())
+
+# Nomes da configuração que o painel lê do módulo (os mesmos do
+# processo_motor.MotorRemoto), sempre da versão atual
+ATRIBUTOS_CONFIG = {
+    'SYMBOLS': lambda c: list(c.symbols),
+    'SYMBOL': lambda c: c.symbols[0],
+    'INTERVAL': lambda c: c.interval,
+    'PROFIT_PERC': lambda c: c.padrao.profit_perc,
+    'LOSS_PERC': lambda c: c.padrao.loss_perc,
+    'GALE': lambda c: list(c.padrao.gale),
+    'MAX_GALE': lambda c: c.padrao.max_gale,
+    'EMERGENCY_STOP_LOSSES': lambda c: c.padrao.emergency_stop_losses,
+    'SOBRESCRITAS': lambda c: {symbol: dict(ajustes) for symbol, ajustes in c.sobrescritas.items()},
+    'CONFIG_VERSAO': lambda c: c.versao,
+}
 
+def __getattr__(nome):
+    if nome in ATRIBUTOS_CONFIG:
+        return ATRIBUTOS_CONFIG[nome](configuracao.atual)
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+# Intervalo máximo entre consultas REST da posição enquanto ela é monitorada pelo stream
+INTERVALO_POSICAO = 5
+# Sem atualizações de candle por mais que isso, o buffer é semeado de novo via REST
+IDADE_MAX_CANDLES = 30
+# Tempo máximo de espera pela execução de uma ordem no user data stream
+TIMEOUT_FILL = 3
+# Alvo e stop como ordens na corretora (TAKE_PROFIT_MARKET/STOP_MARKET) em vez
+# de só pelo monitoramento local
+ORDENS_PROTECAO = os.getenv('ORDENS_PROTECAO', '1') == '1'
+
+# Intervalo mínimo entre publicações de status de um símbolo para o painel (segundos)
+INTERVALO_PUBLICACAO = 0.25
+# Sem posição, o ciclo roda a cada candle que muda (ver ao_kline); a agenda é
+# só uma garantia, mais curta enquanto o stream de mercado está fora
+INTERVALO_OCIOSO = 30
+INTERVALO_OCIOSO_SEM_STREAM = 5
+
+# Contador de perdas das versões antigas, migrado para o estado_gale do banco
 LOSS_FILE = 'loss_orders.txt'
-LOG_FILE = 'log.txt'
 
-# Lock para acesso a arquivos e status
-file_lock = threading.Lock()
+# Lock para acesso ao status
 status_lock = threading.Lock()
 
 # ================= LOGGING ================= #
 
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler = logging.FileHandler(LOG_FILE)
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(formatter)
-
-logging.getLogger().setLevel(logging.INFO)
-logging.getLogger().addHandler(file_handler)
-
-flask_logger = logging.getLogger('werkzeug')
-flask_logger.setLevel(logging.INFO)
-flask_logger.addHandler(file_handler)
+# JSON lines girado por tamanho/dia + buffer em memória para o painel (registro.py).
+# Os logs do werkzeug chegam pelo logger raiz
+registro.configurar()
 
 logging.info("Bot iniciado...")
 
-client = Client(API_KEY, API_SECRET)
-server_time = client.get_server_time()['serverTime']
-local_time = int(time.time() * 1000)
-client.timestamp_offset = server_time - local_time
-
-# ================= FLASK APP ================= #
-app = Flask(__name__)
-app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
-app.secret_key = os.getenv('FLASK_SECRET_KEY', os.urandom(24))  # Chave secreta para sessões
-
-# Template HTML com Bootstrap
-TEMPLATE = """
-<!doctype html>
-<html lang="pt-br">
-  <head>
-    <meta charset="utf-8">
-    <title>Bot Binance</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-    <style>
-      body { padding-top: 40px; }
-      pre { background-color: #f8f9fa; padding: 1em; border-radius: 5px; max-height: 400px; overflow-y: auto; }
-        .progress-container {
-            width: 80%;
-            margin: 40px auto;
-        }
-        .progress-bar.positivo {
-            background-color: #4caf50 !important; /* verde */
-        }
-
-        .progress-bar.negativo {
-        background-color: #f44336 !important; /* vermelho */
-        }
-        .progress-text {
-            position: absolute;
-            left: 50%;
-            top: 50%;
-            transform: translate(-50%, -50%);
-            color: #fff;
-            font-weight: bold;
-        }
-        .scroll-tabela {
-            max-height: 450px; /* ajuste conforme sua necessidade */
-            overflow-y: auto;
-        }
-         thead th {
-            position: sticky;
-            top: 0;
-            background-color: #0d6efd; /* cor da classe table-primary */
-            color: white;
-            z-index: 1;
-        }
-
-    </style>
-  </head>
-  <body>
-    <div class="container">
-      <h1 class="mb-4">🤖 Bistequera Bot - Binance Futures</h1>
-      {% if not session.get('autenticado') %}
-        <form method="post" action="/login">
-          <div class="mb-3">
-            <label for="password" class="form-label">Senha:</label>
-            <input type="password" class="form-control" id="password" name="password">
-          </div>
-          <button type="submit" class="btn btn-primary">Login</button>
-        </form>
-      {% else %}
-        <div class="row mb-4">
-            <!-- COLUNA ESQUERDA - INFORMAÇÕES E BOTÃO -->
-            <div class="col-md-6">
-                <div class="mb-4 d-flex justify-content-end">
-                    <button class="btn btn-outline-secondary" type="button" data-bs-toggle="collapse" data-bs-target="#configuracoes" aria-expanded="false">
-                        ⚙️ Configurações
-                    </button>
-                </div>
-                <div class="collapse" id="configuracoes">
-                    <div class="card card-body mb-4">
-                        <form action="/atualizar_config" method="post">
-                            <div class="row">
-                                <div class="mb-3">
-                                    <label for="symbols" class="form-label">Selecione até 5 Pares de Símbolos</label>
-                                    <select id="symbols" name="symbols" class="form-select" required>
-                                        <option value="BTCUSDT">BTC/USDT</option>
-                                        <option value="ETHUSDT">ETH/USDT</option>
-                                        <option value="BNBUSDT">BNB/USDT</option>
-                                        <option value="SOLUSDT">SOL/USDT</option>
-                                        <option value="ADAUSDT">ADA/USDT</option>
-                                    </select>
-                                    <div class="invalid-feedback">Você deve selecionar entre 1 e 5 pares.</div>
-                                </div>
-
-                                <div class="mb-3">
-                                    <label for="timeframe" class="form-label">Time Frame</label>
-                                    <select id="timeframe" name="timeframe" class="form-select" required>
-                                        <option value="">Selecione</option>
-                                        <option value="1m">1m</option>
-                                        <option value="5m">5m</option>
-                                        <option value="15m">15m</option>
-                                        <option value="1h">1h</option>
-                                        <option value="4h">4h</option>
-                                        <option value="1d">1d</option>
-                                    </select>
-                                    <div class="invalid-feedback">Selecione um time frame válido.</div>
-                                </div>
-
-                                <div class="mb-3">
-                                    <label for="gale" class="form-label">Gales (ex: 0.006, 0.012, 0.024, 0.048)</label>
-                                    <input type="text" id="gale" name="gale" class="form-control" value="0.006,0.012,0.024,0.048,0.096" required pattern="^(\\d+(\\.\\d+)?)(,\\d+(\\.\\d+)?)*$">
-                                    <div class="invalid-feedback">Informe os Gales no formato correto, separados por vírgula. Ex: 1.5,2,2.5</div>
-                                </div>
-                                <div class="mb-3">
-                                    <label>Max Gale</label>
-                                    <input name="max_gale" class="form-control" value="{{ max_gale }}">
-                                </div>
-                                <div class="mb-3">
-                                    <label>Emergency Stop (Losses)</label>
-                                    <input name="emergency_stop" class="form-control" value="{{ emergency_stop }}">
-                                </div>
-                            </div>
-                            <button type="submit" class="btn btn-success mt-3">Salvar Configurações</button>
-                        </form>
-                    </div>
-                </div>
-                <ul class="list-group mb-3">
-                    <li class="list-group-item"><strong>Preço Atual:</strong> <span id="preco-atual">{{ preco_atual }}</span></li>
-                    <li class="list-group-item"><strong>Preço de Entrada:</strong> <span id="posicao">{{ posicao }}</span></li>
-                    <li class="list-group-item"><strong>Quantidade:</strong> <span id="quantidade">{{ quantidade }}</span></li>
-                    <li class="list-group-item"><strong>Direção:</strong> <span id="direcao">{{ direcao }}</span></li>
-                    <li class="list-group-item"><strong>Alvo: </strong> <span id="alvo">{{ alvo }}</span> | <strong>Stop:</strong> <span id="stop">{{ stop }}</span></li>
-                    <li class="list-group-item"><strong>Sequência de Gales:</strong> <span id="gales">{{ gales }}</span></li>
-                    <li class="list-group-item"><strong>Quantidade de Losses:</strong> <span id="losses">{{ losses }}</span></li>
-                </ul>
-                <div class="col-md-12 d-flex flex-column align-items-center justify-content-center">
-                    <h5>Andamento da Posição</h5>
-                    <div class="w-100 mb-3 position-relative">
-                        <div class="progress" style="height: 30px; background-color: #f1f1f1; position: relative;">
-                            <div id="progress-bar"
-                                class="progress-bar {{ 'bg-success' if progresso_percentual >= 0 else 'bg-danger' }}"
-                                role="progressbar"
-                                style="width: {{ progresso_percentual | abs }}%;"
-                                aria-valuenow="{{ progresso_percentual }}"
-                                aria-valuemin="0"
-                                aria-valuemax="100">
-                                <span class="progress-text" style="
-                                    position: absolute;
-                                    left: 50%;
-                                    top: 50%;
-                                    transform: translate(-50%, -50%);
-                                    color: white;
-                                    font-weight: bold;
-                                    user-select: none;
-                                    pointer-events: none;">
-                                {{ progresso_percentual }}%
-                                </span>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                <form action="/forcar_fechamento" method="post" class="mb-2">
-                <button class="btn btn-danger btn-lg w-100" type="submit">🚨 Forçar Fechamento</button>
-                </form>
-                <a href="/logout" class="btn btn-secondary btn-lg w-100">Logout</a>
-            </div>
-
-            <!-- COLUNA DIREITA - GRÁFICO -->
-            <div class="card col-md-6 d-flex flex-column align-items-center justify-content-center">
-                <div class="card-header bg-primary text-white d-flex justify-content-between align-items-center">
-                    <div>
-                        <span class="me-2"><strong>Gains:</strong> <span id="gains">{{ gains }}</span></span>
-                        <span class="me-2"><strong>Losses:</strong> <span id="losses">{{ losses }}</span></span>
-                        <span><strong>Lucro Total:</strong> <span id="profit_total">{{ profit_total }}</span> USDT</span>
-                        <span><strong>Taxa de Acerto:</strong> <span id="taxa_acerto">{{ taxa_acerto }}</span>%</span>
-                    </div>
-                </div>
-                <div class="scroll-tabela">
-                    <div class="card-body">
-                        <table class="table table-sm table-bordered">
-                            <thead class="table-primary text-white">
-                                <tr>
-                                <th>Data</th>
-                                <th>Entrada</th>
-                                <th>Saída</th>
-                                <th>Lado</th>
-                                <th>Qtd</th>
-                                <th>ROI</th>
-                                <th>Resultado</th>
-                                <th>Lucro USDT</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                {% for op in operacoes %}
-                                <tr>
-                                <td>{{ op[1] }}</td>
-                                <td>{{ op[2] }}</td>
-                                <td>{{ op[3] }}</td>
-                                <td>{{ op[4] }}</td>
-                                <td>{{ op[5] }}</td>
-                                <td>{{ op[7] }}%</td>
-                                <td>{{ op[6] }}</td>
-                                <td>{{ op[8] }}</td>
-                                </tr>
-                                {% endfor %}
-                            </tbody>
-                        </table>
-                    </div>
-                </div>
-            </div>
-            
-        </div>
-      {% endif %}
-    </div>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.min.js"></script>
-    <script>
-        function atualizarBarra(porcentagem) {
-            const barra = document.getElementById('progress-bar');
-            const valor = Math.min(Math.abs(porcentagem), 100);
-            barra.style.width = valor + '%';
-            barra.classList.remove('positivo', 'negativo');
-
-            if (porcentagem >= 0) {
-                barra.classList.add('positivo');
-            } else {
-                barra.classList.add('negativo');
-            }
-
-            // Atualiza texto interno da barra
-            barra.querySelector('span.progress-text').innerText = porcentagem.toFixed(2) + '%';
-        }
-
-        function atualizarStatus() {
-            fetch('/status_json')
-            .then(res => res.json())
-            .then(data => {
-                if (!data.error) {
-                document.getElementById('preco-atual').innerText = data.preco_atual;
-                document.getElementById('posicao').innerText = data.posicao;
-                document.getElementById('quantidade').innerText = data.quantidade;
-                document.getElementById('direcao').innerText = data.direcao;
-                document.getElementById('alvo').innerText = data.alvo;
-                document.getElementById('stop').innerText = data.stop;
-                document.getElementById('losses').innerText = data.losses;
-                document.getElementById('gales').innerText = data.gales.join(', ');
-                atualizarBarra(data.progresso_percentual);
-                }
-            })
-            .catch(console.error);
-        }
-
-        document.getElementById('gains').innerText = data.gains;
-        document.getElementById('losses').innerText = data.losses;
-        document.getElementById('profit_total').innerText = data.profit_total.toFixed(2);
-        document.getElementById('taxa_acerto').innerText = data.taxa_acerto.toFixed(2);
-
-        // Atualiza a cada 3 segundos
-        setInterval(atualizarStatus, 3000);
-
-        // Atualiza ao carregar a página
-        document.addEventListener('DOMContentLoaded', () => {
-        atualizarStatus();
-        });
-
-        document.addEventListener("DOMContentLoaded", function () {
-        const configForm = document.getElementById("configForm");
-        const symbolSelect = document.getElementById("symbols");
-
-        // Limita a seleção a no máximo 5 símbolos
-        symbolSelect.addEventListener("change", function () {
-            if ([...symbolSelect.selectedOptions].length > 5) {
-            alert("Você só pode selecionar até 5 pares.");
-            [...symbolSelect.options].forEach(option => option.selected = false);
-            }
-        });
-
-        configForm.addEventListener("submit", function (e) {
-            if (!configForm.checkValidity()) {
-            e.preventDefault();
-            e.stopPropagation();
-
-    </script>
-  </body>
-</html>
-"""
-
-status_bot = {
-    "preco_atual": "---",
-    "preco": "---",
-    "posicao": "---",
-    "quantidade": "---",
-    "direcao": "---",
-    "log": "Iniciando bot...",
-    "losses": "---",
-    "gales": "---",
-    "preco_fechamento": "---",
-    "quantidade_fechamento": "---",
-    "lucro_usdt": "---"
-}
-
-@app.route('/')
-def index():
-    if not session.get('autenticado'):
-        return render_template_string(TEMPLATE)
-    try:
-        with file_lock:
-            with open(LOG_FILE, "r") as f:
-                log_content = ''.join(f.readlines()[-30:])
-    except FileNotFoundError:
-        log_content = "Sem logs disponíveis."
-
-    with status_lock:
-        contexto = dict(status_bot)
-        contexto["operacoes"] = buscar_operacoes()
-        contexto["log"] = log_content
-        contexto["losses"] = read_loss_count()
-        contexto["gales"] = GALE
-        direcao = contexto.get("direcao", "").lower()
-        preco_atual = contexto.get("preco_atual")
-        preco_entrada = contexto.get("posicao")
-
-        operacoes = buscar_operacoes()
-        total_gains, total_losses, profit_total, taxa_acerto = calcular_resumo_operacoes(operacoes)
-
-        contexto["operacoes"] = operacoes
-        contexto["gains"] = total_gains
-        contexto["losses"] = total_losses
-        contexto["profit_total"] = profit_total
-        contexto["taxa_acerto"] = taxa_acerto
-        if isinstance(preco_atual, (int, float)) and isinstance(preco_entrada, (int, float)) and preco_entrada != 0:
-            tipo = direcao
-            if tipo in ['long', 'short']:
-                alvo = calcula_alvo(preco_entrada, tipo)
-                stop = calcula_stop(preco_entrada, tipo)
-
-                if tipo == 'long' and alvo != preco_entrada and stop != preco_entrada:
-                    if preco_atual >= preco_entrada:
-                        progresso = (preco_atual - preco_entrada) / (alvo - preco_entrada)
-                    else:
-                        progresso = -((preco_entrada - preco_atual) / (preco_entrada - stop))
-
-                elif tipo == 'short' and alvo != preco_entrada and stop != preco_entrada:
-                    if preco_atual <= preco_entrada:
-                        progresso = (preco_entrada - preco_atual) / (preco_entrada - alvo)
-                    else:
-                        progresso = -((preco_atual - preco_entrada) / (stop - preco_entrada))
-                else:
-                    progresso = 0
-
-                progresso_percentual = round(progresso * 100, 2)
-                contexto["progresso_percentual"] = progresso_percentual
-            else:
-                contexto["progresso_percentual"] = 0.0
+if MODO_PAPEL:
+    # Mesmos clientes REST/websocket, apontados para o simulador, e histórico
+    # de candles descartável (o banco à parte é escolhido em db.py)
+    papel = simulador.iniciar(configuracao.atual.symbols, configuracao.atual.interval)
+    REST_URL, WS_URL = papel.rest_url, papel.ws_url
+    HISTORICO_DIR = tempfile.mkdtemp(prefix='historico-papel-')
+
+# Cliente REST assíncrono (pool keep-alive + orçamento de peso) com fachada síncrona
+api = ClienteSincrono(ClienteBinanceAsync(API_KEY, API_SECRET, REST_URL))
+
+def ajustar_relogio(offset_ms, rtt_ms):
+    api.cliente.offset_ms = offset_ms
+    api.cliente.rtt_ms = rtt_ms
+
+# Offset do relógio da Binance usado nas assinaturas: estimado na partida e
+# mantido por uma thread (relogio.py), que também ressincroniza na hora
+# quando uma requisição é rejeitada por timestamp (-1021)
+relogio = SincronizadorRelogio(api.server_time)
+relogio.ao_atualizar.append(ajustar_relogio)
+relogio.sincronizar()
+api.cliente.ao_erro_timestamp.append(relogio.forcar)
+
+# Filtros dos símbolos (step size, tick size, min notional) do exchange info de futuros
+simbolos = CacheSimbolos(api.exchange_info)
+
+# Erros de precisão/notional: o exchange info pode ter mudado
+ERROS_FILTRO = (-1111, -1013, -4003, -4164)
+
+# Posições e execuções em tempo real (substitui o polling de futures_position_information)
+usuario = StreamUsuario(api, WS_URL)
+
+# Take-profit e stop do lado da corretora, com cancelamento OCO pelo stream
+ordens = GerenciadorOrdens(api, usuario, simbolos)
+ordens.ao_saida.append(lambda symbol, resultado, ordem: ao_protecao_executada(symbol, resultado, ordem))
+
+# Stream de preços e candles (substitui o polling de ticker)
+stream = StreamMercado(list(configuracao.atual.symbols), configuracao.atual.interval, WS_URL)
+stream.ao_kline.append(lambda symbol, kline, fechado: ao_kline(symbol, kline, fechado))
+stream.ao_tick.append(lambda symbol, preco: ao_tick(symbol, preco))
+
+# Status empurrado para os painéis abertos (SSE)
+publicador = Publicador()
+ultima_publicacao = {}
+# OHLC do último candle recebido de cada símbolo (ver ao_kline)
+ultimo_ohlc = {}
+# Status em memória compartilhada, preenchido por processo_motor quando o motor
+# roda num processo separado dos workers web
+canal = None
+
+# Perdas consecutivas e pausas de cada símbolo (em memória, gravadas no SQLite)
+estado_gale = ArmazemEstado()
+
+# Diário binário de ticks, klines e decisões (GRAVACAO_ARQUIVO), aberto na
+# partida do motor; reproduzido com `python gravador.py <arquivo>`
+gravacao = None
+
+# ================= PAINEL ================= #
+
+def status_de(symbol):
+    estado = motor.estados.get(symbol)
+    return estado.status if estado else status_inicial()
+
+def config_de(symbol):
+    # Versão da configuração em vigor para o símbolo: a adotada pelo motor
+    # (fixa enquanto há posição) ou, antes do primeiro ciclo, a atual
+    estado = motor.estados.get(symbol)
+    return estado.config if estado and estado.config else configuracao.atual
+
+def parametros(symbol):
+    return config_de(symbol).de(symbol)
+
+def calcular_progresso(preco_atual, preco_entrada, tipo, symbol):
+    # Andamento da posição: % do caminho até o alvo (positivo) ou até o stop (negativo)
+    if not isinstance(preco_atual, (int, float)) or not isinstance(preco_entrada, (int, float)) or preco_entrada == 0:
+        return 0.0
+    if tipo not in ['long', 'short']:
+        return 0.0
+    alvo = calcula_alvo(preco_entrada, tipo, symbol)
+    stop = calcula_stop(preco_entrada, tipo, symbol)
+    if alvo == preco_entrada or stop == preco_entrada:
+        return 0.0
+    if tipo == 'long':
+        if preco_atual >= preco_entrada:
+            progresso = (preco_atual - preco_entrada) / (alvo - preco_entrada)
         else:
-            contexto["progresso_percentual"] = 0.0
-
-        if isinstance(preco_entrada, (int, float)) and direcao in ['long', 'short']:
-            contexto["alvo"] = round(calcula_alvo(preco_entrada, direcao), 4)
-            contexto["stop"] = round(calcula_stop(preco_entrada, direcao), 4)
+            progresso = -((preco_entrada - preco_atual) / (preco_entrada - stop))
+    else:
+        if preco_atual <= preco_entrada:
+            progresso = (preco_entrada - preco_atual) / (preco_entrada - alvo)
         else:
-            contexto["alvo"] = "---"
-            contexto["stop"] = "---"
-
-    contexto.update({
-        "symbol": SYMBOL,
-        "interval": INTERVAL,
-        "profit_perc": PROFIT_PERC,
-        "loss_perc": LOSS_PERC,
-        "gale": ','.join(map(str, GALE)),
-        "max_gale": MAX_GALE,
-        "emergency_stop": EMERGENCY_STOP_LOSSES
-    })
-
-    return render_template_string(TEMPLATE, **contexto)
-
-@app.route('/login', methods=['POST'])
-def login():
-    password = request.form.get('password')
-    if password == os.getenv('BOT_PASSWORD', 'admin123'):  # Senha configurável via .env
-        session['autenticado'] = True
-        return redirect(url_for('index'))
-    return "Senha incorreta", 401
-
-@app.route('/logout')
-def logout():
-    session.pop('autenticado', None)
-    return redirect(url_for('index'))
-
-@app.route('/forcar_fechamento', methods=['POST'])
-def forcar_fechamento():
-    try:
-        # Obter dados da posição atual com segurança
-        with status_lock:
-            qtd = status_bot.get("quantidade", 0)
-            tipo = status_bot.get("direcao", "").lower()
-            preco_entrada = status_bot.get("preco_entrada")
-
-        if qtd <= 0 or tipo not in ['long', 'short'] or not preco_entrada:
-            logging.warning("❌ Dados insuficientes para forçar fechamento")
-            return redirect('/')
-        
-        # Envia ordem de fechamento
-        fechar_posicao(qtd, tipo)
-
-        return redirect('/')
-
-    except Exception as e:
-        logging.error("❌ Erro ao forçar fechamento:")
-        logging.error(traceback.format_exc())
-        return "Erro ao forçar fechamento", 500
-    
-
-@app.route('/atualizar_config', methods=['POST'])
-def atualizar_config():
-    global SYMBOL, INTERVAL, PROFIT_PERC, LOSS_PERC, GALE, MAX_GALE, EMERGENCY_STOP_LOSSES
-
-    try:
-        SYMBOL = request.form.get('symbol', SYMBOL)
-        INTERVAL = request.form.get('interval', INTERVAL)
-        PROFIT_PERC = float(request.form.get('profit_perc', PROFIT_PERC))
-        LOSS_PERC = float(request.form.get('loss_perc', LOSS_PERC))
-        GALE = [float(x) for x in request.form.get('gale', ','.join(map(str, GALE))).split(',')]
-        MAX_GALE = int(request.form.get('max_gale', MAX_GALE))
-        EMERGENCY_STOP_LOSSES = int(request.form.get('emergency_stop', EMERGENCY_STOP_LOSSES))
-
-        logging.info(f"🔧 Parâmetros atualizados via interface")
-        return redirect(url_for('index'))
-    except Exception as e:
-        logging.error(f"Erro ao atualizar configs: {e}")
-        return "Erro ao atualizar configurações", 500
-
-@app.route('/status_json')
-def status_json():
-    if not session.get('autenticado'):
-        return jsonify({"error": "Não autorizado"}), 401
+            progresso = -((preco_atual - preco_entrada) / (stop - preco_entrada))
+    return round(progresso * 100, 2)
 
+def montar_status(symbol):
+    losses = estado_gale.perdas(symbol)
     with status_lock:
+        status_bot = status_de(symbol)
+        preco_atual = status_bot.get("preco_atual", "---")
         preco_entrada = status_bot.get("posicao", "---")
-        direcao = status_bot.get("direcao", "---").lower()
-        if preco_entrada != "---" and direcao in ['long', 'short']:
-            alvo = round(calcula_alvo(preco_entrada, direcao), 4)
-            stop = round(calcula_stop(preco_entrada, direcao), 4)
-        else:
-            alvo = "---"
-            stop = "---"
-
-        # Cálculo do progresso (igual à lógica que você já tem)
-        preco_atual = status_bot.get("preco_atual", 0)
-        progresso_percentual = 0.0
-        if isinstance(preco_atual, (int, float)) and isinstance(preco_entrada, (int, float)) and preco_entrada != "---":
-            tipo = direcao
-            if tipo in ['long', 'short']:
-                if tipo == 'long' and alvo != preco_entrada and stop != preco_entrada:
-                    if preco_atual >= preco_entrada:
-                        progresso = (preco_atual - preco_entrada) / (alvo - preco_entrada)
-                    else:
-                        progresso = -((preco_entrada - preco_atual) / (preco_entrada - stop))
-                elif tipo == 'short' and alvo != preco_entrada and stop != preco_entrada:
-                    if preco_atual <= preco_entrada:
-                        progresso = (preco_entrada - preco_atual) / (preco_entrada - alvo)
-                    else:
-                        progresso = -((preco_atual - preco_entrada) / (stop - preco_entrada))
-                else:
-                    progresso = 0
-                progresso_percentual = round(progresso * 100, 2)
-
-        operacoes = buscar_operacoes()
-        gains, losses, profit_total, taxa_acerto = calcular_resumo_operacoes(operacoes)
-
-        data = {
-            "preco_atual": preco_atual,
-            "posicao": preco_entrada,
-            "quantidade": status_bot.get("quantidade", "---"),
-            "direcao": status_bot.get("direcao", "---"),
-            "alvo": alvo,
-            "stop": stop,
-            "progresso_percentual": progresso_percentual,
-            "losses": read_loss_count(),
-            "gales": GALE,
-            "gains": gains,
-            "profit_total": profit_total,
-            "taxa_acerto": taxa_acerto
-        }
-
-    return jsonify(data)
-
-@app.route('/logs')
-def logs():
-    if not session.get('autenticado'):
-        return "Acesso não autorizado", 401
-    try:
-        with file_lock:
-            with open(LOG_FILE, "r") as f:
-                log_content = ''.join(f.readlines()[-50:])
-    except FileNotFoundError:
-        log_content = "Sem logs disponíveis."
-    return log_content
-
-# ================= FUNÇÕES AUXILIARES ================= #
+        quantidade = status_bot.get("quantidade", "---")
+        direcao = status_bot.get("direcao", "---")
 
-def init_loss_file():
-    with file_lock:
-        if not os.path.exists(LOSS_FILE):
-            with open(LOSS_FILE, 'w') as f:
-                f.write("0\n")
-
-def read_loss_count():
-    try:
-        with file_lock:
-            with open(LOSS_FILE, 'r') as f:
-                return sum(float(line.strip()) for line in f if line.strip().replace('.', '', 1).isdigit())
-    except:
-        return 0
+    tipo = direcao.lower()
+    if isinstance(preco_entrada, (int, float)) and tipo in ['long', 'short']:
+        alvo = round(calcula_alvo(preco_entrada, tipo, symbol), 4)
+        stop = round(calcula_stop(preco_entrada, tipo, symbol), 4)
+    else:
+        alvo = "---"
+        stop = "---"
+
+    return {
+        "symbol": symbol,
+        "preco_atual": preco_atual,
+        "posicao": preco_entrada,
+        "quantidade": quantidade,
+        "direcao": direcao,
+        "alvo": alvo,
+        "stop": stop,
+        "progresso_percentual": calcular_progresso(preco_atual, preco_entrada, tipo, symbol),
+        "losses": losses,
+        "gales": list(parametros(symbol).gale)
+    }
+
+def resumo_estatisticas():
+    estatisticas = buscar_estatisticas()
+    gains, losses, profit_total, taxa_acerto = estatisticas.resumo()
+    return {
+        "gains": gains,
+        "total_losses": losses,
+        "profit_total": profit_total,
+        "taxa_acerto": taxa_acerto,
+        "perdas_consecutivas": estatisticas.sequencia_perdas,
+        "max_drawdown": round(estatisticas.max_drawdown, 2)
+    }
+
+def publicar_status(symbol):
+    ultima_publicacao[symbol] = time.time()
+    status = montar_status(symbol)
+    publicador.publicar(symbol, status)
+    if canal:
+        canal.escrever_status(symbol, status)
+
+def publicar_estatisticas():
+    resumo = resumo_estatisticas()
+    for symbol in configuracao.atual.symbols:
+        publicador.publicar(symbol, resumo)
+    if canal:
+        canal.escrever_estatisticas(resumo)
+
+def publicar_config():
+    if canal:
+        cfg = configuracao.atual
+        p = cfg.padrao
+        canal.escrever_config(cfg.symbols, cfg.interval, p.profit_perc, p.loss_perc, p.gale, p.max_gale,
+                              p.emergency_stop_losses, cfg.versao, ATRIBUTOS_CONFIG['SOBRESCRITAS'](cfg))
+
+def forcar_fechamento(symbol):
+    # Fechamento pedido pelo painel; False se não houver posição conhecida
+    with status_lock:
+        status = status_de(symbol)
+        qtd = status.get("quantidade", 0)
+        tipo = status.get("direcao", "").lower()
+        preco_entrada = status.get("posicao")
+
+    if not isinstance(qtd, (int, float)) or qtd <= 0 or tipo not in ['long', 'short'] or not isinstance(preco_entrada, (int, float)):
+        logging.warning(f"❌ [{symbol}] Dados insuficientes para forçar fechamento")
+        return False
+
+    # Envia ordem de fechamento
+    fechar_posicao(symbol, qtd, tipo)
+    return True
+
+def atualizar_config(simbolos, interval, profit_perc, loss_perc, gale, max_gale, emergency_stop_losses, sobrescritas=None):
+    # Publica uma versão nova (validada e gravada); cada símbolo passa a usá-la
+    # no primeiro ciclo sem posição aberta (ver ciclo_estrategia)
+    atual = configuracao.atual
+    if sobrescritas is None:
+        sobrescritas = ATRIBUTOS_CONFIG['SOBRESCRITAS'](atual)
+    nova = configuracao.publicar(config.montar(simbolos or atual.symbols, interval, profit_perc, loss_perc, gale,
+                                               max_gale, emergency_stop_losses, sobrescritas))
+    aplicar_config(nova)
+
+    logging.info(f"🔧 Parâmetros atualizados via interface (v{nova.versao})")
+
+def aplicar_config(cfg):
+    for symbol in cfg.symbols:
+        preparar_estado(symbol)
+    motor.sincronizar(cfg.symbols)
+    assinar_streams()
+    publicar_config()
+    for symbol in cfg.symbols:
+        publicar_status(symbol)
+    publicar_estatisticas()
+
+def intervalo_streams(cfg):
+    # O intervalo novo só entra quando nenhuma posição aberta segue uma versão
+    # da configuração com outro intervalo (ver adotar_config)
+    for estado in list(motor.estados.values()):
+        if estado.posicao and estado.config and estado.config.interval != cfg.interval:
+            return estado.config.interval
+    return cfg.interval
+
+def assinar_streams():
+    # Símbolos configurados e os removidos que ainda têm posição sendo monitorada
+    cfg = configuracao.atual
+    removidos = [s for s, estado in list(motor.estados.items()) if s not in cfg.symbols and estado.posicao]
+    interval = intervalo_streams(cfg)
+    if interval != cfg.interval:
+        logging.info(f"Streams mantidos em {interval} até o fim das posições abertas (configuração em {cfg.interval})")
+    stream.atualizar(list(cfg.symbols) + removidos, interval)
 
-def write_loss():
-    with file_lock:
-        with open(LOSS_FILE, 'a') as f:
-            f.write("1\n")
+# ================= FUNÇÕES AUXILIARES ================= #
 
-def clear_loss():
-    with file_lock:
-        with open(LOSS_FILE, 'w') as f:
-            f.write("")
+def preparar_estado(symbol):
+    # Migra o contador dos arquivos loss_orders (inclusive o da versão com um único símbolo)
+    legados = [f"loss_orders_{symbol}.txt"] + ([LOSS_FILE] if symbol == configuracao.atual.symbols[0] else [])
+    estado_gale.preparar(symbol, legados)
 
 def log_result(result):
-    with file_lock:
-        with open(LOG_FILE, 'a') as f:
-            f.write(f"{result}\n")
+    logging.getLogger('resultado').info(result)
 
 def calcular_media_movel(data, period):
-    return pd.Series(data).rolling(window=period).mean().iloc[-1]
+    return sma_ultimo(data, period)
 
 def calcular_heikin_ashi(klines):
-    ha_open = [float(k[1]) for k in klines]
-    ha_high = [float(k[2]) for k in klines]
-    ha_low = [float(k[3]) for k in klines]
-    ha_close = [float(k[4]) for k in klines]
-
-    for i in range(1, len(klines)):
-        ha_close[i] = (ha_open[i] + ha_high[i] + ha_low[i] + ha_close[i]) / 4
-        ha_open[i] = (ha_open[i - 1] + ha_close[i - 1]) / 2 if i > 1 else (klines[0][1] + klines[0][4]) / 2
-        ha_high[i] = max(ha_high[i], ha_open[i], ha_close[i])
-        ha_low[i] = min(ha_low[i], ha_open[i], ha_close[i])
-
+    k = np.asarray(klines, dtype=np.float64)
+    ha_open, _, _, ha_close = heikin_ashi(k[:, 1], k[:, 2], k[:, 3], k[:, 4])
     return ha_open, ha_close
 
 
-def calcula_alvo(preco_entrada, tipo):
-    lucro = preco_entrada * PROFIT_PERC
-    return preco_entrada + lucro if tipo == 'long' else preco_entrada - lucro
+def calcula_alvo(preco_entrada, tipo, symbol):
+    return estrategia.calcula_alvo(preco_entrada, tipo, parametros(symbol).profit_perc)
 
-def calcula_stop(preco_entrada, tipo):
-    perda = preco_entrada * LOSS_PERC
-    return preco_entrada - perda if tipo == 'long' else preco_entrada + perda
+def calcula_stop(preco_entrada, tipo, symbol):
+    return estrategia.calcula_stop(preco_entrada, tipo, parametros(symbol).loss_perc)
 
 def calcular_resultado(preco_entrada, preco_saida, direcao, quantidade):
     if direcao == 'long':
@@ -624,11 +352,15 @@ def calcular_resumo_operacoes(operacoes):
 
     return total_gains, total_losses, round(profit_total, 2), taxa_acerto
 
-def obter_preco_atual():
+def obter_preco_atual(symbol):
+    preco = stream.preco(symbol)
+    if preco is not None:
+        return preco
+    # Fallback para REST enquanto o stream não tem preço recente
     try:
-        return float(client.futures_symbol_ticker(symbol=SYMBOL)['price'])
+        return api.preco(symbol)
     except Exception as e:
-        logging.error(f"Erro ao obter preço atual: {e}")
+        logging.error(f"[{symbol}] Erro ao obter preço atual: {e}")
         return 0.0
 
 def contar_perdas_consecutivas(operacoes):
@@ -640,13 +372,6 @@ def contar_perdas_consecutivas(operacoes):
             break
     return perdas_consecutivas
 
-def decimal_places(num):
-    s = f'{num:.8f}'.rstrip('0')
-    if '.' in s:
-        return len(s.split('.')[1])
-    else:
-        return 0
-
 def ajustar_quantidade(qtd, step):
     casas = decimal_places(step)
     qtd_arredondada = math.floor(qtd / step) * step
@@ -654,55 +379,103 @@ def ajustar_quantidade(qtd, step):
         qtd_arredondada = step
     return round(qtd_arredondada, casas)
 
-def abrir_posicao(tipo, tamanho):
+@cronometrado('abrir_posicao')
+def abrir_posicao(symbol, tipo, tamanho):
     try:
-        symbol_info = client.get_symbol_info(SYMBOL)
-        step_size = 0.0
-        for filtro in symbol_info['filters']:
-            if filtro['filterType'] == 'LOT_SIZE':
-                step_size = float(filtro['stepSize'])
-                break
-
-        tamanho = ajustar_quantidade(tamanho, step_size)
+        filtros = simbolos.obter(symbol)
+        tamanho = ajustar_quantidade(tamanho, filtros["step_size"])
+
+        preco = stream.preco(symbol)
+        if preco and filtros["min_notional"] and tamanho * preco < filtros["min_notional"]:
+            logging.warning(f"[{symbol}] Ordem abaixo do notional mínimo ({tamanho} x {preco} < {filtros['min_notional']})")
+            return None
+
         lado = 'BUY' if tipo == 'long' else 'SELL'
-        print(f"Enviando ordem: lado={lado}, quantidade={tamanho}")
+        print(f"[{symbol}] Enviando ordem: lado={lado}, quantidade={tamanho}")
         
-        order = client.futures_create_order(
-            symbol=SYMBOL,
+        order = api.criar_ordem(
+            symbol=symbol,
             side=lado,
             type='MARKET',
             quantity=tamanho
         )
         
-        print(f"Ordem executada: {order}")
+        print(f"[{symbol}] Ordem executada: {order}")
+        sincronizar_posicao(symbol, aberta=True)
+        preco_entrada = preco_execucao(symbol, order)
+        # Status já com a entrada: uma proteção pode ser executada antes do
+        # próximo monitoramento e o registro do fechamento depende dele
+        with status_lock:
+            status_de(symbol).update({"posicao": preco_entrada, "quantidade": tamanho, "direcao": tipo.upper()})
+        if ORDENS_PROTECAO:
+            ordens.proteger(symbol, tipo, calcula_alvo(preco_entrada, tipo, symbol), calcula_stop(preco_entrada, tipo, symbol))
         return order
-    except BinanceAPIException as e:
-        print(f"Erro ao abrir posição: {e}")
+    except ErroAPIBinance as e:
+        if e.code in ERROS_FILTRO:
+            simbolos.invalidar()
+        print(f"[{symbol}] Erro ao abrir posição: {e}")
+        return None
+    except SimboloDesconhecido as e:
+        print(f"[{symbol}] Erro ao abrir posição: {e}")
         return None
     
-def fechar_posicao(qtd, tipo):
+@cronometrado('fechar_posicao')
+def fechar_posicao(symbol, qtd, tipo):
     try:
+        # Proteções canceladas antes; se uma já tiver sido executada, o
+        # reduceOnly abaixo é rejeitado e o fechamento é registrado por ela
+        ordens.cancelar(symbol)
         lado = 'SELL' if tipo == 'long' else 'BUY'
-        client.futures_create_order(symbol=SYMBOL, side=lado, type='MARKET', quantity=abs(qtd))
-        preco_fechamento = float(client.futures_symbol_ticker(symbol=SYMBOL)['price'])
-
-        with status_lock:
-            preco_abertura = status_bot.get("posicao", 0)
-            quantidade = status_bot.get("quantidade", 0)
-            direcao = status_bot.get("direcao", "---")
+        # reduceOnly impede que um fechamento repetido abra posição no sentido oposto
+        ordem = api.criar_ordem(symbol=symbol, side=lado, type='MARKET', quantity=abs(qtd), reduceOnly=True)
+        preco_fechamento = preco_execucao(symbol, ordem)
+        sincronizar_posicao(symbol, aberta=False)
+        registrar_fechamento(symbol, qtd, tipo, preco_fechamento)
+        return True
+    except ErroAPIBinance as e:
+        logging.error(f"[{symbol}] Erro ao fechar posição: {e}")
+        return False
+
+def ao_protecao_executada(symbol, resultado, ordem):
+    # Take-profit ou stop executado na corretora (thread do GerenciadorOrdens)
+    with status_lock:
+        status = status_de(symbol)
+        qtd = status.get("quantidade", 0)
+        tipo = str(status.get("direcao", "---")).lower()
+        preco_entrada = status.get("posicao")
+    preco_fechamento = ordem["preco_medio"] or obter_preco_atual(symbol)
+    if gravacao and tipo in ('long', 'short') and isinstance(preco_entrada, (int, float)):
+        # A posição vai antes: a proteção pode executar antes do primeiro monitoramento
+        cfg = config_de(symbol)
+        p = cfg.de(symbol)
+        gravacao.posicao(symbol, cfg.interval, tipo, preco_entrada, p.profit_perc, p.loss_perc)
+        gravacao.execucao(symbol, cfg.interval, tipo, preco_fechamento, calcula_alvo(preco_entrada, tipo, symbol),
+                          calcula_stop(preco_entrada, tipo, symbol), resultado)
+    sincronizar_posicao(symbol, aberta=False)
+    registrar_fechamento(symbol, qtd, tipo, preco_fechamento)
+    if resultado == 'GAIN':
+        estado_gale.registrar_ganho(symbol)
+    else:
+        estado_gale.registrar_perda(symbol)
+    log_result(f"{symbol} {resultado}")
+    motor.acordar(symbol)
 
-        # Calcular ROI considerando tipo LONG ou SHORT
-        if direcao.lower() == "long":
-            roi = round(((preco_fechamento - preco_abertura) / preco_abertura) * 100, 2)
-        else:  # short
-            roi = round(((preco_abertura - preco_fechamento) / preco_abertura) * 100, 2)
+def registrar_fechamento(symbol, qtd, tipo, preco_fechamento):
+    estado = motor.estados.get(symbol)
+    if estado:
+        estado.posicao = None
 
-        # Calcular lucro em USDT
-        lucro_usdt = round((preco_fechamento - preco_abertura) * quantidade, 2) if direcao.lower() == 'long' else round((preco_abertura - preco_fechamento) * quantidade, 2)
+    with status_lock:
+        status_bot = status_de(symbol)
+        preco_abertura = status_bot.get("posicao", 0)
+        quantidade = status_bot.get("quantidade", 0)
+        direcao = status_bot.get("direcao", "---")
 
-        resultado = "GAIN" if lucro_usdt >= 0 else "LOSS"
+    # ROI e lucro em USDT considerando tipo LONG ou SHORT
+    resultado, roi, lucro_usdt = resultado_operacao(preco_abertura, preco_fechamento, direcao, quantidade)
 
-        # Salvar no banco de dados com 8 parâmetros
+    # Salvar no banco de dados com 8 parâmetros
+    with cronometro('db'):
         salvar_operacao(
             datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             preco_abertura,
@@ -711,131 +484,360 @@ def fechar_posicao(qtd, tipo):
             quantidade,
             resultado,
             roi,
-            lucro_usdt
+            lucro_usdt,
+            symbol
         )
 
-        logging.info(f"Fechamento de posição {tipo.upper()} | Quantidade: {qtd} | ROI: {roi:.2f}% | Lucro: {lucro_usdt} USDT")
-        print(f"Fechamento de posição {tipo.upper()} | Quantidade: {qtd} | ROI: {roi:.2f}% | Lucro: {lucro_usdt} USDT")
-        # Resetar status_bot corretamente
-        with status_lock:
-            status_bot["direcao"] = "---"
-            status_bot["posicao"] = "---"
-            status_bot["quantidade"] = 0
-            status_bot["preco_saida"] = preco_fechamento
-            status_bot["preco_atual"] = obter_preco_atual()  # atualiza preço atual
-            status_bot["lucro_usdt"] = lucro_usdt
-            
-
-    except BinanceAPIException as e:
-        logging.error(f"Erro ao fechar posição: {e}")
-
-def obter_posicao():
+    logging.info(f"[{symbol}] Fechamento de posição {tipo.upper()} | Quantidade: {qtd} | ROI: {roi:.2f}% | Lucro: {lucro_usdt} USDT")
+    print(f"[{symbol}] Fechamento de posição {tipo.upper()} | Quantidade: {qtd} | ROI: {roi:.2f}% | Lucro: {lucro_usdt} USDT")
+    # Resetar status_bot corretamente
+    with status_lock:
+        status_bot["direcao"] = "---"
+        status_bot["posicao"] = "---"
+        status_bot["quantidade"] = 0
+        status_bot["preco_saida"] = preco_fechamento
+        status_bot["preco_atual"] = obter_preco_atual(symbol)  # atualiza preço atual
+        status_bot["lucro_usdt"] = lucro_usdt
+    publicar_estatisticas()
+    publicar_status(symbol)
+
+def preco_execucao(symbol, ordem):
+    # Preço médio real da execução, vindo do user data stream
+    if usuario.sincronizado:
+        registro = usuario.aguardar_ordem(ordem['orderId'], TIMEOUT_FILL)
+        if registro and registro["preco_medio"] > 0:
+            return registro["preco_medio"]
+    if float(ordem.get('avgPrice') or 0) > 0:
+        return float(ordem['avgPrice'])
+    logging.warning(f"[{symbol}] Execução da ordem {ordem.get('orderId')} não confirmada, usando preço atual")
+    return obter_preco_atual(symbol)
+
+def sincronizar_posicao(symbol, aberta):
+    # Garante que o livro de posições reflita a ordem antes do próximo ciclo,
+    # senão o ciclo seguinte poderia abrir (ou fechar) a posição de novo
+    if not usuario.sincronizado or usuario.aguardar_posicao(symbol, aberta, TIMEOUT_FILL):
+        return
+    logging.warning(f"[{symbol}] Posição não confirmada pelo stream, consultando via REST")
+    for pos in api.posicoes(symbol):
+        usuario.corrigir_posicao(pos)
+
+def obter_posicao(symbol):
+    preco_agora = stream.preco(symbol)
+    if usuario.sincronizado:
+        if preco_agora is not None:
+            with status_lock:
+                status_de(symbol)["preco_atual"] = preco_agora
+        return usuario.posicao(symbol)
+    # Sem user data stream: consulta via REST
     try:
-        preco_agora =  float(client.futures_symbol_ticker(symbol=SYMBOL)['price'])
+        if preco_agora is None:
+            # Sem preço no stream: ticker e posição em paralelo
+            preco_agora, posicoes = api.preco_e_posicoes(symbol)
+        else:
+            posicoes = api.posicoes(symbol)
         with status_lock:
-            status_bot["preco_atual"] = preco_agora            
-    except BinanceAPIException as er:
-        logging.error(f"Erro ao atualizar preco atual: {e}")
-    try:
-        for pos in client.futures_position_information(symbol=SYMBOL):
+            status_de(symbol)["preco_atual"] = preco_agora
+        for pos in posicoes:
             if float(pos['positionAmt']) != 0:               
                 return pos
         return None
-    except BinanceAPIException as e:
-        logging.error(f"Erro ao obter posição: {e}")
+    except ErroAPIBinance as e:
+        logging.error(f"[{symbol}] Erro ao obter posição: {e}")
         return None
 
-def monitorar_posicao(posicao):
+def reconciliar_protecoes(symbol):
+    # Na partida: alinha as ordens de proteção da corretora com a posição atual
+    try:
+        posicao = obter_posicao(symbol)
+        if not posicao:
+            ordens.reconciliar(symbol)
+            return
+        tipo = 'long' if float(posicao['positionAmt']) > 0 else 'short'
+        preco_entrada = float(posicao['entryPrice'])
+        # Status com a posição antes de adotar as proteções: uma delas pode ser
+        # executada antes do primeiro monitoramento e o registro do fechamento
+        # depende dele
+        with status_lock:
+            status_de(symbol).update({"posicao": preco_entrada, "quantidade": abs(float(posicao['positionAmt'])),
+                                      "direcao": tipo.upper()})
+        ordens.reconciliar(symbol, tipo, calcula_alvo(preco_entrada, tipo, symbol), calcula_stop(preco_entrada, tipo, symbol))
+    except ErroAPIBinance as e:
+        logging.error(f"[{symbol}] Erro ao reconciliar ordens de proteção: {e}")
+
+@cronometrado('monitorar_posicao')
+def monitorar_posicao(symbol, posicao):
     qtd = float(posicao['positionAmt'])
     tipo = 'long' if qtd > 0 else 'short'
     preco_entrada = float(posicao['entryPrice'])
 
-    lucro = preco_entrada * PROFIT_PERC
-    perda = preco_entrada * LOSS_PERC
-    alvo = preco_entrada + lucro if tipo == 'long' else preco_entrada - lucro
-    stop = preco_entrada - perda if tipo == 'long' else preco_entrada + perda
+    alvo = calcula_alvo(preco_entrada, tipo, symbol)
+    stop = calcula_stop(preco_entrada, tipo, symbol)
 
     try:
-        preco_atual = float(client.futures_symbol_ticker(symbol=SYMBOL)['price'])
+        preco_atual = obter_preco_atual(symbol)
+        if not preco_atual:
+            return False
         with status_lock:
+            status_bot = status_de(symbol)
             status_bot.update({                
                 "preco": preco_atual, 
+                "preco_atual": preco_atual, 
                 "posicao": preco_entrada, 
                 "quantidade": abs(qtd),
                 "direcao": tipo.upper()  # Manter direção atualizada
             })
-            logging.info(f"Posição atual: {qtd}")
+            logging.debug(f"[{symbol}] Posição atual: {qtd}")
             logging.debug(f"monitorar_posicao: status_bot['direcao'] = {status_bot['direcao']}")
 
-        if (tipo == 'long' and preco_atual >= alvo) or (tipo == 'short' and preco_atual <= alvo):
-            fechar_posicao(qtd, tipo)
-            clear_loss()
-            log_result("GAIN")
-        elif (tipo == 'long' and preco_atual <= stop) or (tipo == 'short' and preco_atual >= stop):
-            fechar_posicao(qtd, tipo)
-            write_loss()
-            log_result("LOSS")
-    except BinanceAPIException as e:
-        logging.error(f"Erro ao monitorar posição: {e}")
-
-def verificar_entrada():
+        cfg = config_de(symbol)
+        if gravacao:
+            p = cfg.de(symbol)
+            gravacao.posicao(symbol, cfg.interval, tipo, preco_entrada, p.profit_perc, p.loss_perc)
+
+        # Com as proteções na corretora a saída é dela (ver ao_protecao_executada)
+        if ordens.protegido(symbol):
+            return False
+
+        saida = verificar_saida(tipo, preco_atual, alvo, stop)
+        if gravacao:
+            gravacao.saida(symbol, cfg.interval, tipo, preco_atual, alvo, stop, saida)
+        # Fechamento rejeitado (ex.: uma proteção executou antes): o resultado
+        # já foi contado por ela
+        if saida == 'GAIN':
+            if fechar_posicao(symbol, qtd, tipo):
+                estado_gale.registrar_ganho(symbol)
+                log_result(f"{symbol} GAIN")
+            return True
+        elif saida == 'LOSS':
+            if fechar_posicao(symbol, qtd, tipo):
+                estado_gale.registrar_perda(symbol)
+                log_result(f"{symbol} LOSS")
+            return True
+    except ErroAPIBinance as e:
+        logging.error(f"[{symbol}] Erro ao monitorar posição: {e}")
+    return False
+
+@cronometrado('busca_dados')
+def semear_buffer(symbol, buffer):
+    # Completa o histórico local só com os candles que faltam (na primeira vez,
+    # os necessários para o buffer) e semeia o buffer a partir do disco
+    hist = obter_historico(symbol, buffer.interval, HISTORICO_DIR)
+    desde = int(time.time() * 1000 + api.cliente.offset_ms) - buffer.capacidade * buffer.intervalo_ms
+    em_formacao = hist.completar(
+        lambda start_time, limite: api.klines(symbol, buffer.interval, limite, start_time=start_time),
+        desde, api.cliente.offset_ms
+    )
+    klines = np.column_stack(hist.ultimos(buffer.capacidade - 1))
+    if em_formacao:
+        klines = np.vstack((klines, em_formacao))
+    with buffer.lock:
+        buffer.semear(klines)
+        if gravacao:
+            gravacao.semeadura(symbol, buffer.interval, klines)
+
+@cronometrado('verificar_entrada')
+def verificar_entrada(symbol, interval):
     try:
-        klines = client.futures_klines(symbol=SYMBOL, interval=INTERVAL, limit=610)
-        klines = [[float(v) for v in k] for k in klines]
-
-        ha_open, ha_close = calcular_heikin_ashi(klines)
-        close_prices = [k[4] for k in klines]
-        media = calcular_media_movel(close_prices, 610)
-        
-        # Confirmar sinal
-        if (ha_close[-2] < ha_open[-2] and ha_close[-1] > ha_open[-1]):
-            return 'long'
-        elif (ha_close[-2] > ha_open[-2] and ha_close[-1] < ha_open[-1]):
-            return 'short'
-        return None
-    except BinanceAPIException as e:
-        logging.error(f"Erro ao verificar entrada: {e}")
+        buffer = obter_buffer(symbol, interval)
+        if buffer.precisa_semear or time.time() - buffer.atualizado_em > IDADE_MAX_CANDLES:
+            semear_buffer(symbol, buffer)
+        with buffer.lock:
+            if buffer.tamanho < 2:
+                return None
+
+            ha_open, ha_close = buffer.ultimos_ha(2)
+
+            # Confirmar sinal
+            direcao = sinal_heikin_ashi(ha_open, ha_close)
+            if gravacao:
+                gravacao.entrada(symbol, interval, direcao)
+        return direcao
+    except ErroAPIBinance as e:
+        logging.error(f"[{symbol}] Erro ao verificar entrada: {e}")
         return None
         
+def executar_ciclo(estado):
+    with cronometro('ciclo'):
+        return ciclo_estrategia(estado)
+
+def ciclo_estrategia(estado):
+    # Uma iteração da estratégia para um símbolo; retorna os segundos até a próxima
+    symbol = estado.symbol
+    if estado.config is None:
+        estado.config = configuracao.atual
+
+    # Símbolo removido da configuração: sai do motor assim que não houver posição
+    if not estado.ativo:
+        estado.posicao = obter_posicao(symbol)
+        if not estado.posicao:
+            if ordens.acompanhando(symbol) and not ordens.conferir(symbol):
+                return 1
+            assinar_streams()
+            return None
+
+    # Pausas são prazos no estado do gale (sobrevivem a reinícios), não sleeps:
+    # enquanto o símbolo está pausado o motor segue atendendo os demais e a
+    # posição aberta continua monitorada; só novas entradas esperam o prazo
+    restante = estado_gale.pausa_restante(symbol)
+    if restante == 0:
+        logging.info(f"[{symbol}] Fim da pausa, reiniciando a sequência de gale.")
+        estado_gale.zerar(symbol)
+        restante = None
+
+    perdas = estado_gale.perdas(symbol)
+    if restante is None and perdas >= estado.config.de(symbol).emergency_stop_losses:
+        logging.warning(f"[{symbol}] Parada de emergência: muitas perdas consecutivas.")
+        estado_gale.pausar(symbol, PAUSA_EMERGENCIA)  # Pausa de 1 hora
+        restante = PAUSA_EMERGENCIA
+
+    # A posição vem do livro em memória do user data stream; sem ele, é
+    # reconsultada via REST no máximo a cada INTERVALO_POSICAO segundos
+    if usuario.sincronizado or estado.posicao is None or time.time() - estado.ultima_consulta >= INTERVALO_POSICAO:
+        estado.posicao = obter_posicao(symbol)
+        estado.ultima_consulta = time.time()
+
+    if estado.posicao:
+        if monitorar_posicao(symbol, estado.posicao):
+            estado.posicao = None
+            return 0
+        # O próximo tick do símbolo antecipa o ciclo (ver ao_tick)
+        return 1
+
+    if ordens.acompanhando(symbol):
+        # Sem posição e com proteções ainda acompanhadas: a execução não chegou
+        # pelo user data stream. Antes de qualquer entrada nova, confere as
+        # ordens via REST (registrando a saída e cancelando a irmã, que
+        # fecharia a próxima posição no preço antigo); depois recomeça o ciclo
+        # com o gale atualizado
+        return 0 if ordens.conferir(symbol) else 1
+
+    if ordens.em_saida(symbol):
+        # Saída executada na corretora ainda sendo registrada
+        return 1
+
+    # Sem posição: ponto seguro para passar à versão mais recente da configuração
+    adotar_config(estado)
+    cfg = estado.config
+    p = cfg.de(symbol)
+
+    if restante is None and perdas >= p.max_gale:
+        logging.warning(f"[{symbol}] Limite de gales atingido. Pausando entradas.")
+        estado_gale.pausar(symbol, PAUSA_GALE)  # Pausa de 5 minutos
+        restante = PAUSA_GALE
+
+    if restante is not None:
+        # O motor reagenda o símbolo para o fim da pausa
+        return restante
+
+    inicio = time.perf_counter()
+    direcao = verificar_entrada(symbol, cfg.interval)
+
+    if direcao:
+        tamanho = tamanho_gale(perdas, p.gale)
+        print(f"[{symbol}] Gale: {perdas} tamanho {tamanho} direção: {direcao}")
+        if abrir_posicao(symbol, direcao, tamanho):
+            # Do início da avaliação do sinal até a execução confirmada (e proteções criadas)
+            metricas.registrar('bot_etapa_segundos', 'sinal_ate_execucao', time.perf_counter() - inicio)
+        return 0
+    return INTERVALO_OCIOSO if stream.conectado.is_set() else INTERVALO_OCIOSO_SEM_STREAM
+
+def adotar_config(estado):
+    atual = configuracao.atual
+    anterior = estado.config
+    if anterior is atual:
+        return
+    estado.config = atual
+    symbol = estado.symbol
+    if anterior is not None and (anterior.de(symbol) != atual.de(symbol) or anterior.interval != atual.interval):
+        logging.info(f"[{symbol}] Configuração v{atual.versao} em vigor (antes v{anterior.versao})")
+    if anterior is not None and anterior.interval != atual.interval:
+        # Pode ter sido a última posição segurando o intervalo antigo dos streams
+        assinar_streams()
+
+def ao_kline(symbol, kline, fechado):
+    buffer = obter_buffer(symbol, stream.interval)
+    with buffer.lock:
+        buffer.atualizar(kline)
+        if gravacao:
+            gravacao.kline(symbol, stream.interval, kline, fechado)
+    if fechado:
+        # Candles fechados vão para o histórico local; um buraco (ex.: reconexão)
+        # é preenchido via REST na próxima semeadura
+        obter_historico(symbol, stream.interval, HISTORICO_DIR).anexar([kline], continuo=True)
+    # O sinal de entrada só muda com o candle: o símbolo sem posição é avaliado
+    # quando ele fecha ou quando o OHLC do candle em formação muda
+    ohlc = tuple(kline[1:5])
+    if fechado or ultimo_ohlc.get(symbol) != ohlc:
+        ultimo_ohlc[symbol] = ohlc
+        estado = motor.estados.get(symbol)
+        if estado and not estado.posicao:
+            motor.acordar(symbol)
+
+def ao_tick(symbol, preco):
+    if gravacao:
+        gravacao.tick(symbol, stream.interval, preco)
+    estado = motor.estados.get(symbol)
+    if estado and estado.posicao:
+        motor.acordar(symbol)
+    if estado:
+        with status_lock:
+            estado.status["preco_atual"] = preco
+    # Publica no máximo a cada INTERVALO_PUBLICACAO; só o que mudou vai para o painel
+    if time.time() - ultima_publicacao.get(symbol, 0) >= INTERVALO_PUBLICACAO:
+        publicar_status(symbol)
+
+def liberar_status(symbol):
+    ultima_publicacao.pop(symbol, None)
+    if canal:
+        canal.liberar(symbol)
+
+# Os símbolos entram no motor na partida, com a configuração carregada do banco
+motor = Motor(executar_ciclo)
+motor.ao_remover.append(liberar_status)
+
 def executar_bot():
-    init_loss_file()
+    global gravacao
+    metricas.iniciar_gravacao()
+    gravacao = gravador.abrir()
+    if metricas.PERFIL:
+        metricas.iniciar_perfil()
     init_db()
-    while True:
-        try:
-            perdas = read_loss_count()
-            if perdas >= EMERGENCY_STOP_LOSSES:
-                logging.warning("Parada de emergência: muitas perdas consecutivas.")
-                time.sleep(3600)  # Pausa de 1 hora
-                clear_loss()
-                continue
-
-            posicao = obter_posicao()
-            if posicao:
-                monitorar_posicao(posicao)
-                time.sleep(1)
-            else:
-                if perdas >= MAX_GALE:
-                    logging.warning("Limite de gales atingido. Pausando entradas.")
-                    time.sleep(300)  # Pausa de 5 minutos
-                    clear_loss()
-                    continue
-                
-                direcao = verificar_entrada()
-                
-                if direcao:
-                    idx = int(min(perdas, len(GALE)-1))
-                    tamanho = GALE[idx]
-                    print(f"Idx: {idx} tamanho {tamanho} direção: {direcao}")
-                    abrir_posicao(direcao, tamanho)
-                time.sleep(5)  # Intervalo maior sem posições
-        except Exception as e:
-            logging.error(f"Erro inesperado: {e}")
-            time.sleep(10)
+    cfg = configuracao.carregar()
+    publicar_config()
+    publicar_estatisticas()
+    try:
+        simbolos.atualizar()
+    except Exception as e:
+        logging.error(f"Erro ao carregar exchange info: {e}")
+    estado_gale.carregar()
+    for symbol in cfg.symbols:
+        preparar_estado(symbol)
+    motor.sincronizar(cfg.symbols)
+    assinar_streams()
+    relogio.iniciar()
+    usuario.iniciar()
+    if ORDENS_PROTECAO:
+        for symbol in cfg.symbols:
+            reconciliar_protecoes(symbol)
+    stream.iniciar()
+    motor.executar()
+
+def iniciar_motor():
+    # Motor de trading numa thread própria, ao lado do servidor web
+    bot_thread = threading.Thread(target=executar_bot, name='motor')
+    bot_thread.daemon = True
+    bot_thread.start()
+    return bot_thread
 
 # ================= MAIN ================= #
+# Produção: gunicorn -c gunicorn.conf.py wsgi:app (ver Procfile), com o motor
+# num processo próprio. Execução direta usa o servidor de desenvolvimento do
+# Flask com o motor numa thread.
 if __name__ == '__main__':
-    bot_thread = threading.Thread(target=executar_bot)
-    bot_thread.daemon = True
-    bot_thread.start()
+    import sys
+    from web import criar_app
+
+    iniciar_motor()
+    app = criar_app(sys.modules[__name__])
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port, use_reloader=False)
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=port, use_reloader=False, threaded=True)
@@ -0,0 +1,104 @@
+import time
+import threading
+import numpy as np
+
+from indicadores import heikin_ashi, heikin_ashi_atualizar
+
+# Colunas do buffer
+T, O, H, L, C, V, HA_O, HA_C = range(8)
+
+# Candles mantidos por buffer
+CAPACIDADE = 610
+
+UNIDADES_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+
+def intervalo_em_ms(interval):
+    return int(interval[:-1]) * UNIDADES_MS[interval[-1]]
+
+
+# Buffer circular de tamanho fixo com os candles mais recentes e o Heikin-Ashi
+# mantido incrementalmente (cada atualização recalcula apenas o último candle)
+class BufferCandles:
+    def __init__(self, interval, capacidade=CAPACIDADE):
+        self.interval = interval
+        self.intervalo_ms = intervalo_em_ms(interval)
+        self.capacidade = capacidade
+        self.dados = np.zeros((8, capacidade))
+        self.tamanho = 0
+        self.fim = 0  # próxima posição de escrita
+        self.precisa_semear = True
+        self.atualizado_em = 0.0
+        # Reentrante: quem grava o diário (gravador.py) segura o lock em volta
+        # da mudança ou leitura e do registro correspondente
+        self.lock = threading.RLock()
+
+    def _pos(self, i):
+        # i negativo: -1 é o candle mais recente
+        return (self.fim + i) % self.capacidade
+
+    def semear(self, klines):
+        arr = np.asarray(klines, dtype=np.float64)[-self.capacidade:, :6]
+        ha_open, _, _, ha_close = heikin_ashi(arr[:, O], arr[:, H], arr[:, L], arr[:, C])
+        with self.lock:
+            n = len(arr)
+            self.dados[:6, :n] = arr.T
+            self.dados[HA_O, :n] = ha_open
+            self.dados[HA_C, :n] = ha_close
+            self.tamanho = n
+            self.fim = n % self.capacidade
+            self.precisa_semear = False
+            self.atualizado_em = time.time()
+
+    def atualizar(self, kline):
+        with self.lock:
+            if self.tamanho:
+                ultimo_t = self.dados[T, self._pos(-1)]
+                if kline[0] < ultimo_t:
+                    return
+                # Candles faltando (ex.: reconexão do stream): exige nova semeadura
+                if kline[0] > ultimo_t + self.intervalo_ms:
+                    self.precisa_semear = True
+            self._gravar(kline)
+
+    def _gravar(self, kline):
+        t, o, h, l, c, v = kline[:6]
+        if self.tamanho and t == self.dados[T, self._pos(-1)]:
+            pos = self._pos(-1)
+        else:
+            pos = self.fim
+            self.fim = (self.fim + 1) % self.capacidade
+            self.tamanho = min(self.tamanho + 1, self.capacidade)
+
+        d = self.dados
+        d[T, pos], d[O, pos], d[H, pos], d[L, pos], d[C, pos], d[V, pos] = t, o, h, l, c, v
+        if self.tamanho > 1:
+            ant = (pos - 1) % self.capacidade
+            d[HA_O, pos], _, _, d[HA_C, pos] = heikin_ashi_atualizar(d[HA_O, ant], d[HA_C, ant], o, h, l, c)
+        else:
+            d[HA_O, pos], d[HA_C, pos] = (o + c) / 2, (o + h + l + c) / 4
+        self.atualizado_em = time.time()
+
+    def ultimos_ha(self, n=2):
+        with self.lock:
+            idx = [self._pos(-i) for i in range(n, 0, -1)]
+            return self.dados[HA_O, idx], self.dados[HA_C, idx]
+
+    def coluna(self, col):
+        # Cópia em ordem cronológica de uma coluna (para indicadores)
+        with self.lock:
+            if self.tamanho < self.capacidade:
+                return self.dados[col, :self.tamanho].copy()
+            return np.concatenate((self.dados[col, self.fim:], self.dados[col, :self.fim]))
+
+
+buffers = {}
+buffers_lock = threading.Lock()
+
+
+def obter_buffer(symbol, interval, capacidade=CAPACIDADE):
+    chave = (symbol, interval)
+    with buffers_lock:
+        if chave not in buffers:
+            buffers[chave] = BufferCandles(interval, capacidade)
+        return buffers[chave]
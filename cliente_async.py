@@ -0,0 +1,244 @@
+import os
+import time
+import hmac
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+import concurrent.futures
+from urllib.parse import urlencode
+
+import aiohttp
+
+import metricas
+
+# URL base da API REST de futuros (pode apontar para um servidor local em testes)
+REST_URL = os.getenv('BINANCE_REST_URL', 'https://fapi.binance.com')
+LIMITE_PESO = int(os.getenv('LIMITE_PESO', 2400))  # Peso por minuto permitido pela Binance
+MARGEM_PESO = float(os.getenv('MARGEM_PESO', 0.8))  # Fração do limite usada antes de segurar requisições
+TIMEOUT_REST = float(os.getenv('TIMEOUT_REST', 10))
+MAX_CONEXOES = int(os.getenv('MAX_CONEXOES', 20))
+# Espera máxima das threads síncronas por uma requisição, incluindo a fila do
+# orçamento de peso (até o minuto seguinte)
+TIMEOUT_SINCRONO = float(os.getenv('TIMEOUT_SINCRONO', 60 + 2 * TIMEOUT_REST))
+# Timestamp fora do recvWindow (relógio local adiantado ou atrasado)
+ERRO_TIMESTAMP = -1021
+# Falha de rede ou timeout sem resposta da Binance (fora da faixa de códigos
+# dela). Numa ordem, o resultado é desconhecido: ela pode ter sido executada
+ERRO_TRANSPORTE = -1
+
+
+class ErroAPIBinance(Exception):
+    def __init__(self, status_code, code, message):
+        super().__init__(f"APIError(code={code}): {message}")
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+# Orçamento local de peso por minuto, sincronizado com o cabeçalho
+# X-MBX-USED-WEIGHT-1M das respostas. Só é usado dentro do loop asyncio,
+# então não precisa de lock.
+class BaldePeso:
+    def __init__(self, limite=LIMITE_PESO, margem=MARGEM_PESO):
+        self.limite = int(limite * margem)
+        self.usado = 0
+        self.minuto = self._minuto()
+        self.bloqueado_ate = 0
+
+    @staticmethod
+    def _minuto():
+        return int(time.time() // 60)
+
+    def _virar(self):
+        minuto = self._minuto()
+        if minuto != self.minuto:
+            self.minuto = minuto
+            self.usado = 0
+
+    async def reservar(self, peso):
+        while True:
+            agora = time.time()
+            if agora < self.bloqueado_ate:
+                await asyncio.sleep(self.bloqueado_ate - agora)
+                continue
+            self._virar()
+            if self.usado + peso <= self.limite:
+                self.usado += peso
+                return
+            espera = 60 - agora % 60 + 0.05
+            logging.warning(f"Orçamento de peso esgotado ({self.usado}/{self.limite}), aguardando {espera:.1f}s")
+            await asyncio.sleep(espera)
+
+    def sincronizar(self, usado):
+        self._virar()
+        self.usado = max(self.usado, usado)
+
+    def bloquear(self, segundos):
+        self.bloqueado_ate = max(self.bloqueado_ate, time.time() + segundos)
+
+
+def _peso_klines(limite):
+    if limite < 100:
+        return 1
+    if limite < 500:
+        return 2
+    if limite <= 1000:
+        return 5
+    return 10
+
+
+def _valor(v):
+    if isinstance(v, bool):
+        return 'true' if v else 'false'
+    return v
+
+
+# Cliente REST de futuros com pool de conexões keep-alive e controle de peso
+class ClienteBinanceAsync:
+    def __init__(self, api_key, api_secret, base_url=REST_URL, max_conexoes=MAX_CONEXOES, timeout=TIMEOUT_REST):
+        self.api_key = api_key
+        self.api_secret = api_secret.encode() if api_secret else b''
+        self.base_url = base_url.rstrip('/')
+        self.max_conexoes = max_conexoes
+        self.timeout = timeout
+        self.balde = BaldePeso()
+        self.offset_ms = 0  # relógio do servidor - relógio local (mantido por relogio.py)
+        self.rtt_ms = None  # ida e volta medida pela sincronização do relógio
+        # Callbacks sem argumentos quando a Binance rejeita o timestamp
+        self.ao_erro_timestamp = []
+        self._sessao = None
+
+    async def sessao(self):
+        if self._sessao is None or self._sessao.closed:
+            conector = aiohttp.TCPConnector(limit=self.max_conexoes, keepalive_timeout=60, ttl_dns_cache=300)
+            self._sessao = aiohttp.ClientSession(
+                connector=conector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'X-MBX-APIKEY': self.api_key} if self.api_key else None
+            )
+        return self._sessao
+
+    async def fechar(self):
+        if self._sessao and not self._sessao.closed:
+            await self._sessao.close()
+
+    def _assinar(self, params):
+        params['timestamp'] = int(time.time() * 1000 + self.offset_ms)
+        params.setdefault('recvWindow', 5000)
+        query = urlencode(params)
+        assinatura = hmac.new(self.api_secret, query.encode(), hashlib.sha256).hexdigest()
+        return f"{query}&signature={assinatura}"
+
+    async def requisicao(self, metodo, caminho, params=None, assinado=False, peso=1):
+        params = {k: _valor(v) for k, v in (params or {}).items() if v is not None}
+        await self.balde.reservar(peso)
+        sessao = await self.sessao()
+        # Assinada só depois da espera pelo peso, que pode passar de segundos:
+        # com o timestamp de antes, a ordem chegaria fora do recvWindow (-1021)
+        query = self._assinar(params) if assinado else urlencode(params)
+        url = f"{self.base_url}{caminho}" + (f"?{query}" if query else "")
+        inicio = time.perf_counter()
+        try:
+            return await self._enviar(sessao, metodo, url)
+        except ErroAPIBinance as e:
+            if e.code == ERRO_TIMESTAMP:
+                for cb in self.ao_erro_timestamp:
+                    cb()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ErroAPIBinance(0, ERRO_TRANSPORTE, f"{type(e).__name__}: {e}") from e
+        finally:
+            metricas.registrar('bot_rest_segundos', caminho, time.perf_counter() - inicio)
+
+    async def _enviar(self, sessao, metodo, url):
+        async with sessao.request(metodo, url) as resp:
+            usado = resp.headers.get('X-MBX-USED-WEIGHT-1M')
+            if usado:
+                self.balde.sincronizar(int(usado))
+            if resp.status in (418, 429):
+                # 429: limite estourado; 418: IP banido. Segura tudo até o Retry-After
+                self.balde.bloquear(int(resp.headers.get('Retry-After', 60)))
+            texto = await resp.text()
+            if resp.status >= 400:
+                # Erros de proxy/servidor nem sempre vêm em JSON
+                try:
+                    dados = json.loads(texto)
+                except ValueError:
+                    dados = {'msg': texto[:200]}
+                raise ErroAPIBinance(resp.status, dados.get('code'), dados.get('msg'))
+            return json.loads(texto)
+
+    # ================= ENDPOINTS ================= #
+
+    async def server_time(self):
+        return (await self.requisicao('GET', '/fapi/v1/time'))['serverTime']
+
+    async def exchange_info(self):
+        return await self.requisicao('GET', '/fapi/v1/exchangeInfo')
+
+    async def preco(self, symbol):
+        return float((await self.requisicao('GET', '/fapi/v1/ticker/price', {'symbol': symbol}))['price'])
+
+    async def posicoes(self, symbol=None):
+        return await self.requisicao('GET', '/fapi/v2/positionRisk', {'symbol': symbol}, assinado=True, peso=5)
+
+    async def preco_e_posicoes(self, symbol):
+        # Ticker e posição em paralelo, na mesma rodada
+        return await asyncio.gather(self.preco(symbol), self.posicoes(symbol))
+
+    async def klines(self, symbol, interval, limit=500, start_time=None, end_time=None):
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit, 'startTime': start_time, 'endTime': end_time}
+        return await self.requisicao('GET', '/fapi/v1/klines', params, peso=_peso_klines(limit))
+
+    async def criar_ordem(self, **params):
+        return await self.requisicao('POST', '/fapi/v1/order', params, assinado=True)
+
+    async def cancelar_ordem(self, **params):
+        return await self.requisicao('DELETE', '/fapi/v1/order', params, assinado=True)
+
+    async def consultar_ordem(self, **params):
+        return await self.requisicao('GET', '/fapi/v1/order', params, assinado=True)
+
+    async def ordens_abertas(self, symbol):
+        return await self.requisicao('GET', '/fapi/v1/openOrders', {'symbol': symbol}, assinado=True)
+
+    async def criar_listen_key(self):
+        return (await self.requisicao('POST', '/fapi/v1/listenKey'))['listenKey']
+
+    async def renovar_listen_key(self):
+        return await self.requisicao('PUT', '/fapi/v1/listenKey')
+
+
+# Expõe os métodos do cliente assíncrono para as threads síncronas (motor e
+# Flask). Todas as requisições rodam num único loop, compartilhando o pool de
+# conexões e o orçamento de peso.
+class ClienteSincrono:
+    def __init__(self, cliente, timeout=TIMEOUT_SINCRONO):
+        self.cliente = cliente
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='cliente-async', daemon=True)
+        self._thread.start()
+
+    def executar(self, coro):
+        futuro = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return futuro.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            futuro.cancel()
+            raise ErroAPIBinance(0, ERRO_TRANSPORTE, f"sem resposta em {self.timeout:g}s") from None
+
+    async def aguardar(self, coro):
+        # Para ser usado de outro loop asyncio (ex.: streams websocket)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def __getattr__(self, nome):
+        metodo = getattr(self.cliente, nome)
+        if not asyncio.iscoroutinefunction(metodo):
+            return metodo
+
+        def chamar(*args, **kwargs):
+            return self.executar(metodo(*args, **kwargs))
+        return chamar
@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import threading
+from types import MappingProxyType
+
+from db import carregar_config, gravar_config
+from status_compartilhado import MAX_SIMBOLOS, MAX_NIVEIS_GALE, TAMANHO_SOBRESCRITAS
+
+# Com 1, a configuração do .env vira uma versão nova na partida mesmo que o
+# banco tenha uma mais recente (ex.: depois de mudar SYMBOLS no deploy)
+CONFIG_DO_AMBIENTE = os.getenv('CONFIG_DO_AMBIENTE') == '1'
+
+# Intervalos de kline aceitos pela Binance em futuros
+INTERVALOS = ('1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w')
+FORMATO_SYMBOL = re.compile(r'^[A-Z0-9]{2,16}$')
+CAMPOS = ('profit_perc', 'loss_perc', 'gale', 'max_gale', 'emergency_stop_losses')
+
+
+class ConfigInvalida(ValueError):
+    pass
+
+
+def _fracao(nome, valor):
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        raise ConfigInvalida(f"{nome}: número inválido ({valor!r})")
+    if not 0 < valor < 1 or math.isnan(valor):
+        raise ConfigInvalida(f"{nome}: deve estar entre 0 e 1 (recebido {valor})")
+    return valor
+
+
+def _positivo(nome, valor):
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        raise ConfigInvalida(f"{nome}: número inválido ({valor!r})")
+    if not valor > 0 or math.isinf(valor):
+        raise ConfigInvalida(f"{nome}: deve ser maior que zero (recebido {valor})")
+    return valor
+
+
+def _inteiro(nome, valor):
+    try:
+        inteiro = int(valor)
+    except (TypeError, ValueError):
+        raise ConfigInvalida(f"{nome}: inteiro inválido ({valor!r})")
+    if (inteiro != valor and str(inteiro) != str(valor).strip()) or inteiro < 1:
+        raise ConfigInvalida(f"{nome}: deve ser um inteiro maior que zero (recebido {valor!r})")
+    return inteiro
+
+
+# Parâmetros da estratégia para um símbolo. Imutável: uma mudança cria outro
+class Parametros:
+    __slots__ = CAMPOS
+
+    def __init__(self, profit_perc, loss_perc, gale, max_gale, emergency_stop_losses):
+        gale = tuple(gale) if isinstance(gale, (list, tuple)) else gale
+        if not isinstance(gale, tuple) or not 1 <= len(gale) <= MAX_NIVEIS_GALE:
+            raise ConfigInvalida(f"gale: informe de 1 a {MAX_NIVEIS_GALE} tamanhos")
+        gale = tuple(_positivo('gale', g) for g in gale)
+        for campo, valor in (('profit_perc', _fracao('profit_perc', profit_perc)),
+                             ('loss_perc', _fracao('loss_perc', loss_perc)),
+                             ('gale', gale),
+                             ('max_gale', _inteiro('max_gale', max_gale)),
+                             ('emergency_stop_losses', _inteiro('emergency_stop_losses', emergency_stop_losses))):
+            object.__setattr__(self, campo, valor)
+
+    def __setattr__(self, campo, valor):
+        raise AttributeError("Parametros é imutável")
+
+    def __eq__(self, outro):
+        return isinstance(outro, Parametros) and self.para_dict() == outro.para_dict()
+
+    def __hash__(self):
+        return hash(tuple(self.para_dict().values()))
+
+    def substituir(self, **mudancas):
+        desconhecidos = set(mudancas) - set(CAMPOS)
+        if desconhecidos:
+            raise ConfigInvalida(f"Campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+        return Parametros(**{**self.para_dict(), **mudancas})
+
+    def para_dict(self):
+        return {campo: list(self.gale) if campo == 'gale' else getattr(self, campo) for campo in CAMPOS}
+
+
+# Uma versão da configuração do bot: símbolos, timeframe, parâmetros padrão e
+# ajustes por símbolo (só os campos que mudam). Validada na criação e
+# imutável, então pode ser lida de qualquer thread sem lock; uma mudança é
+# outra versão, trocada de uma vez no ArmazemConfig
+class Config:
+    __slots__ = ('versao', 'criado_em', 'symbols', 'interval', 'padrao', 'sobrescritas', '_efetivos')
+
+    def __init__(self, symbols, interval, padrao, sobrescritas=None, versao=0, criado_em=None):
+        symbols = tuple(str(s).strip().upper() for s in symbols)
+        if not 1 <= len(symbols) <= MAX_SIMBOLOS:
+            raise ConfigInvalida(f"symbols: informe de 1 a {MAX_SIMBOLOS} símbolos")
+        invalidos = [s for s in symbols if not FORMATO_SYMBOL.match(s)]
+        if invalidos:
+            raise ConfigInvalida(f"symbols: inválidos {', '.join(invalidos)}")
+        if len(set(symbols)) != len(symbols):
+            raise ConfigInvalida("symbols: símbolo repetido")
+        if interval not in INTERVALOS:
+            raise ConfigInvalida(f"interval: {interval!r} não é um intervalo da Binance ({', '.join(INTERVALOS)})")
+        if not isinstance(padrao, Parametros):
+            raise ConfigInvalida("padrao: parâmetros ausentes")
+
+        ajustes, efetivos = {}, {}
+        for symbol, campos in (sobrescritas or {}).items():
+            symbol = str(symbol).strip().upper()
+            if not FORMATO_SYMBOL.match(symbol):
+                raise ConfigInvalida(f"sobrescritas: símbolo inválido {symbol!r}")
+            if not isinstance(campos, dict):
+                raise ConfigInvalida(f"sobrescritas: {symbol} deve ter um objeto com os campos alterados")
+            try:
+                efetivos[symbol] = padrao.substituir(**campos)
+            except ConfigInvalida as e:
+                raise ConfigInvalida(f"sobrescritas: {symbol}: {e}")
+            if campos:
+                completos = efetivos[symbol].para_dict()
+                ajustes[symbol] = MappingProxyType({campo: completos[campo] for campo in campos})
+        if len(json.dumps(_dict_ajustes(ajustes)).encode()) > TAMANHO_SOBRESCRITAS:
+            raise ConfigInvalida(f"sobrescritas: acima de {TAMANHO_SOBRESCRITAS} bytes")
+
+        for campo, valor in (('versao', versao), ('criado_em', criado_em if criado_em is not None else time.time()),
+                             ('symbols', symbols), ('interval', interval), ('padrao', padrao),
+                             ('sobrescritas', MappingProxyType(ajustes)), ('_efetivos', MappingProxyType(efetivos))):
+            object.__setattr__(self, campo, valor)
+
+    def __setattr__(self, campo, valor):
+        raise AttributeError("Config é imutável")
+
+    def de(self, symbol):
+        # Parâmetros em vigor para o símbolo (padrão + ajustes dele)
+        return self._efetivos.get(symbol, self.padrao)
+
+    def numerada(self, versao):
+        return Config(self.symbols, self.interval, self.padrao, _dict_ajustes(self.sobrescritas), versao)
+
+    def para_dict(self):
+        return {"symbols": list(self.symbols), "interval": self.interval, "padrao": self.padrao.para_dict(),
+                "sobrescritas": _dict_ajustes(self.sobrescritas), "criado_em": self.criado_em}
+
+    @classmethod
+    def de_dict(cls, dados, versao=0):
+        return cls(dados["symbols"], dados["interval"], Parametros(**dados["padrao"]),
+                   dados.get("sobrescritas"), versao, dados.get("criado_em"))
+
+
+def _dict_ajustes(ajustes):
+    return {symbol: dict(campos) for symbol, campos in ajustes.items()}
+
+
+def montar(simbolos, interval, profit_perc, loss_perc, gale, max_gale, emergency_stop_losses, sobrescritas=None):
+    # Config (ainda sem versão) a partir dos campos do painel/.env; ConfigInvalida se algo não fechar
+    return Config(simbolos, interval, Parametros(profit_perc, loss_perc, gale, max_gale, emergency_stop_losses),
+                  sobrescritas)
+
+
+def do_ambiente():
+    simbolos = os.getenv('SYMBOLS', os.getenv('SYMBOL', 'ETHUSDT'))
+    return montar(
+        [s for s in simbolos.split(',') if s.strip()],
+        os.getenv('INTERVAL', '1m'),
+        os.getenv('PROFIT_PERC', 0.0050),
+        os.getenv('LOSS_PERC', 0.0045),
+        os.getenv('GALE', '0.006,0.012,0.024,0.048,0.096').split(','),
+        os.getenv('MAX_GALE', 5),  # Limite de iterações do gale
+        os.getenv('EMERGENCY_STOP_LOSSES', 5),  # Parada de emergência após X perdas
+        # Ajustes por símbolo em JSON, ex.: {"BTCUSDT": {"profit_perc": 0.004}}
+        json.loads(os.getenv('CONFIG_SOBRESCRITAS') or '{}'),
+    )
+
+
+# Versão atual da configuração, trocada atomicamente (uma atribuição) a cada
+# mudança: quem lê `atual` recebe sempre uma versão inteira e consistente,
+# sem lock. Cada versão é gravada na tabela config antes de valer, e a mais
+# recente é recuperada ao reiniciar. O motor decide quando cada símbolo passa
+# a usar a versão nova (entre ciclos e sem posição aberta).
+class ArmazemConfig:
+    def __init__(self, inicial):
+        self.atual = inicial
+        self._lock = threading.Lock()
+
+    def carregar(self, do_ambiente=CONFIG_DO_AMBIENTE):
+        # Na partida, depois do init_db: a última versão gravada ou, sem
+        # nenhuma (ou com CONFIG_DO_AMBIENTE), a inicial vira a versão seguinte
+        linha = carregar_config()
+        if linha and not do_ambiente:
+            versao, dados = linha
+            try:
+                self.atual = Config.de_dict(json.loads(dados), versao)
+                logging.info(f"Configuração v{versao} carregada do banco")
+                return self.atual
+            except (ValueError, KeyError, TypeError) as e:
+                logging.error(f"Configuração v{versao} gravada é inválida ({e}); usando a do ambiente")
+        return self.publicar(self.atual)
+
+    def publicar(self, nova):
+        with self._lock:
+            ultima = carregar_config()
+            nova = nova.numerada(max(self.atual.versao, ultima[0] if ultima else 0) + 1)
+            gravar_config(nova.versao, nova.criado_em, json.dumps(nova.para_dict()))
+            self.atual = nova
+        logging.info(f"Configuração v{nova.versao} publicada: {', '.join(nova.symbols)} {nova.interval}")
+        return nova
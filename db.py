@@ -1,7 +1,33 @@
+import os
 import sqlite3
+import threading
+
+from estatisticas import Estatisticas
+
+# Modo papel (MODO_PAPEL=1): operações e estado do gale num banco à parte.
+# Resolvido aqui, a partir do ambiente, para que o motor e os workers web
+# (que não importam o bot-v1) usem o mesmo arquivo
+MODO_PAPEL = os.getenv('MODO_PAPEL') == '1'
+DB_FILE = os.getenv('DB_FILE_PAPEL', 'papel.db') if MODO_PAPEL else os.getenv('DB_FILE', 'operacoes.db')
+# Chave dos agregados de todos os símbolos na tabela estatisticas
+TOTAL = '*'
+
+# Uma conexão por thread (e por processo, por causa do fork dos workers web)
+_local = threading.local()
+
+def conexao():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(DB_FILE, timeout=10)
+        # WAL: leituras do painel não bloqueiam as escritas do bot
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
 
 def init_db():
-    conn = sqlite3.connect('operacoes.db')
+    conn = conexao()
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS operacoes (
@@ -13,26 +39,140 @@ def init_db():
             quantidade REAL,
             resultado TEXT,
             roi REAL,
-            lucro_usdt REAL
+            lucro_usdt REAL,
+            symbol TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
-
-def salvar_operacao(data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt):
-    conn = sqlite3.connect('operacoes.db')
-    c = conn.cursor()
+    # Bancos criados antes do suporte a vários símbolos não têm a coluna symbol
+    colunas = [col[1] for col in c.execute("PRAGMA table_info(operacoes)")]
+    if 'symbol' not in colunas:
+        c.execute("ALTER TABLE operacoes ADD COLUMN symbol TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_operacoes_data ON operacoes (data)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_operacoes_resultado ON operacoes (resultado)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_operacoes_symbol ON operacoes (symbol, id)")
     c.execute('''
-        INSERT INTO operacoes (data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt))
+        CREATE TABLE IF NOT EXISTS estatisticas (
+            chave TEXT PRIMARY KEY,
+            ultimo_id INTEGER,
+            gains INTEGER,
+            losses INTEGER,
+            profit_total REAL,
+            sequencia_perdas INTEGER,
+            maior_sequencia_perdas INTEGER,
+            pico REAL,
+            max_drawdown REAL
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS config (
+            versao INTEGER PRIMARY KEY,
+            criado_em REAL,
+            dados TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS estado_gale (
+            symbol TEXT PRIMARY KEY,
+            perdas INTEGER,
+            pausa_ate REAL,
+            atualizado_em REAL
+        )
+    ''')
     conn.commit()
-    conn.close()
+    with conn:
+        atualizar_estatisticas(conn)
 
-def buscar_operacoes():
-    conn = sqlite3.connect('operacoes.db')
-    c = conn.cursor()
-    c.execute("SELECT * FROM operacoes ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
-    return rows
\ No newline at end of file
+def _carregar_estatisticas(conn, chave):
+    linha = conn.execute(f"SELECT {', '.join(Estatisticas.CAMPOS)} FROM estatisticas WHERE chave = ?", (chave,)).fetchone()
+    return Estatisticas.de_linha(linha) if linha else Estatisticas()
+
+def _gravar_estatisticas(conn, chave, est):
+    conn.execute(f"INSERT OR REPLACE INTO estatisticas (chave, {', '.join(Estatisticas.CAMPOS)}) VALUES (?{', ?' * len(Estatisticas.CAMPOS)})",
+                 (chave,) + est.para_linha())
+
+def atualizar_estatisticas(conn):
+    # Aplica aos agregados as operações gravadas depois do último id processado
+    # (na primeira execução, reconstrói a partir da tabela inteira)
+    total = _carregar_estatisticas(conn, TOTAL)
+    maior_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM operacoes").fetchone()[0]
+    if total.ultimo_id > maior_id:
+        conn.execute("DELETE FROM estatisticas")
+        total = Estatisticas()
+    if total.ultimo_id == maior_id:
+        return
+
+    por_symbol = {}
+    linhas = conn.execute("SELECT id, resultado, lucro_usdt, symbol FROM operacoes WHERE id > ? ORDER BY id", (total.ultimo_id,))
+    for op_id, resultado, lucro_usdt, symbol in linhas:
+        total.registrar(op_id, resultado, lucro_usdt)
+        if symbol:
+            if symbol not in por_symbol:
+                por_symbol[symbol] = _carregar_estatisticas(conn, symbol)
+            por_symbol[symbol].registrar(op_id, resultado, lucro_usdt)
+    _gravar_estatisticas(conn, TOTAL, total)
+    for symbol, est in por_symbol.items():
+        _gravar_estatisticas(conn, symbol, est)
+
+def buscar_estatisticas(symbol=None):
+    return _carregar_estatisticas(conexao(), symbol or TOTAL)
+
+def salvar_operacao(data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt, symbol=None):
+    conn = conexao()
+    # Operação e agregados na mesma transação
+    with conn:
+        c = conn.execute('''
+            INSERT INTO operacoes (data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt, symbol)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (data, preco_abertura, preco_fechamento, direcao, quantidade, resultado, roi, lucro_usdt, symbol))
+        for chave in filter(None, (TOTAL, symbol)):
+            est = _carregar_estatisticas(conn, chave)
+            est.registrar(c.lastrowid, resultado, lucro_usdt)
+            _gravar_estatisticas(conn, chave, est)
+
+def carregar_config():
+    # Versão mais recente da configuração: (versao, JSON) ou None
+    return conexao().execute("SELECT versao, dados FROM config ORDER BY versao DESC LIMIT 1").fetchone()
+
+def gravar_config(versao, criado_em, dados):
+    conn = conexao()
+    with conn:
+        conn.execute("INSERT INTO config (versao, criado_em, dados) VALUES (?, ?, ?)", (versao, criado_em, dados))
+
+def carregar_estado_gale():
+    return conexao().execute("SELECT symbol, perdas, pausa_ate FROM estado_gale").fetchall()
+
+def gravar_estado_gale(symbol, perdas, pausa_ate, atualizado_em):
+    conn = conexao()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO estado_gale (symbol, perdas, pausa_ate, atualizado_em) VALUES (?, ?, ?, ?)",
+                     (symbol, perdas, pausa_ate, atualizado_em))
+
+def _filtros(symbol=None, inicio=None, fim=None, resultado=None):
+    condicoes, params = [], []
+    if symbol:
+        condicoes.append("symbol = ?")
+        params.append(symbol)
+    if inicio:
+        condicoes.append("data >= ?")
+        params.append(inicio)
+    if fim:
+        condicoes.append("data <= ?")
+        params.append(fim)
+    if resultado:
+        condicoes.append("resultado = ?")
+        params.append(resultado)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return where, params
+
+def buscar_operacoes(limite=None, offset=0, symbol=None, inicio=None, fim=None, resultado=None):
+    # Mais recentes primeiro; inicio/fim no formato "YYYY-MM-DD HH:MM:SS"
+    where, params = _filtros(symbol, inicio, fim, resultado)
+    c = conexao().execute(
+        f"SELECT * FROM operacoes {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+        params + [limite if limite is not None else -1, offset]
+    )
+    return c.fetchall()
+
+def contar_operacoes(symbol=None, inicio=None, fim=None, resultado=None):
+    where, params = _filtros(symbol, inicio, fim, resultado)
+    return conexao().execute(f"SELECT COUNT(*) FROM operacoes {where}", params).fetchone()[0]
@@ -0,0 +1,98 @@
+import os
+import time
+import logging
+import threading
+
+from db import carregar_estado_gale, gravar_estado_gale
+
+
+# Estado da sequência de gale de um símbolo: perdas consecutivas (nível do
+# gale) e, durante uma pausa, o instante (epoch) em que ela termina
+class EstadoGale:
+    def __init__(self, perdas=0, pausa_ate=0.0):
+        self.perdas = perdas
+        self.pausa_ate = pausa_ate
+
+
+# Estado do gale de todos os símbolos mantido em memória: as leituras do ciclo
+# e do painel não fazem I/O. Cada mudança é gravada numa única transação do
+# SQLite (tabela estado_gale) antes de valer em memória, e o estado é
+# recuperado ao reiniciar, então uma queda não deixa a sequência pela metade.
+class ArmazemEstado:
+    def __init__(self):
+        self._estados = {}
+        self._lock = threading.Lock()
+
+    def carregar(self):
+        with self._lock:
+            self._estados = {symbol: EstadoGale(perdas, pausa_ate or 0.0)
+                             for symbol, perdas, pausa_ate in carregar_estado_gale()}
+
+    def preparar(self, symbol, arquivos_legados=()):
+        # Símbolo sem estado gravado: migra o contador dos arquivos loss_orders*.txt
+        with self._lock:
+            if symbol in self._estados:
+                return
+            for arquivo in arquivos_legados:
+                if os.path.exists(arquivo):
+                    perdas = _contar_arquivo(arquivo)
+                    self._gravar(symbol, EstadoGale(perdas))
+                    os.remove(arquivo)
+                    logging.info(f"[{symbol}] Contador de perdas migrado de {arquivo}: {perdas}")
+                    return
+            self._gravar(symbol, EstadoGale())
+
+    def _gravar(self, symbol, novo):
+        # Chamado com o _lock já adquirido
+        atual = self._estados.get(symbol)
+        if atual and (atual.perdas, atual.pausa_ate) == (novo.perdas, novo.pausa_ate):
+            return
+        gravar_estado_gale(symbol, novo.perdas, novo.pausa_ate, time.time())
+        self._estados[symbol] = novo
+
+    def _atualizar(self, symbol, transicao):
+        # Leitura, mudança e gravação numa só posse do lock: as transições do
+        # ciclo e as das proteções (thread de ordens) não se sobrepõem
+        with self._lock:
+            self._gravar(symbol, transicao(self._estados.get(symbol) or EstadoGale()))
+
+    def _obter(self, symbol):
+        with self._lock:
+            return self._estados.get(symbol) or EstadoGale()
+
+    # ================= CONSULTA ================= #
+
+    def perdas(self, symbol):
+        return self._obter(symbol).perdas
+
+    def pausa_restante(self, symbol):
+        # Segundos até o fim da pausa (0 se já acabou); None sem pausa registrada
+        pausa_ate = self._obter(symbol).pausa_ate
+        if not pausa_ate:
+            return None
+        return max(0.0, pausa_ate - time.time())
+
+    # ================= TRANSIÇÕES ================= #
+
+    def registrar_perda(self, symbol):
+        self._atualizar(symbol, lambda atual: EstadoGale(atual.perdas + 1, atual.pausa_ate))
+
+    def registrar_ganho(self, symbol):
+        # Recomeça a sequência; uma pausa em andamento continua valendo
+        self._atualizar(symbol, lambda atual: EstadoGale(0, atual.pausa_ate))
+
+    def pausar(self, symbol, segundos):
+        # As perdas continuam até a pausa terminar (ver zerar)
+        self._atualizar(symbol, lambda atual: EstadoGale(atual.perdas, time.time() + segundos))
+
+    def zerar(self, symbol):
+        self._atualizar(symbol, lambda atual: EstadoGale())
+
+
+def _contar_arquivo(arquivo):
+    # Formato antigo: uma linha "1" por perda (e "0" na criação)
+    try:
+        with open(arquivo, 'r') as f:
+            return int(sum(float(line.strip()) for line in f if line.strip().replace('.', '', 1).isdigit()))
+    except (OSError, ValueError):
+        return 0
@@ -0,0 +1,56 @@
+# Agregados das operações atualizados em O(1) a cada operação registrada,
+# em vez de percorrer a tabela inteira a cada requisição do painel
+class Estatisticas:
+    CAMPOS = ('ultimo_id', 'gains', 'losses', 'profit_total', 'sequencia_perdas',
+              'maior_sequencia_perdas', 'pico', 'max_drawdown')
+
+    def __init__(self, ultimo_id=0, gains=0, losses=0, profit_total=0.0, sequencia_perdas=0,
+                 maior_sequencia_perdas=0, pico=0.0, max_drawdown=0.0):
+        self.ultimo_id = ultimo_id
+        self.gains = gains
+        self.losses = losses
+        self.profit_total = profit_total
+        self.sequencia_perdas = sequencia_perdas
+        self.maior_sequencia_perdas = maior_sequencia_perdas
+        self.pico = pico
+        self.max_drawdown = max_drawdown
+
+    def registrar(self, op_id, resultado, lucro_usdt):
+        self.ultimo_id = max(self.ultimo_id, op_id)
+        resultado = (resultado or '').strip().upper()
+        if resultado == 'GAIN':
+            self.gains += 1
+            self.sequencia_perdas = 0
+        elif resultado == 'LOSS':
+            self.losses += 1
+            self.sequencia_perdas += 1
+            self.maior_sequencia_perdas = max(self.maior_sequencia_perdas, self.sequencia_perdas)
+        else:
+            return
+        self.profit_total += float(lucro_usdt or 0)
+        # Drawdown medido sobre o lucro acumulado
+        self.pico = max(self.pico, self.profit_total)
+        self.max_drawdown = max(self.max_drawdown, self.pico - self.profit_total)
+
+    @property
+    def taxa_acerto(self):
+        total = self.gains + self.losses
+        return round((self.gains / total) * 100, 2) if total > 0 else 0.0
+
+    def resumo(self):
+        # Mesmo formato de calcular_resumo_operacoes
+        return self.gains, self.losses, round(self.profit_total, 2), self.taxa_acerto
+
+    def para_linha(self):
+        return tuple(getattr(self, campo) for campo in self.CAMPOS)
+
+    @classmethod
+    def de_linha(cls, linha):
+        return cls(*linha)
+
+    def para_dict(self):
+        dados = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        dados["profit_total"] = round(self.profit_total, 2)
+        dados["max_drawdown"] = round(self.max_drawdown, 2)
+        dados["taxa_acerto"] = self.taxa_acerto
+        return dados
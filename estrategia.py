@@ -0,0 +1,67 @@
+import numpy as np
+
+# Regras da estratégia Heikin-Ashi + gale, sem I/O, usadas tanto pelo bot
+# ao vivo quanto pelo backtest
+
+# Pausas da máquina de gale (segundos)
+PAUSA_EMERGENCIA = 3600
+PAUSA_GALE = 300
+
+
+# ================= SINAL ================= #
+
+def sinal_heikin_ashi(ha_open, ha_close):
+    # Reversão de cor entre os dois últimos candles Heikin-Ashi
+    if ha_close[-2] < ha_open[-2] and ha_close[-1] > ha_open[-1]:
+        return 'long'
+    elif ha_close[-2] > ha_open[-2] and ha_close[-1] < ha_open[-1]:
+        return 'short'
+    return None
+
+
+def sinais_heikin_ashi(ha_open, ha_close):
+    # Versão vetorizada: +1 long, -1 short, 0 sem sinal, no índice do candle que confirma
+    verde = ha_close > ha_open
+    vermelho = ha_close < ha_open
+    sinais = np.zeros(len(ha_open), dtype=np.int8)
+    sinais[1:][vermelho[:-1] & verde[1:]] = 1
+    sinais[1:][verde[:-1] & vermelho[1:]] = -1
+    return sinais
+
+
+# ================= ALVO / STOP ================= #
+
+def calcula_alvo(preco_entrada, tipo, profit_perc):
+    lucro = preco_entrada * profit_perc
+    return preco_entrada + lucro if tipo == 'long' else preco_entrada - lucro
+
+
+def calcula_stop(preco_entrada, tipo, loss_perc):
+    perda = preco_entrada * loss_perc
+    return preco_entrada - perda if tipo == 'long' else preco_entrada + perda
+
+
+def verificar_saida(tipo, preco, alvo, stop):
+    if (tipo == 'long' and preco >= alvo) or (tipo == 'short' and preco <= alvo):
+        return 'GAIN'
+    elif (tipo == 'long' and preco <= stop) or (tipo == 'short' and preco >= stop):
+        return 'LOSS'
+    return None
+
+
+def resultado_operacao(preco_abertura, preco_fechamento, direcao, quantidade):
+    # ROI (%) e lucro em USDT como gravados na tabela operacoes
+    if direcao.lower() == 'long':
+        roi = round(((preco_fechamento - preco_abertura) / preco_abertura) * 100, 2)
+        lucro_usdt = round((preco_fechamento - preco_abertura) * quantidade, 2)
+    else:
+        roi = round(((preco_abertura - preco_fechamento) / preco_abertura) * 100, 2)
+        lucro_usdt = round((preco_abertura - preco_fechamento) * quantidade, 2)
+    resultado = "GAIN" if lucro_usdt >= 0 else "LOSS"
+    return resultado, roi, lucro_usdt
+
+
+# ================= GALE ================= #
+
+def tamanho_gale(perdas, gale):
+    return gale[int(min(perdas, len(gale) - 1))]
@@ -0,0 +1,63 @@
+import json
+import threading
+from collections import deque
+
+# Intervalo máximo sem mensagens antes de mandar um comentário de keepalive (segundos)
+KEEPALIVE = 15
+
+
+def _mensagem(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, default=str)}\n\n"
+
+
+# Canal de status do painel via Server-Sent Events. O bot publica o estado de
+# cada canal (um por símbolo); só as chaves que mudaram viram um delta,
+# serializado uma única vez e entregue pronto a todos os navegadores conectados.
+class Publicador:
+    def __init__(self, historico=64):
+        self.historico = historico
+        self._cond = threading.Condition()
+        self._estados = {}
+        self._versoes = {}
+        self._deltas = {}
+
+    def publicar(self, canal, dados):
+        with self._cond:
+            estado = self._estados.setdefault(canal, {})
+            delta = {k: v for k, v in dados.items() if estado.get(k) != v}
+            if not delta:
+                return
+            estado.update(delta)
+            versao = self._versoes.get(canal, 0) + 1
+            self._versoes[canal] = versao
+            self._deltas.setdefault(canal, deque(maxlen=self.historico)).append((versao, _mensagem('delta', delta)))
+            self._cond.notify_all()
+
+    def tem_canal(self, canal):
+        return canal in self._estados
+
+    def snapshot(self, canal):
+        with self._cond:
+            return self._versoes.get(canal, 0), dict(self._estados.get(canal, {}))
+
+    def assinar(self, canal, keepalive=KEEPALIVE):
+        # Gerador de mensagens SSE: estado completo na conexão e depois os deltas.
+        # Um assinante que ficou para trás além do histórico recebe um snapshot novo
+        versao, estado = self.snapshot(canal)
+        yield _mensagem('snapshot', estado)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._versoes.get(canal, 0) > versao, keepalive)
+                atual = self._versoes.get(canal, 0)
+                deltas = self._deltas.get(canal, ())
+                if atual == versao:
+                    mensagens = None
+                elif deltas and deltas[0][0] <= versao + 1:
+                    mensagens = [m for v, m in deltas if v > versao]
+                else:
+                    mensagens = [_mensagem('snapshot', self._estados[canal])]
+                versao = atual
+            if mensagens is None:
+                yield ": keepalive\n\n"
+            else:
+                yield ''.join(mensagens)
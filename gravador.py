@@ -0,0 +1,342 @@
+import os
+import sys
+import math
+import time
+import struct
+import atexit
+import logging
+import argparse
+import threading
+
+from collections import deque
+
+import numpy as np
+
+from candles import BufferCandles, CAPACIDADE
+from estrategia import sinal_heikin_ashi, verificar_saida, calcula_alvo, calcula_stop
+
+# Diário binário das entradas de mercado e das decisões do motor (vazio desativa)
+GRAVACAO_ARQUIVO = os.getenv('GRAVACAO_ARQUIVO', '')
+# Intervalo entre descargas do buffer de escrita para o disco (segundos)
+GRAVACAO_INTERVALO = float(os.getenv('GRAVACAO_INTERVALO', 1))
+# Ticks recentes de cada série aceitos como o preço de uma verificação de saída
+TICKS_RECENTES = 16
+
+MAGICO = b'BOTJ'
+VERSAO = 3
+
+# Tipos de registro
+INICIO, SERIE, TICK, KLINE, SEMEADURA, ENTRADA, SAIDA, POSICAO, EXECUCAO = range(9)
+
+# Todo registro começa com tipo, série e instante (ns); o corpo depende do tipo
+CABECALHO = struct.Struct('<BHq')
+CORPOS = {
+    INICIO: struct.Struct('<4sH'),       # mágico, versão (abre cada sessão gravada)
+    SERIE: struct.Struct('<HB'),         # capacidade do buffer, tamanho do nome; segue "SYMBOL interval"
+    TICK: struct.Struct('<d'),           # preço
+    KLINE: struct.Struct('<6d?'),        # t, o, h, l, c, v, fechado
+    SEMEADURA: struct.Struct('<I'),      # n; seguem n x 6 doubles (t, o, h, l, c, v)
+    ENTRADA: struct.Struct('<b'),        # sinal: 1 long, -1 short, 0 nenhum
+    SAIDA: struct.Struct('<bdddb'),      # tipo, preço, alvo, stop, saída (1 GAIN, -1 LOSS, 0)
+    POSICAO: struct.Struct('<bddd'),     # tipo, preço de entrada, profit_perc, loss_perc
+    EXECUCAO: struct.Struct('<bdddb'),   # tipo, preço executado, alvo, stop, saída (1 GAIN, -1 LOSS)
+}
+
+SINAIS = {'long': 1, 'short': -1, None: 0}
+SAIDAS = {'GAIN': 1, 'LOSS': -1, None: 0}
+
+
+# Grava em ordem, num único arquivo, tudo o que o motor viu e decidiu: ticks,
+# klines do stream, semeaduras do buffer, posições informadas pela corretora
+# (preço de entrada e parâmetros de alvo/stop), sinais de entrada,
+# verificações de saída e saídas executadas pelas proteções na corretora. Cada série (symbol, interval) recebe um id de 2 bytes na primeira vez
+# que aparece. O arquivo é aberto em modo append; cada partida começa uma
+# sessão nova (registro INICIO). A escrita vai para um buffer em memória,
+# descarregado a cada GRAVACAO_INTERVALO segundos e na saída do processo.
+class Gravador:
+    def __init__(self, arquivo, intervalo=GRAVACAO_INTERVALO):
+        self.arquivo = arquivo
+        self._f = open(arquivo, 'ab', buffering=1 << 20)
+        self._series = {}
+        # Última posição gravada de cada série (só mudanças vão para o arquivo)
+        self._posicoes = {}
+        self._lock = threading.Lock()
+        self._escrever(INICIO, 0, MAGICO, VERSAO)
+        self._thread = threading.Thread(target=self._descarregar, args=(intervalo,), name='gravador', daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+        logging.info(f"Gravando entradas e decisões do motor em {arquivo}")
+
+    @staticmethod
+    def _registro(tipo, serie, *valores, extra=b''):
+        return CABECALHO.pack(tipo, serie, time.time_ns()) + CORPOS[tipo].pack(*valores) + extra
+
+    def _escrever(self, tipo, serie, *valores, extra=b''):
+        registro = self._registro(tipo, serie, *valores, extra=extra)
+        with self._lock:
+            if not self._f.closed:
+                self._f.write(registro)
+
+    def _serie(self, symbol, interval):
+        chave = (symbol, interval)
+        serie = self._series.get(chave)
+        if serie is None:
+            # A definição da série vai para o arquivo antes de qualquer registro que a use
+            with self._lock:
+                serie = self._series.get(chave)
+                if serie is None:
+                    serie = len(self._series)
+                    nome = f"{symbol} {interval}".encode()
+                    if not self._f.closed:
+                        self._f.write(self._registro(SERIE, serie, CAPACIDADE, len(nome), extra=nome))
+                    self._series[chave] = serie
+        return serie
+
+    def _descarregar(self, intervalo):
+        while True:
+            time.sleep(intervalo)
+            try:
+                with self._lock:
+                    if self._f.closed:
+                        return
+                    self._f.flush()
+            except OSError as e:
+                logging.error(f"Erro ao gravar o diário em {self.arquivo}: {e}")
+
+    def fechar(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+    # ================= REGISTROS ================= #
+    # Klines, semeaduras e sinais de entrada devem ser gravados sob o lock do
+    # buffer, junto com a mudança ou leitura correspondente: assim a ordem no
+    # diário é a mesma em que o buffer as viu
+
+    def tick(self, symbol, interval, preco):
+        self._escrever(TICK, self._serie(symbol, interval), preco)
+
+    def kline(self, symbol, interval, kline, fechado):
+        self._escrever(KLINE, self._serie(symbol, interval), *(float(x) for x in kline[:6]), fechado)
+
+    def semeadura(self, symbol, interval, klines):
+        # As mesmas linhas que BufferCandles.semear usa
+        arr = np.ascontiguousarray(np.asarray(klines, dtype='<f8')[-CAPACIDADE:, :6])
+        self._escrever(SEMEADURA, self._serie(symbol, interval), len(arr), extra=arr.tobytes())
+
+    def entrada(self, symbol, interval, sinal):
+        self._escrever(ENTRADA, self._serie(symbol, interval), SINAIS[sinal])
+
+    def posicao(self, symbol, interval, tipo, preco_entrada, profit_perc, loss_perc):
+        # A posição em que as verificações de saída seguintes se baseiam
+        serie = self._serie(symbol, interval)
+        valores = (SINAIS[tipo], preco_entrada, profit_perc, loss_perc)
+        if self._posicoes.get(serie) != valores:
+            self._posicoes[serie] = valores
+            self._escrever(POSICAO, serie, *valores)
+
+    def saida(self, symbol, interval, tipo, preco, alvo, stop, saida):
+        serie = self._serie(symbol, interval)
+        self._escrever(SAIDA, serie, SINAIS[tipo], preco, alvo, stop, SAIDAS[saida])
+        if saida:
+            # Posição encerrada: a próxima é gravada mesmo que pareça igual
+            self._posicoes.pop(serie, None)
+
+    def execucao(self, symbol, interval, tipo, preco, alvo, stop, saida):
+        # Take-profit ou stop executado na corretora; encerra a posição
+        serie = self._serie(symbol, interval)
+        self._escrever(EXECUCAO, serie, SINAIS[tipo], preco, alvo, stop, SAIDAS[saida])
+        self._posicoes.pop(serie, None)
+
+
+def abrir(arquivo=None):
+    # Gravador do motor, ou None com a gravação desativada
+    arquivo = arquivo or GRAVACAO_ARQUIVO
+    return Gravador(arquivo) if arquivo else None
+
+
+# ================= LEITURA ================= #
+
+class DiarioInvalido(Exception):
+    pass
+
+
+def ler(arquivo):
+    # Registros (tipo, serie, instante_ns, valores, extra) na ordem gravada.
+    # Um registro incompleto no fim (queda durante a escrita) é ignorado
+    with open(arquivo, 'rb') as f:
+        dados = f.read()
+    pos = 0
+    fim = len(dados)
+    while pos + CABECALHO.size <= fim:
+        tipo, serie, instante = CABECALHO.unpack_from(dados, pos)
+        corpo = CORPOS.get(tipo)
+        if corpo is None:
+            raise DiarioInvalido(f"Tipo de registro desconhecido {tipo} na posição {pos}")
+        inicio = pos + CABECALHO.size
+        if inicio + corpo.size > fim:
+            return
+        valores = corpo.unpack_from(dados, inicio)
+        pos = inicio + corpo.size
+        tamanho_extra = valores[1] if tipo == SERIE else valores[0] * 48 if tipo == SEMEADURA else 0
+        if pos + tamanho_extra > fim:
+            return
+        extra = dados[pos:pos + tamanho_extra]
+        pos += tamanho_extra
+        if tipo == INICIO and (valores[0] != MAGICO or valores[1] != VERSAO):
+            raise DiarioInvalido(f"Sessão com cabeçalho {valores[0]!r} v{valores[1]} não suportada")
+        yield tipo, serie, instante, valores, extra
+
+
+# ================= REPRODUÇÃO ================= #
+
+# Reconstrói os buffers de candles a partir do diário e refaz cada decisão com
+# as mesmas funções da estratégia usadas pelo bot, comparando com a gravada.
+# Nas saídas, o que é comparado é reconstruído pela reprodução: a direção da
+# posição vem do último sinal de entrada reproduzido, alvo e stop do preço de
+# entrada e dos parâmetros gravados (POSICAO), e o preço avaliado tem de ser um
+# dos ticks da série. Numa saída executada pelas proteções da corretora o preço
+# é o da execução, e o resultado tem de ser o do lado em que ele ficou em
+# relação à entrada. `velocidade` None reproduz o mais rápido possível; N
+# reproduz N vezes mais rápido que o tempo real gravado
+class Reprodutor:
+    def __init__(self, velocidade=None):
+        self.velocidade = velocidade
+        self.contagem = {t: 0 for t in CORPOS}
+        self.divergencias = []
+        self._sessao()
+
+    def _sessao(self):
+        # Partida nova do bot: buffers, posições e ids de série redefinidos
+        self._series = {}
+        self._buffers = {}
+        self._ticks = {}
+        self._preco_pendente = {}
+        self._sinais = {}
+        self._posicoes = {}
+
+    def _divergir(self, instante, serie, descricao):
+        nome = self._series.get(serie, ('?', '?'))[0]
+        self.divergencias.append((instante, nome, descricao))
+
+    def reproduzir(self, registros):
+        inicio_real = time.perf_counter()
+        primeiro = None
+        for tipo, serie, instante, valores, extra in registros:
+            if self.velocidade:
+                primeiro = instante if primeiro is None else primeiro
+                atraso = (instante - primeiro) / 1e9 / self.velocidade - (time.perf_counter() - inicio_real)
+                if atraso > 0:
+                    time.sleep(atraso)
+            self.contagem[tipo] += 1
+
+            if tipo == TICK:
+                self._tick(instante, serie, valores[0])
+            elif tipo == KLINE:
+                self._buffers[serie].atualizar(valores[:6])
+            elif tipo == ENTRADA:
+                ha_open, ha_close = self._buffers[serie].ultimos_ha(2)
+                sinal = SINAIS[sinal_heikin_ashi(ha_open, ha_close)]
+                if sinal != valores[0]:
+                    self._divergir(instante, serie, f"entrada gravada {valores[0]}, reproduzida {sinal}")
+                if sinal:
+                    self._sinais[serie] = sinal
+            elif tipo == POSICAO:
+                self._posicao(instante, serie, *valores)
+            elif tipo == SAIDA:
+                self._saida(instante, serie, *valores)
+            elif tipo == EXECUCAO:
+                self._execucao(instante, serie, *valores)
+            elif tipo == SEMEADURA:
+                self._buffers[serie].semear(np.frombuffer(extra, dtype='<f8').reshape(-1, 6))
+            elif tipo == SERIE:
+                symbol, interval = extra.decode().split(' ')
+                self._series[serie] = (symbol, interval)
+                self._buffers[serie] = BufferCandles(interval, valores[0])
+            elif tipo == INICIO:
+                self._sessao()
+        return time.perf_counter() - inicio_real
+
+    def _tick(self, instante, serie, preco):
+        # Uma saída pode ser gravada logo antes do tick que o bot já tinha
+        # visto (o preço é publicado antes do callback que grava o tick)
+        pendente = self._preco_pendente.pop(serie, None)
+        if pendente and pendente[1] != preco:
+            self._divergir(pendente[0], serie, f"saída avaliada a {pendente[1]}, preço que não veio dos ticks")
+        self._ticks.setdefault(serie, deque(maxlen=TICKS_RECENTES)).append(preco)
+
+    def _posicao(self, instante, serie, tipo_pos, preco_entrada, profit_perc, loss_perc):
+        # Posição aberta depois de um sinal tem de seguir a direção dele; sem
+        # sinal pendente (ex.: posição adotada na partida) vale a da corretora
+        sinal = self._sinais.pop(serie, None)
+        if sinal is not None and sinal != tipo_pos:
+            self._divergir(instante, serie, f"posição {tipo_pos} aberta após entrada reproduzida {sinal}")
+        nome = 'long' if tipo_pos > 0 else 'short'
+        self._posicoes[serie] = (tipo_pos, preco_entrada, calcula_alvo(preco_entrada, nome, profit_perc),
+                                 calcula_stop(preco_entrada, nome, loss_perc))
+
+    def _conferir_posicao(self, instante, serie, tipo_pos, alvo, stop):
+        tipo_r, _, alvo_r, stop_r = self._posicoes[serie]
+        if tipo_r != tipo_pos or not math.isclose(alvo, alvo_r, rel_tol=1e-12) or not math.isclose(stop, stop_r, rel_tol=1e-12):
+            self._divergir(instante, serie, f"posição gravada {tipo_pos} alvo {alvo} stop {stop}, "
+                                            f"reproduzida {tipo_r} alvo {alvo_r} stop {stop_r}")
+
+    def _saida(self, instante, serie, tipo_pos, preco, alvo, stop, gravada):
+        posicao = self._posicoes.get(serie)
+        if posicao is None:
+            self._divergir(instante, serie, f"saída avaliada a {preco} sem posição reproduzida")
+            return
+        if preco not in self._ticks.get(serie, ()):
+            self._preco_pendente[serie] = (instante, preco)
+        self._conferir_posicao(instante, serie, tipo_pos, alvo, stop)
+        tipo_r, _, alvo_r, stop_r = posicao
+        saida = SAIDAS[verificar_saida('long' if tipo_r > 0 else 'short', preco, alvo_r, stop_r)]
+        if saida != gravada:
+            self._divergir(instante, serie, f"saída gravada {gravada}, reproduzida {saida} a {preco}")
+        if gravada:
+            self._posicoes.pop(serie, None)
+
+    def _execucao(self, instante, serie, tipo_pos, preco, alvo, stop, gravada):
+        posicao = self._posicoes.get(serie)
+        if posicao is None:
+            self._divergir(instante, serie, f"proteção executada a {preco} sem posição reproduzida")
+            return
+        self._conferir_posicao(instante, serie, tipo_pos, alvo, stop)
+        tipo_r, entrada = posicao[:2]
+        saida = SAIDAS['GAIN' if (preco - entrada) * tipo_r > 0 else 'LOSS']
+        if saida != gravada:
+            self._divergir(instante, serie, f"proteção executada a {preco} (entrada {entrada}) gravada como {gravada}, "
+                                            f"reproduzida {saida}")
+        self._posicoes.pop(serie, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz um diário gravado pelo bot e confere as decisões")
+    parser.add_argument('arquivo', help="diário gravado com GRAVACAO_ARQUIVO")
+    parser.add_argument('--velocidade', type=float,
+                        help="N vezes o tempo real gravado (padrão: o mais rápido possível)")
+    parser.add_argument('--max-divergencias', type=int, default=20, help="divergências listadas")
+    args = parser.parse_args()
+
+    reprodutor = Reprodutor(args.velocidade)
+    duracao = reprodutor.reproduzir(ler(args.arquivo))
+
+    c = reprodutor.contagem
+    registros = sum(c.values())
+    decisoes = c[ENTRADA] + c[SAIDA] + c[EXECUCAO]
+    print(f"{registros} registros em {duracao:.2f}s ({registros / duracao:,.0f}/s) | sessões: {c[INICIO]}")
+    print(f"Ticks: {c[TICK]} | Klines: {c[KLINE]} | Semeaduras: {c[SEMEADURA]}")
+    print(f"Decisões: {decisoes} ({decisoes / duracao:,.0f}/s) | entradas: {c[ENTRADA]} | saídas: {c[SAIDA]}"
+          f" | posições: {c[POSICAO]} | execuções na corretora: {c[EXECUCAO]}")
+
+    for instante, symbol, descricao in reprodutor.divergencias[:args.max_divergencias]:
+        data = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(instante / 1e9))
+        print(f"[{symbol}] {data}: {descricao}")
+    if reprodutor.divergencias:
+        print(f"{len(reprodutor.divergencias)} decisões divergentes")
+        sys.exit(1)
+    print("Todas as decisões reproduzidas de forma idêntica")
+
+
+if __name__ == '__main__':
+    main()
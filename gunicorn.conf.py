@@ -0,0 +1,28 @@
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Os workers só servem o painel; o motor de trading roda num processo à parte
+# (on_starting) e publica o status em memória compartilhada. Cada aba aberta
+# segura uma conexão SSE, por isso as threads.
+workers = int(os.getenv('WEB_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 32))
+timeout = 60
+keepalive = 5
+accesslog = None
+loglevel = 'info'
+
+
+def on_starting(server):
+    import processo_motor
+    # Mesma chave de sessão em todos os workers
+    os.environ.setdefault('FLASK_SECRET_KEY', os.urandom(24).hex())
+    # Criado antes dos workers, que herdam o canal de status e a fila de comandos
+    processo_motor.iniciar()
+
+
+def on_exit(server):
+    import processo_motor
+    if processo_motor.processo:
+        processo_motor.processo.parar()
@@ -0,0 +1,194 @@
+import os
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from candles import intervalo_em_ms
+from cliente_async import ClienteBinanceAsync, ClienteSincrono
+
+HISTORICO_DIR = os.getenv('HISTORICO_DIR', 'historico')
+# Máximo de candles por requisição de klines em futuros
+LIMITE_KLINES = 1500
+
+# Um arquivo binário por coluna, na ordem das linhas T..V de candles.py
+COLUNAS = (
+    ('open_time', np.dtype('<i8')),
+    ('open', np.dtype('<f8')),
+    ('high', np.dtype('<f8')),
+    ('low', np.dtype('<f8')),
+    ('close', np.dtype('<f8')),
+    ('volume', np.dtype('<f8')),
+)
+
+
+# Histórico local de candles fechados de um símbolo/intervalo em
+# HISTORICO_DIR/<symbol>/<interval>/<coluna>.bin. Os arquivos só crescem
+# (append), o número de candles sai do tamanho deles e as leituras são views
+# memory-mapped, sem cópia. open_time é crescente e serve de índice de tempo.
+class HistoricoKlines:
+    def __init__(self, symbol, interval, diretorio=HISTORICO_DIR):
+        self.symbol = symbol
+        self.interval = interval
+        self.intervalo_ms = intervalo_em_ms(interval)
+        self.caminho = os.path.join(diretorio, symbol, interval)
+        os.makedirs(self.caminho, exist_ok=True)
+        self.lock = threading.Lock()
+        self._mapas = None
+        self._mapeados = -1
+        self.tamanho = self._recuperar()
+        self.ultimo_t = int(self._mapear()[0][-1]) if self.tamanho else None
+
+    def _arquivo(self, nome):
+        return os.path.join(self.caminho, f"{nome}.bin")
+
+    def _recuperar(self):
+        # Uma escrita interrompida pode deixar colunas com tamanhos diferentes:
+        # todas são cortadas no menor número de candles completos
+        tamanhos = []
+        for nome, tipo in COLUNAS:
+            arquivo = self._arquivo(nome)
+            if not os.path.exists(arquivo):
+                open(arquivo, 'wb').close()
+            tamanhos.append(os.path.getsize(arquivo) // tipo.itemsize)
+        n = min(tamanhos)
+        for nome, tipo in COLUNAS:
+            if os.path.getsize(self._arquivo(nome)) != n * tipo.itemsize:
+                logging.warning(f"[{self.symbol}] Histórico {self.interval}: coluna {nome} cortada em {n} candles")
+                os.truncate(self._arquivo(nome), n * tipo.itemsize)
+        return n
+
+    def _mapear(self):
+        # Remapeia só quando o arquivo cresceu; mapas antigos continuam válidos
+        if self._mapeados != self.tamanho:
+            self._mapas = [
+                np.memmap(self._arquivo(nome), dtype=tipo, mode='r', shape=(self.tamanho,))
+                if self.tamanho else np.empty(0, tipo)
+                for nome, tipo in COLUNAS
+            ]
+            self._mapeados = self.tamanho
+        return self._mapas
+
+    # ================= ESCRITA ================= #
+
+    def anexar(self, klines, continuo=False):
+        # klines: linhas [open_time, open, high, low, close, volume, ...] de candles
+        # fechados. Candles já gravados são ignorados; com continuo=True, um buraco
+        # em relação ao último gravado recusa a escrita (fica para completar())
+        arr = np.asarray(klines, dtype=np.float64)
+        if not len(arr):
+            return 0
+        arr = arr[:, :6]
+        with self.lock:
+            if self.ultimo_t is not None:
+                arr = arr[arr[:, 0] > self.ultimo_t]
+                if continuo and len(arr) and arr[0, 0] != self.ultimo_t + self.intervalo_ms:
+                    return 0
+            if not len(arr):
+                return 0
+            if np.any(np.diff(arr[:, 0]) <= 0):
+                raise ValueError(f"[{self.symbol}] klines fora de ordem")
+            for (nome, tipo), coluna in zip(COLUNAS, arr.T):
+                with open(self._arquivo(nome), 'ab') as f:
+                    f.write(coluna.astype(tipo).tobytes())
+            self.tamanho += len(arr)
+            self.ultimo_t = int(arr[-1, 0])
+            return len(arr)
+
+    def completar(self, buscar, desde=None, offset_ms=0):
+        # Baixa os candles fechados que faltam até agora. buscar(start_time, limite)
+        # devolve klines da API; desde só vale para um histórico vazio (None = os
+        # últimos LIMITE_KLINES). Devolve o candle em formação, se veio na resposta.
+        # Cada requisição pede só os candles até agora (o peso da Binance cresce
+        # com o limit: um buraco de poucos candles custa 1, não 10)
+        inicio = self.ultimo_t + self.intervalo_ms if self.ultimo_t is not None else desde
+        em_formacao = None
+        while True:
+            limite = LIMITE_KLINES
+            if inicio is not None:
+                faltando = (time.time() * 1000 + offset_ms - inicio) // self.intervalo_ms + 2
+                limite = int(min(max(faltando, 1), LIMITE_KLINES))
+            klines = buscar(inicio, limite)
+            if not klines:
+                break
+            linhas = [[float(v) for v in k[:7]] for k in klines]
+            agora = time.time() * 1000 + offset_ms
+            # Coluna 6 é o close_time do candle
+            fechados = [k[:6] for k in linhas if k[6] < agora]
+            self.anexar(fechados)
+            if len(fechados) < len(linhas):
+                em_formacao = linhas[-1][:6]
+                break
+            if len(klines) < limite:
+                break
+            inicio = int(linhas[-1][0]) + self.intervalo_ms
+        return em_formacao
+
+    # ================= LEITURA ================= #
+
+    def colunas(self, inicio=None, fim=None):
+        # Views somente leitura dos candles com open_time em [inicio, fim)
+        with self.lock:
+            mapas = self._mapear()
+        tempo = mapas[0]
+        a = 0 if inicio is None else int(np.searchsorted(tempo, inicio, 'left'))
+        b = len(tempo) if fim is None else int(np.searchsorted(tempo, fim, 'left'))
+        return [m[a:b] for m in mapas]
+
+    def ultimos(self, n):
+        with self.lock:
+            mapas = self._mapear()
+        return [m[max(len(m) - n, 0):] for m in mapas]
+
+
+historicos = {}
+historicos_lock = threading.Lock()
+
+
+def obter_historico(symbol, interval, diretorio=HISTORICO_DIR):
+    chave = (symbol, interval, diretorio)
+    with historicos_lock:
+        if chave not in historicos:
+            historicos[chave] = HistoricoKlines(symbol, interval, diretorio)
+        return historicos[chave]
+
+
+def abrir(caminho):
+    # Abre um histórico pelo caminho <diretorio>/<symbol>/<interval>
+    pasta_symbol, interval = os.path.split(os.path.normpath(caminho))
+    diretorio, symbol = os.path.split(pasta_symbol)
+    return obter_historico(symbol, interval, diretorio)
+
+
+def _data_ms(texto):
+    return int(datetime.strptime(texto, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baixa (ou completa) o histórico local de klines de futuros")
+    parser.add_argument('symbol')
+    parser.add_argument('interval')
+    parser.add_argument('--desde', help="data inicial YYYY-MM-DD para um histórico vazio")
+    parser.add_argument('--diretorio', default=HISTORICO_DIR)
+    args = parser.parse_args()
+
+    # klines é público: dispensa chaves
+    api = ClienteSincrono(ClienteBinanceAsync(None, None))
+    api.cliente.offset_ms = api.server_time() - int(time.time() * 1000)
+    symbol = args.symbol.upper()
+    hist = obter_historico(symbol, args.interval, args.diretorio)
+    antes = hist.tamanho
+    inicio = time.perf_counter()
+    hist.completar(lambda start_time, limite: api.klines(symbol, args.interval, limite, start_time=start_time),
+                   _data_ms(args.desde) if args.desde else None, api.cliente.offset_ms)
+    print(f"[{symbol}] {hist.tamanho - antes} candles novos em {time.perf_counter() - inicio:.1f}s, {hist.tamanho} no total")
+    if hist.tamanho:
+        tempo = hist.colunas()[0]
+        print(f"De {datetime.fromtimestamp(tempo[0] / 1000, timezone.utc)} a {datetime.fromtimestamp(tempo[-1] / 1000, timezone.utc)}")
+
+
+if __name__ == '__main__':
+    main()
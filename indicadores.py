@@ -0,0 +1,144 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Indicadores vetorizados sobre arrays float64 contíguos. Cada indicador tem
+# também uma versão "_atualizar" que avança o valor com um único candle novo.
+
+
+def _array(valores):
+    return np.ascontiguousarray(valores, dtype=np.float64)
+
+
+def _suavizar(x, alpha):
+    # y[0] = x[0]; y[i] = (1 - alpha) * y[i-1] + alpha * x[i]  (laço em C via pandas)
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+# ================= SMA ================= #
+
+def sma(valores, periodo):
+    x = _array(valores)
+    saida = np.full(len(x), np.nan)
+    if len(x) >= periodo:
+        soma = np.concatenate(([0.0], np.cumsum(x)))
+        saida[periodo - 1:] = (soma[periodo:] - soma[:-periodo]) / periodo
+    return saida
+
+
+def sma_ultimo(valores, periodo):
+    x = _array(valores)
+    if len(x) < periodo:
+        return np.nan
+    return float(x[-periodo:].mean())
+
+
+class SMARolante:
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.janela = deque(maxlen=periodo)
+        self.soma = 0.0
+
+    def atualizar(self, valor):
+        if len(self.janela) == self.periodo:
+            self.soma -= self.janela[0]
+        self.janela.append(valor)
+        self.soma += valor
+        if len(self.janela) < self.periodo:
+            return np.nan
+        return self.soma / self.periodo
+
+
+# ================= EMA ================= #
+
+def ema(valores, periodo):
+    x = _array(valores)
+    if not len(x):
+        return x
+    return _suavizar(x, 2 / (periodo + 1))
+
+
+def ema_atualizar(ema_anterior, valor, periodo):
+    alpha = 2 / (periodo + 1)
+    return ema_anterior + alpha * (valor - ema_anterior)
+
+
+# ================= HEIKIN-ASHI ================= #
+
+def heikin_ashi(open_, high, low, close):
+    o, h, l, c = _array(open_), _array(high), _array(low), _array(close)
+    ha_close = (o + h + l + c) / 4
+    if not len(o):
+        return o, h, l, ha_close
+    # ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2, começando em (open[0] + close[0]) / 2
+    base = np.empty(len(o))
+    base[0] = (o[0] + c[0]) / 2
+    base[1:] = ha_close[:-1]
+    ha_open = _suavizar(base, 0.5)
+    ha_high = np.maximum(h, np.maximum(ha_open, ha_close))
+    ha_low = np.minimum(l, np.minimum(ha_open, ha_close))
+    return ha_open, ha_high, ha_low, ha_close
+
+
+def heikin_ashi_atualizar(ha_open_anterior, ha_close_anterior, o, h, l, c):
+    ha_close = (o + h + l + c) / 4
+    ha_open = (ha_open_anterior + ha_close_anterior) / 2
+    return ha_open, max(h, ha_open, ha_close), min(l, ha_open, ha_close), ha_close
+
+
+# ================= ATR ================= #
+
+def true_range(high, low, close):
+    h, l, c = _array(high), _array(low), _array(close)
+    tr = h - l
+    if len(c) > 1:
+        anterior = c[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(h[1:] - anterior), np.abs(l[1:] - anterior)))
+    return tr
+
+
+def atr(high, low, close, periodo=14):
+    # Suavização de Wilder, semeada com a média simples dos primeiros `periodo` TRs
+    tr = true_range(high, low, close)
+    saida = np.full(len(tr), np.nan)
+    if len(tr) >= periodo:
+        base = tr[periodo - 1:].copy()
+        base[0] = tr[:periodo].mean()
+        saida[periodo - 1:] = _suavizar(base, 1 / periodo)
+    return saida
+
+
+def atr_atualizar(atr_anterior, h, l, c, close_anterior, periodo=14):
+    tr = max(h - l, abs(h - close_anterior), abs(l - close_anterior))
+    return atr_anterior + (tr - atr_anterior) / periodo
+
+
+# ================= RSI ================= #
+
+def _rsi(ganho_medio, perda_medio):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(perda_medio == 0, 100.0, 100 - 100 / (1 + ganho_medio / perda_medio))
+
+
+def rsi(close, periodo=14):
+    c = _array(close)
+    saida = np.full(len(c), np.nan)
+    if len(c) <= periodo:
+        return saida
+    delta = np.diff(c)
+    ganhos = np.clip(delta, 0, None)
+    perdas = np.clip(-delta, 0, None)
+    g = ganhos[periodo - 1:].copy()
+    p = perdas[periodo - 1:].copy()
+    g[0] = ganhos[:periodo].mean()
+    p[0] = perdas[:periodo].mean()
+    saida[periodo:] = _rsi(_suavizar(g, 1 / periodo), _suavizar(p, 1 / periodo))
+    return saida
+
+
+def rsi_atualizar(ganho_medio, perda_medio, delta, periodo=14):
+    ganho_medio += (max(delta, 0.0) - ganho_medio) / periodo
+    perda_medio += (max(-delta, 0.0) - perda_medio) / periodo
+    valor = 100.0 if perda_medio == 0 else 100 - 100 / (1 + ganho_medio / perda_medio)
+    return ganho_medio, perda_medio, valor
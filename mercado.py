@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import websockets
+
+# URL base dos streams de futuros (pode apontar para um servidor local em testes)
+WS_URL = os.getenv('BINANCE_WS_URL', 'wss://fstream.binance.com')
+
+
+# Conexão websocket rodando em thread própria, com reconexão automática.
+# Subclasses informam a URL (recalculada a cada conexão) e tratam as mensagens
+class ClienteWS(ABC):
+    def __init__(self, nome):
+        self.nome = nome
+        self.loop = None
+        self.conectado = threading.Event()
+        self._thread = None
+        self._rodando = False
+        self._ws = None
+
+    @abstractmethod
+    async def url(self):
+        pass
+
+    async def ao_conectar(self):
+        pass
+
+    async def ao_desconectar(self):
+        pass
+
+    @abstractmethod
+    async def ao_receber(self, msg):
+        pass
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._rodando = True
+        self._thread = threading.Thread(target=self._executar, name=self.nome, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._rodando = False
+        self.reconectar()
+
+    def reconectar(self):
+        # Fecha a conexão atual; o laço principal reconecta com a URL atualizada
+        if self.loop and self._ws:
+            asyncio.run_coroutine_threadsafe(self._ws.close(), self.loop)
+
+    def _executar(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._conectar_sempre())
+
+    async def _conectar_sempre(self):
+        espera = 1
+        while self._rodando:
+            try:
+                async with websockets.connect(await self.url(), ping_interval=20, max_queue=None) as ws:
+                    self._ws = ws
+                    self.conectado.set()
+                    espera = 1
+                    logging.info(f"{self.nome}: conectado")
+                    await self.ao_conectar()
+                    async for bruto in ws:
+                        try:
+                            await self.ao_receber(json.loads(bruto))
+                        except Exception as e:
+                            logging.error(f"{self.nome}: erro ao processar mensagem: {e}")
+            except Exception as e:
+                if self._rodando:
+                    logging.warning(f"{self.nome}: conexão perdida ({e}), reconectando em {espera}s")
+            finally:
+                self._ws = None
+                self.conectado.clear()
+                await self.ao_desconectar()
+            if self._rodando:
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 30)
+
+
+# Mantém em memória o último preço, book e candle de cada símbolo
+class StreamMercado(ClienteWS):
+    def __init__(self, simbolos, interval, base_url=WS_URL):
+        super().__init__('stream-mercado')
+        self.simbolos = [s.upper() for s in simbolos]
+        self.interval = interval
+        self.base_url = base_url.rstrip('/')
+        self.precos = {}
+        self.mark = {}
+        self.book = {}
+        self.klines = {}
+        self.atualizado_em = {}
+        self.ao_tick = []
+        self.ao_kline = []
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    async def url(self):
+        streams = []
+        for s in self.simbolos:
+            s = s.lower()
+            streams += [f"{s}@markPrice@1s", f"{s}@bookTicker", f"{s}@kline_{self.interval}"]
+        return f"{self.base_url}/stream?streams={'/'.join(streams)}"
+
+    def atualizar(self, simbolos, interval):
+        simbolos = [s.upper() for s in simbolos]
+        if simbolos == self.simbolos and interval == self.interval:
+            return
+        self.simbolos = simbolos
+        self.interval = interval
+        self.reconectar()
+
+    async def ao_receber(self, msg):
+        dados = msg.get('data', msg)
+        evento = dados.get('e')
+        s = dados.get('s')
+
+        if evento == 'bookTicker':
+            bid, ask = float(dados['b']), float(dados['a'])
+            self.book[s] = (bid, ask)
+            self._novo_preco(s, (bid + ask) / 2)
+        elif evento == 'markPriceUpdate':
+            self.mark[s] = float(dados['p'])
+            # Sem book ainda, o mark price serve como preço corrente
+            if s not in self.book:
+                self._novo_preco(s, self.mark[s])
+        elif evento == 'kline':
+            k = dados['k']
+            # Da conexão anterior a uma troca de intervalo, ainda fechando
+            if k.get('i', self.interval) != self.interval:
+                return
+            kline = [float(k['t']), float(k['o']), float(k['h']), float(k['l']),
+                     float(k['c']), float(k['v']), float(k['T'])]
+            self.klines[s] = kline
+            for cb in self.ao_kline:
+                self._disparar(cb, s, kline, k['x'])
+            self._notificar()
+
+    def _novo_preco(self, symbol, preco):
+        self.precos[symbol] = preco
+        self.atualizado_em[symbol] = time.time()
+        for cb in self.ao_tick:
+            self._disparar(cb, symbol, preco)
+        self._notificar()
+
+    def _disparar(self, cb, *args):
+        try:
+            cb(*args)
+        except Exception as e:
+            logging.error(f"{self.nome}: erro em callback: {e}")
+
+    def _notificar(self):
+        with self._cond:
+            self._seq += 1
+            self._cond.notify_all()
+
+    def preco(self, symbol, idade_max=5):
+        # Retorna None se o stream não tiver um preço recente para o símbolo
+        atualizado = self.atualizado_em.get(symbol)
+        if atualizado is None or time.time() - atualizado > idade_max:
+            return None
+        return self.precos.get(symbol)
+
+    def aguardar_tick(self, timeout):
+        # Bloqueia até chegar uma nova mensagem de mercado ou estourar o timeout
+        with self._cond:
+            seq = self._seq
+            return self._cond.wait_for(lambda: self._seq != seq, timeout)
@@ -0,0 +1,226 @@
+import os
+import sys
+import time
+import logging
+import functools
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager
+
+# Arquivo onde as métricas são gravadas periodicamente (vazio desativa)
+METRICAS_ARQUIVO = os.getenv('METRICAS_ARQUIVO', '')
+METRICAS_INTERVALO = float(os.getenv('METRICAS_INTERVALO', 10))
+# Amostras mais recentes usadas no cálculo dos quantis de cada série
+METRICAS_JANELA = int(os.getenv('METRICAS_JANELA', 2048))
+QUANTIS = (0.5, 0.99)
+
+# Perfilador por amostragem (opt-in): pilhas de todas as threads a cada
+# PERFIL_INTERVALO, gravadas no formato "folded" dos flame graphs
+PERFIL = os.getenv('PERFIL') == '1'
+PERFIL_INTERVALO = float(os.getenv('PERFIL_INTERVALO', 0.01))
+PERFIL_ARQUIVO = os.getenv('PERFIL_ARQUIVO', 'perfil.folded')
+
+FAMILIAS = {
+    'bot_etapa_segundos': ('etapa', "Duração das etapas do motor de trading"),
+    'bot_rest_segundos': ('caminho', "Latência das requisições REST à Binance"),
+    'bot_http_segundos': ('rota', "Duração das requisições ao painel web"),
+}
+# Valores instantâneos (gauges), exportados com o último valor definido
+MEDIDORES = {
+    'bot_relogio_offset_ms': "Diferença estimada entre o relógio da Binance e o local (ms)",
+    'bot_relogio_rtt_ms': "Ida e volta até a Binance medida na sincronização do relógio (ms)",
+}
+
+
+# Uma série de latências: contagem, soma e máximo desde a partida e uma
+# janela com as últimas amostras para os quantis. Registrar é O(1); a
+# ordenação só acontece na exportação.
+class Serie:
+    def __init__(self, janela=METRICAS_JANELA):
+        self.amostras = deque(maxlen=janela)
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos):
+        with self._lock:
+            self.amostras.append(segundos)
+            self.contagem += 1
+            self.soma += segundos
+            if segundos > self.maximo:
+                self.maximo = segundos
+
+    def resumo(self):
+        with self._lock:
+            amostras = sorted(self.amostras)
+            contagem, soma, maximo = self.contagem, self.soma, self.maximo
+        quantis = {q: amostras[min(len(amostras) - 1, int(q * len(amostras)))] if amostras else 0.0 for q in QUANTIS}
+        return {"contagem": contagem, "soma": soma, "max": maximo, "quantis": quantis}
+
+
+_series = {}
+_series_lock = threading.Lock()
+
+
+def serie(familia, rotulo):
+    chave = (familia, rotulo)
+    s = _series.get(chave)
+    if s is None:
+        with _series_lock:
+            s = _series.setdefault(chave, Serie())
+    return s
+
+
+def registrar(familia, rotulo, segundos):
+    serie(familia, rotulo).registrar(segundos)
+
+
+_medidores = {}
+
+
+def definir(nome, valor):
+    _medidores[nome] = valor
+
+
+@contextmanager
+def cronometro(rotulo, familia='bot_etapa_segundos'):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(familia, rotulo, time.perf_counter() - inicio)
+
+
+def cronometrado(rotulo, familia='bot_etapa_segundos'):
+    # Decorador equivalente ao cronometro
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def medir(*args, **kwargs):
+            with cronometro(rotulo, familia):
+                return funcao(*args, **kwargs)
+        return medir
+    return decorar
+
+
+# ================= EXPORTAÇÃO ================= #
+
+def exportar():
+    # Formato de texto do Prometheus: um summary por família (quantis, _sum,
+    # _count) e um gauge com o máximo, seguidos dos medidores
+    with _series_lock:
+        series = sorted(_series.items())
+    linhas = []
+    for familia, (rotulo_nome, ajuda) in FAMILIAS.items():
+        resumos = [(rotulo, s.resumo()) for (f, rotulo), s in series if f == familia]
+        if not resumos:
+            continue
+        linhas.append(f"# HELP {familia} {ajuda}")
+        linhas.append(f"# TYPE {familia} summary")
+        for rotulo, r in resumos:
+            for q, valor in r["quantis"].items():
+                linhas.append(f'{familia}{{{rotulo_nome}="{rotulo}",quantile="{q}"}} {valor:.6f}')
+            linhas.append(f'{familia}_sum{{{rotulo_nome}="{rotulo}"}} {r["soma"]:.6f}')
+            linhas.append(f'{familia}_count{{{rotulo_nome}="{rotulo}"}} {r["contagem"]}')
+        linhas.append(f"# HELP {familia}_max Maior duração observada")
+        linhas.append(f"# TYPE {familia}_max gauge")
+        for rotulo, r in resumos:
+            linhas.append(f'{familia}_max{{{rotulo_nome}="{rotulo}"}} {r["max"]:.6f}')
+    for nome, ajuda in MEDIDORES.items():
+        valor = _medidores.get(nome)
+        if valor is None:
+            continue
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} gauge")
+        linhas.append(f"{nome} {valor:.3f}")
+    return ''.join(linha + '\n' for linha in linhas)
+
+
+def _gravar_atomico(arquivo, texto):
+    temporario = f"{arquivo}.tmp"
+    with open(temporario, 'w') as f:
+        f.write(texto)
+    os.replace(temporario, arquivo)
+
+
+def iniciar_gravacao(arquivo=None, intervalo=METRICAS_INTERVALO):
+    # Grava as métricas a cada `intervalo` segundos
+    arquivo = arquivo or METRICAS_ARQUIVO
+    if not arquivo:
+        return None
+
+    def gravar():
+        while True:
+            time.sleep(intervalo)
+            try:
+                _gravar_atomico(arquivo, exportar())
+            except OSError as e:
+                logging.error(f"Erro ao gravar métricas em {arquivo}: {e}")
+
+    thread = threading.Thread(target=gravar, name='metricas', daemon=True)
+    thread.start()
+    return thread
+
+
+# ================= PERFILADOR ================= #
+
+# Amostra periodicamente as pilhas de todas as threads do processo e conta
+# cada pilha distinta ("modulo:funcao;modulo:funcao ..." da base ao topo)
+class Perfilador:
+    def __init__(self, intervalo=PERFIL_INTERVALO, arquivo=PERFIL_ARQUIVO):
+        self.intervalo = intervalo
+        self.arquivo = arquivo
+        self.pilhas = Counter()
+        self.amostras = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._amostrar, name='perfilador', daemon=True)
+        self._thread.start()
+        logging.info(f"Perfilador ativo: amostras a cada {self.intervalo * 1000:.0f} ms em {self.arquivo}")
+
+    def _amostrar(self):
+        proprio = threading.get_ident()
+        nomes = {}
+        gravado_em = time.time()
+        while True:
+            time.sleep(self.intervalo)
+            if time.time() - gravado_em >= METRICAS_INTERVALO:
+                gravado_em = time.time()
+                try:
+                    self.gravar()
+                except OSError as e:
+                    logging.error(f"Erro ao gravar perfil em {self.arquivo}: {e}")
+            if len(nomes) != threading.active_count():
+                nomes = {t.ident: t.name for t in threading.enumerate()}
+            coletadas = []
+            for ident, frame in sys._current_frames().items():
+                if ident == proprio:
+                    continue
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                pilha.append(nomes.get(ident, str(ident)))
+                coletadas.append(';'.join(reversed(pilha)))
+            with self._lock:
+                self.pilhas.update(coletadas)
+                self.amostras += 1
+
+    def gravar(self):
+        with self._lock:
+            linhas = [f"{pilha} {n}" for pilha, n in self.pilhas.most_common()]
+        _gravar_atomico(self.arquivo, ''.join(linha + '\n' for linha in linhas))
+
+
+perfilador = None
+
+
+def iniciar_perfil():
+    global perfilador
+    if perfilador is None:
+        perfilador = Perfilador()
+        perfilador.iniciar()
+    return perfilador
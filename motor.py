@@ -0,0 +1,146 @@
+import os
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', 16))
+
+
+def status_inicial():
+    return {
+        "preco_atual": "---",
+        "preco": "---",
+        "posicao": "---",
+        "quantidade": "---",
+        "direcao": "---",
+        "log": "Iniciando bot...",
+        "losses": "---",
+        "gales": "---",
+        "preco_fechamento": "---",
+        "quantidade_fechamento": "---",
+        "lucro_usdt": "---"
+    }
+
+
+# Estado isolado de uma instância da estratégia (um por símbolo)
+class EstadoSimbolo:
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.ativo = True
+        self.posicao = None
+        self.ultima_consulta = 0
+        self.status = status_inicial()
+        # Versão da configuração em vigor para o símbolo; só é trocada entre
+        # ciclos e sem posição aberta
+        self.config = None
+
+
+# Agenda os ciclos de cada símbolo num pool de threads compartilhado.
+# `ciclo(estado)` executa uma iteração da estratégia e retorna em quantos
+# segundos o símbolo deve rodar de novo (None encerra o símbolo); esperas
+# longas, como as pausas do gale, são só entradas mais distantes na agenda.
+class Motor:
+    def __init__(self, ciclo, max_workers=MAX_WORKERS):
+        self.ciclo = ciclo
+        self.estados = {}
+        self._proximo = {}
+        self._agenda = []
+        self._em_execucao = set()
+        self._acordados = set()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='motor')
+        self._rodando = False
+        # Callbacks (symbol) quando um símbolo sai do motor
+        self.ao_remover = []
+
+    def adicionar(self, symbol):
+        with self._cond:
+            estado = self.estados.get(symbol)
+            if estado:
+                estado.ativo = True
+                return estado
+            estado = self.estados[symbol] = EstadoSimbolo(symbol)
+            self._agendar(symbol, 0)
+            return estado
+
+    def remover(self, symbol):
+        # O símbolo só sai do motor quando o ciclo encerrar (sem posição aberta)
+        with self._cond:
+            if symbol in self.estados:
+                self.estados[symbol].ativo = False
+                self._agendar(symbol, 0)
+
+    def sincronizar(self, simbolos):
+        for symbol in list(self.estados):
+            if symbol not in simbolos:
+                self.remover(symbol)
+        for symbol in simbolos:
+            self.adicionar(symbol)
+
+    def acordar(self, symbol):
+        # Antecipa o próximo ciclo do símbolo (ex.: chegou um tick com posição aberta)
+        with self._cond:
+            if symbol not in self.estados:
+                return
+            if symbol in self._em_execucao:
+                self._acordados.add(symbol)
+            elif self._proximo.get(symbol, 0) > time.monotonic():
+                self._agendar(symbol, 0)
+
+    def _agendar(self, symbol, atraso):
+        quando = time.monotonic() + atraso
+        self._proximo[symbol] = quando
+        heapq.heappush(self._agenda, (quando, symbol))
+        self._cond.notify()
+
+    def executar(self):
+        self._rodando = True
+        while self._rodando:
+            with self._cond:
+                agora = time.monotonic()
+                while self._agenda and self._agenda[0][0] <= agora:
+                    quando, symbol = heapq.heappop(self._agenda)
+                    # Entradas antigas (reagendadas depois) são descartadas
+                    if self._proximo.get(symbol) != quando or symbol in self._em_execucao:
+                        continue
+                    self._em_execucao.add(symbol)
+                    futuro = self._pool.submit(self.ciclo, self.estados[symbol])
+                    futuro.add_done_callback(lambda f, s=symbol: self._concluir(s, f))
+                timeout = self._agenda[0][0] - agora if self._agenda else None
+                self._cond.wait(timeout)
+
+    def _concluir(self, symbol, futuro):
+        try:
+            atraso = futuro.result()
+        except Exception as e:
+            logging.error(f"[{symbol}] Erro inesperado: {e}")
+            atraso = 10
+        with self._cond:
+            self._em_execucao.discard(symbol)
+            estado = self.estados.get(symbol)
+            # Readicionado enquanto o ciclo que o removia rodava: continua no motor
+            if atraso is None and estado and estado.ativo:
+                atraso = 0
+            if atraso is not None:
+                if symbol in self._acordados:
+                    self._acordados.discard(symbol)
+                    atraso = 0
+                self._agendar(symbol, atraso)
+                return
+            self.estados.pop(symbol, None)
+            self._proximo.pop(symbol, None)
+            self._acordados.discard(symbol)
+        logging.info(f"[{symbol}] removido do motor")
+        for cb in self.ao_remover:
+            try:
+                cb(symbol)
+            except Exception as e:
+                logging.error(f"[{symbol}] Erro em callback de remoção: {e}")
+
+    def parar(self):
+        with self._cond:
+            self._rodando = False
+            self._cond.notify()
+        self._pool.shutdown(wait=False)
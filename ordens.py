@@ -0,0 +1,238 @@
+import time
+import logging
+import threading
+from collections import deque
+
+from cliente_async import ErroAPIBinance
+from simbolos import ajustar_preco, SimboloDesconhecido
+
+# Prefixo do clientOrderId das ordens de proteção criadas pelo bot; é por ele
+# que a reconciliação reconhece as ordens abertas na corretora
+PREFIXO = 'bot'
+TIPOS = {'alvo': 'TAKE_PROFIT_MARKET', 'stop': 'STOP_MARKET'}
+SIGLAS = {'alvo': 'tp', 'stop': 'sl'}
+RESULTADOS = {'alvo': 'GAIN', 'stop': 'LOSS'}
+# Ordem já executada ou cancelada
+ORDEM_DESCONHECIDA = -2011
+# Ordem que a corretora não tem mais (consulta)
+ORDEM_INEXISTENTE = -2013
+
+
+def papel_da_ordem(client_order_id):
+    # 'alvo' ou 'stop' para as ordens de proteção do bot, None para as demais
+    partes = (client_order_id or '').split('-')
+    if len(partes) < 3 or partes[0] != PREFIXO:
+        return None
+    for papel, sigla in SIGLAS.items():
+        if partes[1] == sigla:
+            return papel
+    return None
+
+
+# Take-profit e stop de cada posição como ordens na corretora (closePosition):
+# a saída é decidida pelo matching da Binance, sem depender do ciclo do bot e
+# mesmo com o processo parado. A execução de uma cancela a outra (OCO) a partir
+# do user data stream, e na partida as ordens abertas são reconciliadas com a
+# posição.
+class GerenciadorOrdens:
+    def __init__(self, api, usuario, simbolos):
+        self.api = api
+        self.simbolos = simbolos
+        # symbol -> {'alvo': ordem, 'stop': ordem}
+        self.protecoes = {}
+        # Callbacks (symbol, resultado, ordem) quando uma proteção é executada
+        self.ao_saida = []
+        # Símbolos com uma proteção executada ainda em processamento
+        self._saindo = set()
+        # Proteções executadas já tratadas (pelo stream ou por conferir)
+        self._executadas = deque(maxlen=100)
+        self._lock = threading.Lock()
+        usuario.ao_ordem.append(self._ao_ordem)
+
+    def protegido(self, symbol):
+        with self._lock:
+            return len(self.protecoes.get(symbol, {})) == len(TIPOS)
+
+    def acompanhando(self, symbol):
+        with self._lock:
+            return bool(self.protecoes.get(symbol))
+
+    def em_saida(self, symbol):
+        # Entre a execução de uma proteção e o fim do registro da saída (e do
+        # cancelamento da outra); o bot não deve abrir posição nesse meio tempo
+        with self._lock:
+            return symbol in self._saindo
+
+    # ================= CRIAÇÃO E CANCELAMENTO ================= #
+
+    def _criar(self, symbol, papel, lado, preco):
+        client_id = f"{PREFIXO}-{SIGLAS[papel]}-{int(time.time() * 1000)}"
+        preco = ajustar_preco(preco, self.simbolos.obter(symbol)["tick_size"])
+        ordem = self.api.criar_ordem(symbol=symbol, side=lado, type=TIPOS[papel], stopPrice=preco,
+                                     closePosition=True, newClientOrderId=client_id)
+        logging.info(f"[{symbol}] Ordem de {papel} {TIPOS[papel]} criada em {preco} (id {ordem['orderId']})")
+        return {"order_id": ordem['orderId'], "client_order_id": client_id, "lado": lado, "preco": preco}
+
+    def proteger(self, symbol, tipo, alvo, stop):
+        # O stop vai primeiro: sem ele a posição fica exposta. Se alguma falhar,
+        # o monitoramento local do bot continua valendo para o símbolo. Cada
+        # ordem passa a ser acompanhada assim que criada, já que pode ser
+        # executada antes da seguinte
+        lado = 'SELL' if tipo == 'long' else 'BUY'
+        with self._lock:
+            antigas = self.protecoes.get(symbol, {})
+            self.protecoes[symbol] = criadas = {}
+        for ordem in antigas.values():
+            # closePosition de uma posição anterior fecharia esta no preço antigo
+            logging.warning(f"[{symbol}] Cancelando proteção antiga ainda acompanhada (id {ordem['order_id']})")
+            self._cancelar(symbol, ordem)
+        for papel, preco in (('stop', stop), ('alvo', alvo)):
+            try:
+                ordem = self._criar(symbol, papel, lado, preco)
+            except (ErroAPIBinance, SimboloDesconhecido) as e:
+                logging.error(f"[{symbol}] Erro ao criar ordem de {papel}: {e}")
+                continue
+            with self._lock:
+                valida = self.protecoes.get(symbol) is criadas
+                if valida:
+                    criadas[papel] = ordem
+            if not valida:
+                # A primeira já executou: a segunda não tem mais posição para proteger
+                self._cancelar(symbol, ordem)
+                break
+        return self.protegido(symbol)
+
+    def _cancelar(self, symbol, ordem):
+        try:
+            self.api.cancelar_ordem(symbol=symbol, orderId=ordem["order_id"])
+        except ErroAPIBinance as e:
+            if e.code != ORDEM_DESCONHECIDA:
+                logging.error(f"[{symbol}] Erro ao cancelar ordem {ordem['order_id']}: {e}")
+
+    def cancelar(self, symbol):
+        # Antes de um fechamento pelo bot; sai do acompanhamento antes de
+        # cancelar para que os eventos de cancelamento sejam ignorados
+        with self._lock:
+            ordens = self.protecoes.pop(symbol, {})
+        for ordem in ordens.values():
+            self._cancelar(symbol, ordem)
+
+    # ================= EVENTOS DO USER DATA STREAM ================= #
+
+    def _ao_ordem(self, ordem):
+        papel = papel_da_ordem(ordem["client_order_id"])
+        if papel is None:
+            return
+        symbol = ordem["symbol"]
+        with self._lock:
+            ordens = self.protecoes.get(symbol, {})
+            acompanhada = ordens.get(papel, {}).get("order_id") == ordem["order_id"]
+            if ordem["status"] == 'FILLED':
+                irmas = self._marcar_executada(symbol, papel, ordem)
+                if irmas is None:
+                    return
+            elif ordem["status"] in ('CANCELED', 'EXPIRED', 'REJECTED') and acompanhada:
+                ordens.pop(papel)
+                logging.warning(f"[{symbol}] Ordem de {papel} {ordem['status']} na corretora; monitoramento local assume")
+                return
+            else:
+                return
+        # Chamadas REST fora da thread do stream
+        threading.Thread(target=self._executada, args=(symbol, papel, ordem, irmas),
+                         name='ordens', daemon=True).start()
+
+    def _marcar_executada(self, symbol, papel, ordem):
+        # Com o _lock adquirido: tira o símbolo do acompanhamento e devolve as
+        # irmãs a cancelar; None se essa execução já foi tratada
+        if ordem["order_id"] in self._executadas:
+            return None
+        self._executadas.append(ordem["order_id"])
+        ordens = self.protecoes.pop(symbol, {})
+        self._saindo.add(symbol)
+        return [o for p, o in ordens.items() if p != papel]
+
+    def _executada(self, symbol, papel, ordem, irmas):
+        logging.info(f"[{symbol}] Ordem de {papel} executada na corretora a {ordem['preco_medio']}")
+        try:
+            for irma in irmas:
+                self._cancelar(symbol, irma)
+            for cb in self.ao_saida:
+                try:
+                    cb(symbol, RESULTADOS[papel], ordem)
+                except Exception as e:
+                    logging.error(f"[{symbol}] Erro em callback de saída: {e}")
+        finally:
+            with self._lock:
+                self._saindo.discard(symbol)
+
+    # ================= RECONCILIAÇÃO ================= #
+
+    def _consultar(self, symbol, ordem):
+        # Situação atual da ordem via REST; None se a corretora não a tem mais
+        try:
+            return self.api.consultar_ordem(symbol=symbol, orderId=ordem["order_id"])
+        except ErroAPIBinance as e:
+            if e.code == ORDEM_INEXISTENTE:
+                return None
+            raise
+
+    def conferir(self, symbol):
+        # A posição zerou com proteções ainda acompanhadas e nenhum evento do
+        # user data stream (ex.: stream fora do ar): consulta as ordens via
+        # REST. Uma proteção executada segue o mesmo caminho do evento (cancela
+        # a irmã e registra a saída); sem nenhuma executada e sem posição, as
+        # restantes são órfãs e são canceladas. False se não deu para saber
+        with self._lock:
+            ordens = dict(self.protecoes.get(symbol, {}))
+        try:
+            for papel, acompanhada in ordens.items():
+                o = self._consultar(symbol, acompanhada)
+                if not o or o['status'] != 'FILLED':
+                    continue
+                ordem = {"symbol": symbol, "order_id": o['orderId'], "client_order_id": o['clientOrderId'],
+                         "lado": o['side'], "tipo": o['type'], "status": o['status'],
+                         "quantidade_executada": float(o['executedQty']), "preco_medio": float(o['avgPrice']),
+                         "evento_ms": o.get('updateTime')}
+                with self._lock:
+                    irmas = self._marcar_executada(symbol, papel, ordem)
+                if irmas is not None:
+                    logging.warning(f"[{symbol}] Execução da ordem de {papel} não chegou pelo stream; confirmada via REST")
+                    self._executada(symbol, papel, ordem, irmas)
+                return True
+            if any(float(p['positionAmt']) != 0 for p in self.api.posicoes(symbol)):
+                return False
+        except ErroAPIBinance as e:
+            logging.error(f"[{symbol}] Erro ao conferir ordens de proteção: {e}")
+            return False
+        logging.warning(f"[{symbol}] Posição encerrada sem execução das proteções; cancelando as restantes")
+        self.cancelar(symbol)
+        return True
+
+    def reconciliar(self, symbol, tipo=None, alvo=None, stop=None):
+        # Na partida: adota as proteções abertas que correspondem à posição,
+        # cancela as órfãs (sem posição, duplicadas ou do lado errado) e cria
+        # as que faltam. `tipo` None indica que não há posição aberta
+        lado = None if tipo is None else ('SELL' if tipo == 'long' else 'BUY')
+        encontradas = {}
+        for o in self.api.ordens_abertas(symbol):
+            papel = papel_da_ordem(o.get('clientOrderId'))
+            if papel is None:
+                continue
+            ordem = {"order_id": o['orderId'], "client_order_id": o['clientOrderId'], "lado": o['side'],
+                     "preco": float(o['stopPrice'])}
+            if o['side'] != lado or papel in encontradas:
+                logging.info(f"[{symbol}] Cancelando ordem de {papel} órfã (id {o['orderId']})")
+                self._cancelar(symbol, ordem)
+                continue
+            encontradas[papel] = ordem
+        if lado is not None:
+            for papel, preco in (('stop', stop), ('alvo', alvo)):
+                if papel not in encontradas:
+                    try:
+                        encontradas[papel] = self._criar(symbol, papel, lado, preco)
+                    except (ErroAPIBinance, SimboloDesconhecido) as e:
+                        logging.error(f"[{symbol}] Erro ao recriar ordem de {papel}: {e}")
+        with self._lock:
+            self.protecoes[symbol] = encontradas
+        if encontradas:
+            logging.info(f"[{symbol}] Proteções reconciliadas: {', '.join(sorted(encontradas))}")
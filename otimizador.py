@@ -0,0 +1,187 @@
+import os
+import csv
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import carregar_klines, preparar, simular, TAXA
+
+GALE_PADRAO = [float(x) for x in os.getenv('GALE', '0.006,0.012,0.024,0.048,0.096').split(',')]
+PARAMETROS = ('profit_perc', 'loss_perc', 'gale_base', 'gale_fator', 'max_gale', 'emergency_stop_losses')
+METRICAS = ('operacoes', 'gains', 'losses', 'profit', 'taxa_acerto', 'max_drawdown', 'maior_sequencia_perdas')
+
+# Chaves de ordenação (menor primeiro)
+CRITERIOS = {
+    'lucro': lambda r: (-r['profit'], r['max_drawdown']),
+    'drawdown': lambda r: (r['max_drawdown'], -r['profit']),
+    'acerto': lambda r: (-r['taxa_acerto'], -r['profit']),
+    # Lucro por unidade de drawdown
+    'recuperacao': lambda r: (-(r['profit'] / r['max_drawdown']) if r['max_drawdown'] else -r['profit'] * 1e9, -r['profit']),
+}
+
+
+def montar_gale(base, fator, max_gale):
+    # Tamanhos no formato da variável GALE: base, base*fator, base*fator², ...
+    return [round(base * fator ** k, 8) for k in range(max(max_gale, 1))]
+
+
+def _valores(texto, tipo=float):
+    # "a,b,c" ou faixa "inicio:fim:passo" (fim incluído)
+    if ':' in texto:
+        inicio, fim, passo = (float(x) for x in texto.split(':'))
+        return [tipo(round(v, 10)) for v in np.arange(inicio, fim + passo / 2, passo)]
+    return [tipo(x) for x in texto.split(',')]
+
+
+# ================= MEMÓRIA COMPARTILHADA ================= #
+
+def _compartilhar(array):
+    # Também aceita a lista de colunas mapeadas do histórico local
+    # (carregar_klines): cada uma é copiada do disco direto para cá
+    if isinstance(array, np.ndarray):
+        forma, tipo = array.shape, array.dtype
+    else:
+        forma, tipo = (len(array), len(array[0])), np.dtype(np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(forma)) * tipo.itemsize)
+    destino = np.ndarray(forma, tipo, buffer=shm.buf)
+    if isinstance(array, np.ndarray):
+        destino[:] = array
+    else:
+        for i, coluna in enumerate(array):
+            destino[i] = coluna
+    return shm, (shm.name, forma, tipo.str)
+
+
+# Estado de cada processo do pool: views somente leitura sobre a memória do processo pai
+_anexados = []
+_dados = None
+_sinais = None
+_taxa = TAXA
+
+
+def _anexar(descricao):
+    nome, forma, tipo = descricao
+    shm = shared_memory.SharedMemory(name=nome)
+    _anexados.append(shm)  # mantém o mapeamento vivo enquanto o worker existir
+    array = np.ndarray(forma, np.dtype(tipo), buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _iniciar_worker(desc_dados, desc_sinais, taxa):
+    global _dados, _sinais, _taxa
+    _dados = _anexar(desc_dados)
+    _sinais = _anexar(desc_sinais)
+    _taxa = taxa
+
+
+def _avaliar(params):
+    profit_perc, loss_perc, gale_base, gale_fator, max_gale, emergency_stop_losses = params
+    est, _ = simular(_dados, _sinais, profit_perc, loss_perc, montar_gale(gale_base, gale_fator, max_gale),
+                     max_gale, emergency_stop_losses, _taxa, registros=False)
+    gains, losses, profit, taxa_acerto = est.resumo()
+    resultado = dict(zip(PARAMETROS, params))
+    resultado.update({
+        "operacoes": gains + losses,
+        "gains": gains,
+        "losses": losses,
+        "profit": profit,
+        "taxa_acerto": taxa_acerto,
+        "max_drawdown": round(est.max_drawdown, 2),
+        "maior_sequencia_perdas": est.maior_sequencia_perdas,
+    })
+    return resultado
+
+
+# ================= OTIMIZAÇÃO ================= #
+
+def otimizar(dados, combinacoes, taxa=TAXA, workers=None, criterio='lucro'):
+    # Avalia as combinações de PARAMETROS num pool de processos. Os candles e os
+    # sinais são decodificados uma vez e ficam em memória compartilhada; os
+    # workers só recebem as tuplas de parâmetros e devolvem as métricas
+    sinais = preparar(dados)
+    workers = workers or os.cpu_count()
+    shm_dados, desc_dados = _compartilhar(dados)
+    shm_sinais, desc_sinais = _compartilhar(sinais)
+    try:
+        # Lotes grandes o bastante para diluir o IPC, pequenos o bastante para balancear
+        lote = max(1, len(combinacoes) // (workers * 8))
+        with ProcessPoolExecutor(workers, initializer=_iniciar_worker,
+                                 initargs=(desc_dados, desc_sinais, taxa)) as pool:
+            resultados = list(pool.map(_avaliar, combinacoes, chunksize=lote))
+    finally:
+        for shm in (shm_dados, shm_sinais):
+            shm.close()
+            shm.unlink()
+    resultados.sort(key=CRITERIOS[criterio])
+    return resultados
+
+
+def gerar_combinacoes(grade, aleatorio=None, semente=None):
+    # Grade completa ou amostra aleatória dela
+    combinacoes = list(itertools.product(*(grade[p] for p in PARAMETROS)))
+    if aleatorio and aleatorio < len(combinacoes):
+        combinacoes = random.Random(semente).sample(combinacoes, aleatorio)
+    return combinacoes
+
+
+def salvar_csv(caminho, resultados):
+    with open(caminho, 'w', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=PARAMETROS + METRICAS)
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca de parâmetros da estratégia sobre klines históricos. "
+                                                 "Valores: lista 'a,b,c' ou faixa 'inicio:fim:passo'")
+    parser.add_argument('arquivo', help="klines em CSV (formato Binance), Parquet ou diretório do histórico local")
+    parser.add_argument('--profit', default='0.002:0.010:0.001')
+    parser.add_argument('--loss', default='0.002:0.010:0.001')
+    parser.add_argument('--gale-base', default=str(GALE_PADRAO[0]))
+    parser.add_argument('--gale-fator', default=str(round(GALE_PADRAO[1] / GALE_PADRAO[0], 4) if len(GALE_PADRAO) > 1 else 2))
+    parser.add_argument('--max-gale', default=os.getenv('MAX_GALE', '5'))
+    parser.add_argument('--emergency', default=os.getenv('EMERGENCY_STOP_LOSSES', '5'))
+    parser.add_argument('--taxa', type=float, default=TAXA)
+    parser.add_argument('--aleatorio', type=int, help="avalia só N combinações sorteadas da grade")
+    parser.add_argument('--semente', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--ordem', choices=sorted(CRITERIOS), default='lucro')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--csv', help="grava todos os resultados ordenados neste CSV")
+    args = parser.parse_args()
+
+    grade = {
+        'profit_perc': _valores(args.profit),
+        'loss_perc': _valores(args.loss),
+        'gale_base': _valores(args.gale_base),
+        'gale_fator': _valores(args.gale_fator),
+        'max_gale': _valores(args.max_gale, int),
+        'emergency_stop_losses': _valores(args.emergency, int),
+    }
+    combinacoes = gerar_combinacoes(grade, args.aleatorio, args.semente)
+
+    inicio = time.perf_counter()
+    dados = carregar_klines(args.arquivo)
+    resultados = otimizar(dados, combinacoes, args.taxa, args.workers, args.ordem)
+    duracao = time.perf_counter() - inicio
+
+    print(f"{len(combinacoes)} combinações sobre {len(dados[0])} candles em {duracao:.1f}s "
+          f"({args.workers} processos, {len(combinacoes) / duracao:.1f} combinações/s)")
+    for r in resultados[:args.top]:
+        print(f"PROFIT_PERC={r['profit_perc']} LOSS_PERC={r['loss_perc']} "
+              f"GALE={','.join(str(g) for g in montar_gale(r['gale_base'], r['gale_fator'], r['max_gale']))} "
+              f"MAX_GALE={r['max_gale']} EMERGENCY_STOP_LOSSES={r['emergency_stop_losses']} | "
+              f"ops {r['operacoes']} | lucro {r['profit']} | drawdown {r['max_drawdown']} | acerto {r['taxa_acerto']}%")
+
+    if args.csv:
+        salvar_csv(args.csv, resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import os
+import time
+import logging
+import threading
+import importlib
+import multiprocessing
+
+import metricas
+from eventos import Publicador
+from status_compartilhado import CanalStatus
+
+# Intervalo com que cada worker web confere o status compartilhado (segundos)
+INTERVALO_LEITURA = float(os.getenv('INTERVALO_LEITURA', 0.1))
+
+# Métricas do motor gravadas pelo processo dele e servidas no /metrics dos workers
+ARQUIVO_METRICAS = metricas.METRICAS_ARQUIVO or 'metricas_motor.prom'
+
+# ProcessoMotor criado no master do gunicorn; os workers o herdam no fork
+processo = None
+
+
+def _executar(canal, comandos):
+    # Corpo do processo do motor: o bot-v1 só é importado aqui, já fora do master
+    metricas.METRICAS_ARQUIVO = ARQUIVO_METRICAS
+    bot = importlib.import_module('bot-v1')
+    bot.canal = canal
+    threading.Thread(target=_atender, args=(bot, comandos), name='comandos', daemon=True).start()
+    bot.executar_bot()
+
+
+def _atender(bot, comandos):
+    while True:
+        nome, params = comandos.get()
+        try:
+            getattr(bot, nome)(**params)
+        except Exception as e:
+            logging.error(f"Erro ao executar comando {nome}: {e}")
+
+
+# Motor de trading num processo próprio, com o canal de status em memória
+# compartilhada e uma fila de comandos vinda dos workers web. Usa fork: o
+# canal e a fila são herdados pelo motor e pelos workers sem serialização.
+class ProcessoMotor:
+    def __init__(self):
+        contexto = multiprocessing.get_context('fork')
+        self.canal = CanalStatus()
+        self.comandos = contexto.Queue()
+        self.processo = contexto.Process(target=_executar, args=(self.canal, self.comandos), name='motor')
+
+    def iniciar(self):
+        self.processo.start()
+        logging.info(f"Motor iniciado no processo {self.processo.pid}")
+
+    def parar(self, timeout=10):
+        self.processo.terminate()
+        self.processo.join(timeout)
+        self.canal.fechar(remover=True)
+
+
+def iniciar():
+    global processo
+    processo = ProcessoMotor()
+    processo.iniciar()
+    return processo
+
+
+# Fachada do motor para os workers web: as mesmas consultas e comandos que
+# web.criar_app usa do módulo bot-v1, lidas do canal compartilhado (sem lock)
+# e enviadas pela fila de comandos
+class MotorRemoto:
+    def __init__(self, canal, comandos):
+        self.canal = canal
+        self.comandos = comandos
+        # Publicador SSE local do worker, alimentado por uma única thread
+        # independentemente do número de abas conectadas
+        self.publicador = Publicador()
+        threading.Thread(target=self._acompanhar, name='status-compartilhado', daemon=True).start()
+
+    # ================= CONFIGURAÇÃO ================= #
+
+    @property
+    def SYMBOLS(self):
+        return self.canal.ler_config()['simbolos']
+
+    @property
+    def SYMBOL(self):
+        simbolos = self.SYMBOLS
+        return simbolos[0] if simbolos else None
+
+    @property
+    def INTERVAL(self):
+        return self.canal.ler_config()['interval']
+
+    @property
+    def PROFIT_PERC(self):
+        return self.canal.ler_config()['profit_perc']
+
+    @property
+    def LOSS_PERC(self):
+        return self.canal.ler_config()['loss_perc']
+
+    @property
+    def GALE(self):
+        return self.canal.ler_config()['gale']
+
+    @property
+    def MAX_GALE(self):
+        return self.canal.ler_config()['max_gale']
+
+    @property
+    def EMERGENCY_STOP_LOSSES(self):
+        return self.canal.ler_config()['emergency_stop_losses']
+
+    @property
+    def SOBRESCRITAS(self):
+        return self.canal.ler_config()['sobrescritas']
+
+    @property
+    def CONFIG_VERSAO(self):
+        return self.canal.ler_config()['versao']
+
+    # ================= STATUS ================= #
+
+    def montar_status(self, symbol):
+        return self.canal.ler_status(symbol)
+
+    def resumo_estatisticas(self):
+        return self.canal.ler_estatisticas()
+
+    def _acompanhar(self):
+        # Repassa ao publicador local os registros cuja sequência mudou
+        versao_geral = None
+        versoes = {}
+        while True:
+            time.sleep(INTERVALO_LEITURA)
+            try:
+                geral = self.canal.ler_geral()
+                resumo = None
+                if int(geral['seq']) != versao_geral:
+                    versao_geral = int(geral['seq'])
+                    resumo = self.canal.ler_estatisticas(geral)
+                for symbol in self.canal.ler_config(geral)['simbolos']:
+                    versao = self.canal.versao_status(symbol)
+                    if versao != versoes.get(symbol):
+                        versoes[symbol] = versao
+                        self.publicador.publicar(symbol, self.canal.ler_status(symbol, geral))
+                    if resumo:
+                        self.publicador.publicar(symbol, resumo)
+            except Exception as e:
+                logging.error(f"Erro ao ler status compartilhado: {e}")
+
+    def metricas_motor(self):
+        try:
+            with open(ARQUIVO_METRICAS, 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    # ================= COMANDOS ================= #
+
+    def forcar_fechamento(self, symbol):
+        self.comandos.put(('forcar_fechamento', {'symbol': symbol}))
+
+    def atualizar_config(self, **config):
+        self.comandos.put(('atualizar_config', config))
+
+
+def remoto():
+    return MotorRemoto(processo.canal, processo.comandos)
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# Log em JSON lines, girado por tamanho e na virada do dia
+LOG_FILE = os.getenv('LOG_FILE', 'log.jsonl')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 5))
+# Registros recentes mantidos em memória para o painel
+LOG_MEMORIA = int(os.getenv('LOG_MEMORIA', 1000))
+
+FORMATO_TEXTO = '{data} - {nivel} - {msg}'
+
+memoria = None
+_lock = threading.Lock()
+
+
+def _registro(record, formatter):
+    dados = {
+        "ts": round(record.created, 3),
+        "data": formatter.formatTime(record),
+        "nivel": record.levelname,
+        "logger": record.name,
+        "msg": record.getMessage(),
+    }
+    if record.exc_info:
+        dados["exc"] = formatter.formatException(record.exc_info)
+    return dados
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record):
+        return json.dumps(_registro(record, self), ensure_ascii=False)
+
+
+# Buffer circular com os últimos registros, já no formato do arquivo
+class MemoriaHandler(logging.Handler):
+    def __init__(self, capacidade=LOG_MEMORIA):
+        super().__init__()
+        self.registros = deque(maxlen=capacidade)
+        self._formatter = logging.Formatter()
+
+    def emit(self, record):
+        try:
+            self.registros.append(_registro(record, self._formatter))
+        except Exception:
+            self.handleError(record)
+
+
+class ArquivoRotativo(RotatingFileHandler):
+    # Gira ao atingir maxBytes e também quando o dia muda
+    def __init__(self, arquivo, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        super().__init__(arquivo, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        inicio = os.path.getmtime(arquivo) if os.path.exists(arquivo) and os.path.getsize(arquivo) else time.time()
+        self._dia = self._dia_de(inicio)
+
+    @staticmethod
+    def _dia_de(instante):
+        return time.strftime('%Y-%m-%d', time.localtime(instante))
+
+    def shouldRollover(self, record):
+        if self._dia_de(record.created) != self._dia:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._dia = self._dia_de(time.time())
+
+
+def configurar(arquivo=LOG_FILE, nivel=logging.INFO):
+    # Instala no logger raiz o arquivo JSON lines e o buffer em memória (uma vez
+    # por processo; só o processo que roda o motor deve gravar o arquivo)
+    global memoria
+    with _lock:
+        if memoria is not None:
+            return
+        raiz = logging.getLogger()
+        raiz.setLevel(nivel)
+        arquivo_handler = ArquivoRotativo(arquivo)
+        arquivo_handler.setFormatter(FormatoJSON())
+        raiz.addHandler(arquivo_handler)
+        memoria = MemoriaHandler()
+        raiz.addHandler(memoria)
+
+
+# ================= CONSULTA ================= #
+
+def _linhas_do_fim(arquivo, bloco=8192):
+    # Linhas do arquivo da última para a primeira, lendo blocos a partir do fim
+    with open(arquivo, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        resto = b''
+        while pos > 0:
+            n = min(bloco, pos)
+            pos -= n
+            f.seek(pos)
+            linhas = (f.read(n) + resto).split(b'\n')
+            resto = linhas.pop(0)
+            for linha in reversed(linhas):
+                if linha:
+                    yield linha
+        if resto:
+            yield resto
+
+
+def _do_arquivo(arquivo):
+    # Registros do mais novo para o mais antigo, passando pelos arquivos girados
+    for i in range(LOG_BACKUPS + 1):
+        caminho = f"{arquivo}.{i}" if i else arquivo
+        if not os.path.exists(caminho):
+            if i:
+                return
+            continue
+        for linha in _linhas_do_fim(caminho):
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                continue
+
+
+def _nivel(nome):
+    valor = logging.getLevelName(nome.upper())
+    return valor if isinstance(valor, int) else None
+
+
+def consultar(limite=50, nivel=None, desde=None, logger=None, arquivo=LOG_FILE):
+    # Últimos `limite` registros (em ordem cronológica) com nível >= nivel e
+    # ts >= desde. No processo que grava o log lê do buffer em memória; nos
+    # demais (workers web) lê o arquivo de trás para frente, parando assim que
+    # tiver o suficiente
+    minimo = _nivel(nivel) if nivel else 0
+    if minimo is None:
+        raise ValueError(f"Nível de log inválido: {nivel}")
+    fonte = reversed(list(memoria.registros)) if memoria is not None else _do_arquivo(arquivo)
+
+    saida = []
+    for reg in fonte:
+        if desde is not None and reg.get("ts", 0) < desde:
+            break
+        if minimo and (_nivel(reg.get("nivel", "INFO")) or 0) < minimo:
+            continue
+        if logger and reg.get("logger") != logger:
+            continue
+        saida.append(reg)
+        if len(saida) >= limite:
+            break
+    saida.reverse()
+    return saida
+
+
+def formatar(registros):
+    linhas = []
+    for reg in registros:
+        linhas.append(FORMATO_TEXTO.format(**reg))
+        if reg.get("exc"):
+            linhas.append(reg["exc"])
+    return ''.join(linha + '\n' for linha in linhas)
@@ -0,0 +1,120 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import metricas
+
+# Intervalo entre sincronizações com o relógio da Binance (segundos)
+RELOGIO_INTERVALO = float(os.getenv('RELOGIO_INTERVALO', 60))
+# Consultas feitas em cada sincronização e amostras mantidas para a estimativa
+RELOGIO_RAJADA = int(os.getenv('RELOGIO_RAJADA', 4))
+RELOGIO_AMOSTRAS = int(os.getenv('RELOGIO_AMOSTRAS', 32))
+# Amostras com ida e volta acima disso são descartadas: o erro do ponto médio
+# pode chegar à metade do RTT (ms)
+RTT_MAXIMO_MS = float(os.getenv('RTT_MAXIMO_MS', 1000))
+# Fração das amostras de menor RTT usada na estimativa do offset
+FRACAO_MELHORES = 1 / 3
+# Mudança do offset registrada no log (ms)
+SALTO_MS = 250
+
+
+# Uma consulta ao relógio do servidor: offset pelo ponto médio da ida e volta
+# (como no NTP) e o próprio RTT
+class Amostra:
+    def __init__(self, offset_ms, rtt_ms, instante):
+        self.offset_ms = offset_ms
+        self.rtt_ms = rtt_ms
+        self.instante = instante
+
+
+# Acompanha continuamente a diferença entre o relógio da Binance e o local.
+# Cada sincronização faz uma rajada de consultas; das últimas amostras, as de
+# RTT alto são descartadas e o offset é a mediana das de menor RTT (as mais
+# próximas do ponto médio real). O RTT informado é a mediana da janela.
+# `consultar` devolve o horário do servidor em ms e `agora` o relógio local em
+# segundos, então tanto a Binance quanto o relógio podem ser substituídos.
+class SincronizadorRelogio:
+    def __init__(self, consultar, agora=time.time, intervalo=RELOGIO_INTERVALO):
+        self.consultar = consultar
+        self.agora = agora
+        self.intervalo = intervalo
+        self.amostras = deque(maxlen=RELOGIO_AMOSTRAS)
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.atualizado_em = None
+        # Callbacks (offset_ms, rtt_ms) a cada nova estimativa
+        self.ao_atualizar = []
+        self._acordar = threading.Event()
+        self._reiniciar = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def amostrar(self):
+        t0 = self.agora()
+        servidor = self.consultar()
+        t1 = self.agora()
+        rtt_ms = (t1 - t0) * 1000
+        return Amostra(servidor - (t0 + t1) * 500, rtt_ms, t1)
+
+    def _estimar(self):
+        validas = sorted((a for a in self.amostras if a.rtt_ms <= RTT_MAXIMO_MS), key=lambda a: a.rtt_ms)
+        if not validas:
+            return None
+        melhores = sorted(a.offset_ms for a in validas[:max(1, int(len(validas) * FRACAO_MELHORES))])
+        rtts = sorted(a.rtt_ms for a in validas)
+        return melhores[len(melhores) // 2], rtts[len(rtts) // 2]
+
+    def sincronizar(self, rajada=RELOGIO_RAJADA, reiniciar=False):
+        # Rajada de consultas e nova estimativa; False se nenhuma amostra
+        # aproveitável (a estimativa anterior continua valendo). `reiniciar`
+        # descarta as amostras antigas, que não valem mais depois de um salto
+        # do relógio local
+        with self._lock:
+            if reiniciar:
+                self.amostras.clear()
+            for _ in range(rajada):
+                self.amostras.append(self.amostrar())
+            estimativa = self._estimar()
+            if estimativa is None:
+                logging.warning(f"Relógio: nenhuma amostra com RTT abaixo de {RTT_MAXIMO_MS:.0f} ms, offset mantido")
+                return False
+            anterior = self.offset_ms if self.atualizado_em else None
+            self.offset_ms, self.rtt_ms = estimativa
+            self.atualizado_em = self.agora()
+
+        if anterior is None or abs(self.offset_ms - anterior) >= SALTO_MS:
+            logging.info(f"Relógio: offset {self.offset_ms:+.1f} ms em relação à Binance (RTT {self.rtt_ms:.1f} ms)")
+        metricas.definir('bot_relogio_offset_ms', self.offset_ms)
+        metricas.definir('bot_relogio_rtt_ms', self.rtt_ms)
+        for cb in self.ao_atualizar:
+            cb(self.offset_ms, self.rtt_ms)
+        return True
+
+    def agora_servidor_ms(self):
+        return self.agora() * 1000 + self.offset_ms
+
+    # ================= SINCRONIZAÇÃO CONTÍNUA ================= #
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._executar, name='relogio', daemon=True)
+        self._thread.start()
+
+    def forcar(self):
+        # Sincroniza já, só com amostras novas (ex.: a Binance rejeitou o
+        # timestamp de uma requisição)
+        self._reiniciar = True
+        self._acordar.set()
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            reiniciar, self._reiniciar = self._reiniciar, False
+            try:
+                self.sincronizar(reiniciar=reiniciar)
+            except Exception as e:
+                logging.error(f"Relógio: erro ao sincronizar com a Binance: {e}")
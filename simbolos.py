@@ -0,0 +1,96 @@
+import os
+import time
+import logging
+import threading
+
+# Validade do cache de exchange info (segundos)
+TTL_SIMBOLOS = int(os.getenv('TTL_SIMBOLOS', 3600))
+
+
+# Símbolo ausente do exchange info mesmo depois de recarregado (ex.: deslistado
+# ou digitado errado na configuração)
+class SimboloDesconhecido(Exception):
+    pass
+
+
+def extrair_filtros(info):
+    filtros = {f['filterType']: f for f in info.get('filters', [])}
+    lot = filtros.get('LOT_SIZE', {})
+    preco = filtros.get('PRICE_FILTER', {})
+    notional = filtros.get('MIN_NOTIONAL', {})
+    return {
+        "step_size": float(lot.get('stepSize', 0)),
+        "min_qty": float(lot.get('minQty', 0)),
+        "tick_size": float(preco.get('tickSize', 0)),
+        "min_notional": float(notional.get('notional', notional.get('minNotional', 0))),
+        "price_precision": int(info.get('pricePrecision', 8)),
+        "quantity_precision": int(info.get('quantityPrecision', 8)),
+    }
+
+
+def decimal_places(num):
+    s = f'{num:.8f}'.rstrip('0')
+    if '.' in s:
+        return len(s.split('.')[1])
+    else:
+        return 0
+
+
+def ajustar_preco(preco, tick):
+    if not tick:
+        return preco
+    return round(round(preco / tick) * tick, decimal_places(tick))
+
+
+# Metadados dos símbolos de futuros carregados uma vez do exchange info.
+# Depois do TTL o cache é renovado em segundo plano e os dados antigos
+# continuam sendo servidos, mantendo a chamada fora do caminho da ordem.
+class CacheSimbolos:
+    def __init__(self, carregar, ttl=TTL_SIMBOLOS):
+        self._carregar = carregar
+        self.ttl = ttl
+        self._simbolos = {}
+        self._carregado_em = 0
+        self._lock = threading.Lock()
+        # Separado de _lock, que fica preso durante toda a carga
+        self._atualizando_lock = threading.Lock()
+        self._atualizando = False
+
+    def atualizar(self):
+        with self._lock:
+            info = self._carregar()
+            self._simbolos = {s['symbol']: extrair_filtros(s) for s in info['symbols']}
+            self._carregado_em = time.time()
+            logging.info(f"Exchange info carregado: {len(self._simbolos)} símbolos")
+
+    def _atualizar_em_segundo_plano(self):
+        with self._atualizando_lock:
+            if self._atualizando:
+                return
+            self._atualizando = True
+
+        def tarefa():
+            try:
+                self.atualizar()
+            except Exception as e:
+                logging.error(f"Erro ao atualizar exchange info: {e}")
+            finally:
+                self._atualizando = False
+
+        threading.Thread(target=tarefa, name='exchange-info', daemon=True).start()
+
+    def invalidar(self):
+        self._carregado_em = 0
+        self._atualizar_em_segundo_plano()
+
+    def obter(self, symbol):
+        info = self._simbolos.get(symbol)
+        if info is None:
+            # Primeira carga ou símbolo novo: precisa buscar antes de seguir
+            self.atualizar()
+            info = self._simbolos.get(symbol)
+            if info is None:
+                raise SimboloDesconhecido(f"Símbolo {symbol} não encontrado no exchange info")
+        elif time.time() - self._carregado_em > self.ttl:
+            self._atualizar_em_segundo_plano()
+        return info
@@ -0,0 +1,493 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from aiohttp import web
+
+from candles import intervalo_em_ms
+
+# Exchange simulada do modo papel (MODO_PAPEL=1)
+TAXA_PAPEL = float(os.getenv('TAXA_PAPEL', 0.0004))  # Taxa taker sobre o notional
+SPREAD_PAPEL = float(os.getenv('SPREAD_PAPEL', 0.0001))  # Distância entre bid e ask (fração do preço)
+LATENCIA_PAPEL = float(os.getenv('LATENCIA_PAPEL', 0))  # Atraso das respostas REST e dos eventos (segundos)
+TICKS_PAPEL = float(os.getenv('TICKS_PAPEL', 10))  # Ticks por segundo de cada símbolo
+VOLATILIDADE_PAPEL = float(os.getenv('VOLATILIDADE_PAPEL', 0.0005))  # Desvio do retorno de cada tick sintético
+PRECO_INICIAL_PAPEL = float(os.getenv('PRECO_INICIAL_PAPEL', 3000))
+# Klines gravados (CSV, Parquet ou pasta do historico.py) reproduzidos como
+# ticks; vazio usa um passeio aleatório
+FONTE_PAPEL = os.getenv('FONTE_PAPEL', '')
+SALDO_PAPEL = float(os.getenv('SALDO_PAPEL', 10000))
+# Candles gerados antes da partida, para a semeadura dos buffers
+CANDLES_PASSADOS = 1500
+TICKS_POR_CANDLE_PASSADO = 4
+# Ordens encerradas mantidas para GET /fapi/v1/order
+MAX_ENCERRADAS = 1000
+# Mensagens pendentes por conexão websocket antes de desconectar o cliente lento
+FILA_ASSINANTE = int(os.getenv('FILA_ASSINANTE_PAPEL', 10000))
+
+FILTROS = [
+    {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001'},
+    {'filterType': 'PRICE_FILTER', 'tickSize': '0.01'},
+    {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+]
+
+
+# ================= FONTES DE PREÇO ================= #
+
+# Passeio aleatório log-normal
+class FonteSintetica:
+    def __init__(self, preco=PRECO_INICIAL_PAPEL, volatilidade=VOLATILIDADE_PAPEL, semente=None):
+        self.preco = preco
+        self.volatilidade = volatilidade
+        self._aleatorio = random.Random(semente)
+
+    def proximo(self):
+        self.preco *= math.exp(self._aleatorio.gauss(0, self.volatilidade))
+        return round(self.preco, 2)
+
+
+# Reproduz candles gravados como ticks (abertura, extremos na ordem provável,
+# fechamento), recomeçando do início ao chegar ao fim
+class FonteGravada:
+    def __init__(self, caminho):
+        from backtest import carregar_klines
+        from candles import O, H, L, C
+        dados = carregar_klines(caminho)
+        self._caminho = []
+        for o, h, l, c in zip(dados[O], dados[H], dados[L], dados[C]):
+            self._caminho += [o, l, h, c] if c >= o else [o, h, l, c]
+        self._i = 0
+
+    def proximo(self):
+        preco = self._caminho[self._i]
+        self._i = (self._i + 1) % len(self._caminho)
+        return float(preco)
+
+
+def criar_fonte(symbol):
+    return FonteGravada(FONTE_PAPEL) if FONTE_PAPEL else FonteSintetica(semente=symbol)
+
+
+# ================= EXCHANGE ================= #
+
+class ErroSimulado(Exception):
+    def __init__(self, code, msg):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+# Livro de um símbolo: candles (com o em formação no fim), último preço e a fonte
+# Candles de um intervalo de um símbolo
+class Serie:
+    def __init__(self, interval):
+        self.interval = interval
+        self.intervalo_ms = intervalo_em_ms(interval)
+        self.candles = []
+        self.tempos = []
+
+    def atualizar(self, agora_ms, preco, volume=1.0):
+        # Devolve o candle que fechou com este tick, se algum fechou
+        t = agora_ms // self.intervalo_ms * self.intervalo_ms
+        fechado = None
+        if self.candles and self.candles[-1][0] == t:
+            k = self.candles[-1]
+            k[2] = max(k[2], preco)
+            k[3] = min(k[3], preco)
+            k[4] = preco
+            k[5] += volume
+        else:
+            if self.candles:
+                fechado = self.candles[-1]
+            self.candles.append([t, preco, preco, preco, preco, volume])
+            self.tempos.append(t)
+        return fechado
+
+
+# Preço de um símbolo e os candles de cada intervalo assinado ou consultado
+# (o bot troca de intervalo quando a configuração muda)
+class Mercado:
+    def __init__(self, symbol, interval, fonte):
+        self.symbol = symbol
+        self.fonte = fonte
+        self.preco = None
+        self.series = {}
+        self.serie(interval)
+
+    def serie(self, interval):
+        # Na primeira vez que o intervalo é pedido, a série já nasce com
+        # CANDLES_PASSADOS de histórico para a semeadura dos buffers. Na partida
+        # ele sai da própria fonte; depois, de um passeio aleatório que termina
+        # no preço atual (sem adiantar a fonte nem saltar o preço)
+        serie = self.series.get(interval)
+        if serie is not None:
+            return serie
+        serie = Serie(interval)
+        n = CANDLES_PASSADOS * TICKS_POR_CANDLE_PASSADO
+        if self.preco is None:
+            precos = [self.fonte.proximo() for _ in range(n)]
+            self.preco = precos[-1]
+        else:
+            aleatorio = random.Random(f"{self.symbol} {interval}")
+            passeio = [1.0]
+            for _ in range(n - 1):
+                passeio.append(passeio[-1] * math.exp(aleatorio.gauss(0, VOLATILIDADE_PAPEL)))
+            escala = self.preco / passeio[-1]
+            precos = [round(p * escala, 2) for p in passeio]
+        agora = int(time.time() * 1000) // serie.intervalo_ms * serie.intervalo_ms
+        for k, preco in enumerate(precos):
+            serie.atualizar(agora - (CANDLES_PASSADOS - k // TICKS_POR_CANDLE_PASSADO) * serie.intervalo_ms, preco, 0.0)
+        self.series[interval] = serie
+        return serie
+
+    def atualizar(self, agora_ms, preco, volume=1.0):
+        # Devolve (série, candle que fechou com este tick ou None) de cada intervalo
+        self.preco = preco
+        return [(serie, serie.atualizar(agora_ms, preco, volume)) for serie in list(self.series.values())]
+
+    def bid_ask(self, spread=SPREAD_PAPEL):
+        meio = self.preco * spread / 2
+        return round(self.preco - meio, 2), round(self.preco + meio, 2)
+
+
+# Conexão websocket de um stream simulado. A fila é limitada: um cliente que
+# não acompanha o ritmo é desconectado, como a Binance faz, em vez de acumular
+# mensagens sem fim na memória (o bot reconecta e se ressincroniza)
+class Assinante:
+    def __init__(self, transporte, streams=()):
+        self.transporte = transporte
+        self.streams = streams
+        self.fila = asyncio.Queue(FILA_ASSINANTE)
+        self.atrasado = False
+
+    def enviar(self, msg):
+        if self.atrasado:
+            return
+        try:
+            self.fila.put_nowait(msg)
+        except asyncio.QueueFull:
+            # O envio pendente pode estar parado no buffer TCP cheio: corta a
+            # conexão em vez de esperar por ele
+            self.atrasado = True
+            logging.warning(f"Modo papel: cliente com {FILA_ASSINANTE} mensagens pendentes, desconectando")
+            self.transporte.abort()
+
+
+# Matching local com as regras que o bot usa da Binance de futuros (one-way):
+# ordens a mercado executadas no bid/ask, STOP_MARKET e TAKE_PROFIT_MARKET
+# disparadas pelo último preço, reduceOnly/closePosition, preço médio de
+# entrada, PnL realizado e taxas. Roda inteiro no loop do servidor, sem locks.
+class ExchangeSimulada:
+    def __init__(self, interval, taxa=TAXA_PAPEL, saldo=SALDO_PAPEL, latencia=LATENCIA_PAPEL):
+        # Intervalo dos mercados criados antes de qualquer assinatura
+        self.interval = interval
+        self.taxa = taxa
+        self.saldo = saldo
+        self.latencia = latencia
+        self.mercados = {}
+        self.posicoes = {}
+        self.ordens = {}
+        # Ordens encerradas (executadas, canceladas, expiradas) para consulta
+        self.encerradas = OrderedDict()
+        self.ticks = 0
+        self._proximo_id = 1
+        self.assinantes_mercado = []
+        self.assinantes_usuario = []
+
+    def mercado(self, symbol):
+        m = self.mercados.get(symbol)
+        if m is None:
+            m = self.mercados[symbol] = Mercado(symbol, self.interval, criar_fonte(symbol))
+            self.posicoes[symbol] = [0.0, 0.0]
+        return m
+
+    def _novo_id(self):
+        self._proximo_id += 1
+        return self._proximo_id
+
+    # ================= TICKS ================= #
+
+    def tick(self, symbol, preco):
+        agora = int(time.time() * 1000)
+        m = self.mercado(symbol)
+        series = m.atualizar(agora, preco)
+        self.ticks += 1
+        bid, ask = m.bid_ask()
+        self._mercado({'e': 'bookTicker', 's': symbol, 'b': str(bid), 'a': str(ask), 'E': agora},
+                      f"{symbol.lower()}@bookTicker")
+        for serie, fechado in series:
+            stream = f"{symbol.lower()}@kline_{serie.interval}"
+            if fechado:
+                self._mercado(self._evento_kline(symbol, serie, fechado, True, agora), stream)
+            self._mercado(self._evento_kline(symbol, serie, serie.candles[-1], False, agora), stream)
+        self._disparar_condicionais(symbol, preco)
+
+    def _evento_kline(self, symbol, serie, k, fechado, agora):
+        return {'e': 'kline', 's': symbol, 'E': agora, 'k': {
+            't': k[0], 'T': k[0] + serie.intervalo_ms - 1, 'i': serie.interval,
+            'o': str(k[1]), 'h': str(k[2]), 'l': str(k[3]),
+            'c': str(k[4]), 'v': str(k[5]), 'x': fechado}}
+
+    def _disparar_condicionais(self, symbol, preco):
+        for ordem in [o for o in self.ordens.values() if o['symbol'] == symbol]:
+            compra = ordem['side'] == 'BUY'
+            stop = ordem['stopPrice']
+            if ordem['type'] == 'STOP_MARKET':
+                disparou = preco >= stop if compra else preco <= stop
+            else:
+                disparou = preco <= stop if compra else preco >= stop
+            if not disparou:
+                continue
+            del self.ordens[ordem['orderId']]
+            qtd = abs(self.posicoes[symbol][0])
+            if qtd == 0:
+                self._evento_ordem(ordem, 'EXPIRED', 0, 0, 0, 0)
+                continue
+            self._executar(ordem, qtd)
+
+    # ================= ORDENS ================= #
+
+    def criar_ordem(self, p):
+        symbol = p['symbol']
+        m = self.mercado(symbol)
+        tipo = p['type']
+        ordem = {'symbol': symbol, 'orderId': self._novo_id(), 'clientOrderId': p.get('newClientOrderId') or f"papel-{self._proximo_id}",
+                 'side': p['side'], 'type': tipo, 'status': 'NEW', 'origQty': p.get('quantity', '0'),
+                 'reduceOnly': p.get('reduceOnly') == 'true', 'closePosition': p.get('closePosition') == 'true',
+                 'stopPrice': float(p.get('stopPrice', 0)), 'avgPrice': '0', 'executedQty': '0'}
+        if tipo in ('STOP_MARKET', 'TAKE_PROFIT_MARKET'):
+            compra = ordem['side'] == 'BUY'
+            imediata = m.preco >= ordem['stopPrice'] if compra == (tipo == 'STOP_MARKET') else m.preco <= ordem['stopPrice']
+            if imediata:
+                raise ErroSimulado(-2021, "Order would immediately trigger.")
+            self.ordens[ordem['orderId']] = ordem
+            self._evento_ordem(ordem, 'NEW', 0, 0, 0, 0)
+            return dict(ordem, stopPrice=str(ordem['stopPrice']))
+        if tipo != 'MARKET':
+            raise ErroSimulado(-1116, "Invalid orderType.")
+        qtd = float(p['quantity'])
+        posicao = self.posicoes[symbol][0]
+        sinal = 1 if ordem['side'] == 'BUY' else -1
+        if ordem['reduceOnly']:
+            if posicao == 0 or posicao * sinal > 0:
+                raise ErroSimulado(-2022, "ReduceOnly Order is rejected.")
+            qtd = min(qtd, abs(posicao))
+        self._executar(ordem, qtd)
+        # Como na Binance, a resposta não espera a execução: ela chega pelo stream
+        return dict(ordem, stopPrice='0')
+
+    def cancelar_ordem(self, symbol, order_id):
+        ordem = self.ordens.pop(order_id, None)
+        if ordem is None or ordem['symbol'] != symbol:
+            raise ErroSimulado(-2011, "Unknown order sent.")
+        self._evento_ordem(ordem, 'CANCELED', 0, 0, 0, 0)
+        return dict(ordem, status='CANCELED', stopPrice=str(ordem['stopPrice']))
+
+    def _executar(self, ordem, qtd):
+        symbol = ordem['symbol']
+        bid, ask = self.mercados[symbol].bid_ask()
+        sinal = 1 if ordem['side'] == 'BUY' else -1
+        preco = ask if sinal > 0 else bid
+        posicao, entrada = self.posicoes[symbol]
+        nova = round(posicao + sinal * qtd, 8)
+        realizado = 0.0
+        if posicao and posicao * sinal < 0:
+            # Redução (ou inversão): PnL da parte fechada
+            fechada = min(qtd, abs(posicao))
+            realizado = (preco - entrada) * fechada * (1 if posicao > 0 else -1)
+            entrada = entrada if nova * posicao > 0 else (preco if nova else 0.0)
+        else:
+            entrada = (abs(posicao) * entrada + qtd * preco) / abs(nova) if nova else 0.0
+        comissao = preco * qtd * self.taxa
+        self.saldo += realizado - comissao
+        self.posicoes[symbol] = [nova, entrada]
+        self._evento_ordem(ordem, 'FILLED', qtd, preco, comissao, realizado)
+        self._usuario({'e': 'ACCOUNT_UPDATE', 'E': int(time.time() * 1000), 'a': {'m': 'ORDER', 'P': [
+            {'s': symbol, 'pa': str(nova), 'ep': str(round(entrada, 8)), 'ps': 'BOTH'}]}})
+
+    def _evento_ordem(self, ordem, status, qtd, preco, comissao, realizado):
+        if status != 'NEW':
+            self.encerradas[ordem['orderId']] = dict(ordem, status=status, executedQty=str(qtd), avgPrice=str(preco),
+                                                     updateTime=int(time.time() * 1000))
+            while len(self.encerradas) > MAX_ENCERRADAS:
+                self.encerradas.popitem(last=False)
+        self._usuario({'e': 'ORDER_TRADE_UPDATE', 'E': int(time.time() * 1000), 'o': {
+            's': ordem['symbol'], 'c': ordem['clientOrderId'], 'S': ordem['side'], 'o': ordem['type'],
+            'X': status, 'x': 'TRADE' if status == 'FILLED' else status, 'i': ordem['orderId'],
+            'l': str(qtd), 'z': str(qtd), 'L': str(preco), 'ap': str(preco), 'n': str(comissao),
+            'rp': str(realizado), 'T': int(time.time() * 1000)}})
+
+    # ================= CONSULTAS ================= #
+
+    def consultar_ordem(self, symbol, order_id):
+        ordem = self.ordens.get(order_id) or self.encerradas.get(order_id)
+        if ordem is None or ordem['symbol'] != symbol:
+            raise ErroSimulado(-2013, "Order does not exist.")
+        return dict(ordem, stopPrice=str(ordem['stopPrice']))
+
+    def posicao(self, symbol):
+        qtd, entrada = self.posicoes[symbol]
+        m = self.mercados[symbol]
+        return {'symbol': symbol, 'positionAmt': str(qtd), 'entryPrice': str(round(entrada, 8)),
+                'markPrice': str(m.preco), 'unRealizedProfit': str((m.preco - entrada) * qtd if qtd else 0.0)}
+
+    def klines(self, symbol, interval, limite, inicio=None, fim=None):
+        s = self.mercado(symbol).serie(interval)
+        if inicio is not None:
+            a = bisect_left(s.tempos, int(inicio))
+            b = min(len(s.candles), a + limite)
+        else:
+            b = len(s.candles) if fim is None else bisect_left(s.tempos, int(fim) + 1)
+            a = max(0, b - limite)
+        return [[k[0], str(k[1]), str(k[2]), str(k[3]), str(k[4]), str(k[5]), k[0] + s.intervalo_ms - 1,
+                 '0', 0, '0', '0', '0'] for k in s.candles[a:b]]
+
+    # ================= EVENTOS ================= #
+
+    def _mercado(self, dados, stream):
+        for assinante in self.assinantes_mercado:
+            if stream in assinante.streams:
+                assinante.enviar({'stream': stream, 'data': dados})
+
+    def _usuario(self, msg):
+        for assinante in self.assinantes_usuario:
+            if self.latencia:
+                asyncio.get_event_loop().call_later(self.latencia, assinante.enviar, msg)
+            else:
+                assinante.enviar(msg)
+
+
+# ================= SERVIDOR ================= #
+
+# Servidor HTTP/websocket local com as rotas da API de futuros que o bot usa.
+# O bot fala com ele pelos mesmos clientes (REST e streams) que usa com a
+# Binance, então o caminho medido é o mesmo do modo real.
+class SimuladorPapel:
+    def __init__(self, simbolos, interval, ticks_por_segundo=TICKS_PAPEL, porta=0):
+        self.exchange = ExchangeSimulada(interval)
+        self.simbolos = [s.upper() for s in simbolos]
+        self.ticks_por_segundo = ticks_por_segundo
+        self.porta = porta
+        self.loop = None
+        self.rest_url = self.ws_url = None
+        self._pronto = threading.Event()
+
+    def iniciar(self):
+        threading.Thread(target=self._executar, name='simulador', daemon=True).start()
+        self._pronto.wait()
+        logging.info(f"Modo papel: exchange simulada em {self.rest_url} ({self.ticks_por_segundo:g} ticks/s por símbolo)")
+        return self
+
+    def _executar(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for symbol in self.simbolos:
+            self.exchange.mercado(symbol)
+        runner = web.AppRunner(self._app(), access_log=None)
+        self.loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, '127.0.0.1', self.porta)
+        self.loop.run_until_complete(site.start())
+        self.porta = runner.addresses[0][1]
+        self.rest_url = f"http://127.0.0.1:{self.porta}"
+        self.ws_url = f"ws://127.0.0.1:{self.porta}"
+        self.loop.create_task(self._alimentar())
+        self._pronto.set()
+        self.loop.run_forever()
+
+    async def _alimentar(self):
+        # Gera os ticks devidos desde a última volta (vários por volta em taxas altas)
+        inicio = time.perf_counter()
+        gerados = 0
+        while True:
+            devidos = int((time.perf_counter() - inicio) * self.ticks_por_segundo) - gerados
+            for _ in range(devidos):
+                for symbol, m in list(self.exchange.mercados.items()):
+                    self.exchange.tick(symbol, m.fonte.proximo())
+            gerados += devidos
+            await asyncio.sleep(max(0.001, 1 / self.ticks_por_segundo))
+
+    def _app(self):
+        app = web.Application()
+        r = app.router
+        r.add_get('/fapi/v1/time', self._rota(lambda q: {'serverTime': int(time.time() * 1000)}))
+        r.add_get('/fapi/v1/exchangeInfo', self._rota(self._exchange_info))
+        r.add_get('/fapi/v1/ticker/price', self._rota(
+            lambda q: {'symbol': q['symbol'], 'price': str(self.exchange.mercado(q['symbol']).preco)}))
+        r.add_get('/fapi/v2/positionRisk', self._rota(self._posicoes))
+        r.add_get('/fapi/v1/klines', self._rota(lambda q: self.exchange.klines(
+            q['symbol'], q.get('interval', self.exchange.interval), int(q.get('limit', 500)),
+            q.get('startTime'), q.get('endTime'))))
+        r.add_post('/fapi/v1/order', self._rota(lambda q: self.exchange.criar_ordem(dict(q))))
+        r.add_get('/fapi/v1/order', self._rota(
+            lambda q: self.exchange.consultar_ordem(q['symbol'], int(q.get('orderId', 0)))))
+        r.add_delete('/fapi/v1/order', self._rota(
+            lambda q: self.exchange.cancelar_ordem(q['symbol'], int(q.get('orderId', 0)))))
+        r.add_get('/fapi/v1/openOrders', self._rota(lambda q: [
+            dict(o, stopPrice=str(o['stopPrice'])) for o in self.exchange.ordens.values() if o['symbol'] == q['symbol']]))
+        for metodo in (r.add_post, r.add_put, r.add_delete):
+            metodo('/fapi/v1/listenKey', self._rota(lambda q: {'listenKey': 'papel'}))
+        r.add_get('/stream', self._stream_mercado)
+        r.add_get('/ws/{key}', self._stream_usuario)
+        return app
+
+    def _rota(self, tratar):
+        async def handler(request):
+            if self.exchange.latencia:
+                await asyncio.sleep(self.exchange.latencia)
+            try:
+                return web.json_response(tratar(request.query))
+            except ErroSimulado as e:
+                return web.json_response({'code': e.code, 'msg': e.msg}, status=400)
+            except (KeyError, ValueError) as e:
+                return web.json_response({'code': -1102, 'msg': f"Parâmetro inválido: {e}"}, status=400)
+        return handler
+
+    def _exchange_info(self, q):
+        return {'symbols': [{'symbol': s, 'pricePrecision': 2, 'quantityPrecision': 3, 'filters': FILTROS}
+                            for s in self.exchange.mercados]}
+
+    def _posicoes(self, q):
+        simbolos = [q['symbol']] if q.get('symbol') else list(self.exchange.mercados)
+        for s in simbolos:
+            self.exchange.mercado(s)
+        return [self.exchange.posicao(s) for s in simbolos]
+
+    async def _transmitir(self, request, assinantes, assinante):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        assinantes.append(assinante)
+        try:
+            while not ws.closed:
+                msg = await assinante.fila.get()
+                if assinante.atrasado:
+                    break
+                await ws.send_str(json.dumps(msg))
+        except (ConnectionError, RuntimeError):
+            pass
+        finally:
+            assinantes.remove(assinante)
+        return ws
+
+    async def _stream_mercado(self, request):
+        # Nomes como os da Binance: <symbol>@bookTicker, <symbol>@kline_<interval>
+        streams = {s for s in request.query.get('streams', '').split('/') if s}
+        for s in streams:
+            m = self.exchange.mercado(s.split('@')[0].upper())
+            if '@kline_' in s:
+                m.serie(s.split('@kline_')[1])
+        return await self._transmitir(request, self.exchange.assinantes_mercado,
+                                     Assinante(request.transport, streams))
+
+    async def _stream_usuario(self, request):
+        return await self._transmitir(request, self.exchange.assinantes_usuario, Assinante(request.transport))
+
+
+def iniciar(simbolos, interval):
+    return SimuladorPapel(simbolos, interval).iniciar()
@@ -0,0 +1,235 @@
+import json
+import math
+import time
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAX_SIMBOLOS = 32
+MAX_NIVEIS_GALE = 16
+# Ajustes por símbolo da configuração, em JSON
+TAMANHO_SOBRESCRITAS = 2048
+# Releituras de um registro em escrita antes de o leitor desistir: se o
+# processo do motor morrer no meio de uma escrita a sequência fica ímpar
+LEITURA_TENTATIVAS = 100
+
+# Layout fixo do bloco de memória compartilhada: um registro geral
+# (estatísticas e configuração) seguido de um registro por símbolo.
+# Cada registro tem o próprio contador de sequência (seqlock): ímpar durante
+# a escrita, par quando estável.
+GERAL = np.dtype([
+    ('seq', '<u8'),
+    ('gains', '<i8'),
+    ('total_losses', '<i8'),
+    ('profit_total', '<f8'),
+    ('taxa_acerto', '<f8'),
+    ('perdas_consecutivas', '<i8'),
+    ('max_drawdown', '<f8'),
+    ('n_simbolos', '<i8'),
+    ('simbolos', 'S16', (MAX_SIMBOLOS,)),
+    ('interval', 'S8'),
+    ('profit_perc', '<f8'),
+    ('loss_perc', '<f8'),
+    ('n_gale', '<i8'),
+    ('gale', '<f8', (MAX_NIVEIS_GALE,)),
+    ('max_gale', '<i8'),
+    ('emergency_stop_losses', '<i8'),
+    ('config_versao', '<i8'),
+    ('sobrescritas', f'S{TAMANHO_SOBRESCRITAS}'),
+])
+
+SIMBOLO = np.dtype([
+    ('seq', '<u8'),
+    ('symbol', 'S16'),
+    ('preco_atual', '<f8'),
+    ('posicao', '<f8'),
+    ('quantidade', '<f8'),
+    ('direcao', 'S8'),
+    ('alvo', '<f8'),
+    ('stop', '<f8'),
+    ('progresso_percentual', '<f8'),
+    ('losses', '<f8'),
+    # Sequência de gale em vigor para o símbolo (a padrão ou a sobrescrita dele)
+    ('n_gale', '<i8'),
+    ('gale', '<f8', (MAX_NIVEIS_GALE,)),
+])
+
+CAMPOS_ESTATISTICAS = ('gains', 'total_losses', 'profit_total', 'taxa_acerto', 'perdas_consecutivas', 'max_drawdown')
+CAMPOS_NUMERICOS = ('preco_atual', 'posicao', 'quantidade', 'alvo', 'stop', 'progresso_percentual', 'losses')
+
+
+def _numero(valor):
+    # "---" e afins viram NaN no layout fixo
+    return float(valor) if isinstance(valor, (int, float)) else math.nan
+
+
+def _valor(numero):
+    return "---" if math.isnan(numero) else numero
+
+
+def _niveis(gale):
+    niveis = np.zeros(MAX_NIVEIS_GALE)
+    niveis[:len(gale)] = gale[:MAX_NIVEIS_GALE]
+    return min(len(gale), MAX_NIVEIS_GALE), niveis
+
+
+def _gales(registro):
+    return [float(g) for g in registro['gale'][:registro['n_gale']]]
+
+
+# Snapshot de status publicado pelo processo do motor e lido pelos workers web
+# sem lock: o leitor copia o registro e confere se a sequência não mudou.
+# Há um único escritor (o processo do motor); as threads dele se serializam
+# no _lock_escrita. Só o escritor ocupa e libera os slots dos símbolos; o
+# leitor apenas procura.
+class CanalStatus:
+    def __init__(self, nome=None):
+        tamanho = GERAL.itemsize + SIMBOLO.itemsize * MAX_SIMBOLOS
+        if nome is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=tamanho)
+            self.shm.buf[:tamanho] = bytes(tamanho)
+        else:
+            self.shm = shared_memory.SharedMemory(name=nome)
+        self.nome = self.shm.name
+        self.geral = np.ndarray((1,), GERAL, buffer=self.shm.buf)
+        self.simbolos = np.ndarray((MAX_SIMBOLOS,), SIMBOLO, buffer=self.shm.buf, offset=GERAL.itemsize)
+        self._lock_escrita = threading.Lock()
+        # Última cópia consistente de cada registro, devolvida se a escrita travar
+        self._ultimo_geral = [None]
+        self._ultimos_simbolos = [None] * MAX_SIMBOLOS
+
+    def fechar(self, remover=False):
+        self.geral = self.simbolos = None
+        self.shm.close()
+        if remover:
+            self.shm.unlink()
+
+    # ================= ESCRITA (processo do motor) ================= #
+
+    @staticmethod
+    def _escrever(registros, i, valores):
+        registros['seq'][i] += 1
+        for campo, valor in valores.items():
+            registros[campo][i] = valor
+        registros['seq'][i] += 1
+
+    def _slot(self, symbol):
+        i = self._procurar(symbol)
+        if i is not None:
+            return i
+        nomes = self.simbolos['symbol']
+        for i in range(MAX_SIMBOLOS):
+            if not nomes[i]:
+                return i
+        raise ValueError(f"Sem espaço para mais de {MAX_SIMBOLOS} símbolos no status compartilhado")
+
+    def liberar(self, symbol):
+        # Símbolo removido do motor: o slot volta a ficar livre
+        with self._lock_escrita:
+            i = self._procurar(symbol)
+            if i is not None:
+                vazio = np.zeros((), SIMBOLO)
+                self._escrever(self.simbolos, i, {campo: vazio[campo] for campo in SIMBOLO.names if campo != 'seq'})
+
+    def escrever_status(self, symbol, status):
+        with self._lock_escrita:
+            valores = {campo: _numero(status.get(campo)) for campo in CAMPOS_NUMERICOS}
+            valores['symbol'] = symbol.encode()
+            valores['direcao'] = str(status.get('direcao', '---')).encode()[:8]
+            valores['n_gale'], valores['gale'] = _niveis(status.get('gales', []))
+            self._escrever(self.simbolos, self._slot(symbol), valores)
+
+    def escrever_estatisticas(self, resumo):
+        with self._lock_escrita:
+            self._escrever(self.geral, 0, {campo: resumo[campo] for campo in CAMPOS_ESTATISTICAS})
+
+    def escrever_config(self, simbolos, interval, profit_perc, loss_perc, gale, max_gale, emergency_stop_losses,
+                        versao=0, sobrescritas=None):
+        nomes = np.zeros(MAX_SIMBOLOS, 'S16')
+        nomes[:len(simbolos)] = [s.encode() for s in simbolos[:MAX_SIMBOLOS]]
+        n_gale, niveis = _niveis(gale)
+        with self._lock_escrita:
+            self._escrever(self.geral, 0, {
+                'n_simbolos': min(len(simbolos), MAX_SIMBOLOS),
+                'simbolos': nomes,
+                'interval': interval.encode(),
+                'profit_perc': profit_perc,
+                'loss_perc': loss_perc,
+                'n_gale': n_gale,
+                'gale': niveis,
+                'max_gale': max_gale,
+                'emergency_stop_losses': emergency_stop_losses,
+                'config_versao': versao,
+                'sobrescritas': json.dumps(sobrescritas or {}).encode(),
+            })
+
+    # ================= LEITURA (workers web) ================= #
+
+    def _procurar(self, symbol):
+        chave = symbol.encode()
+        nomes = self.simbolos['symbol']
+        for i in range(MAX_SIMBOLOS):
+            if nomes[i] == chave:
+                return i
+        return None
+
+    @staticmethod
+    def _ler(registros, i, ultimos):
+        # Cópia consistente do registro. Com a sequência presa (escritor morto
+        # no meio de uma escrita), desiste depois de LEITURA_TENTATIVAS e
+        # devolve a última cópia boa, ou None se nunca houve uma
+        for tentativa in range(LEITURA_TENTATIVAS):
+            antes = int(registros['seq'][i])
+            if not antes % 2:
+                copia = registros[i].copy()
+                if int(registros['seq'][i]) == antes:
+                    ultimos[i] = copia
+                    return copia
+            time.sleep(0 if tentativa < 10 else 0.001)
+        return ultimos[i]
+
+    def versao_geral(self):
+        return int(self.geral['seq'][0])
+
+    def versao_status(self, symbol):
+        i = self._procurar(symbol)
+        return None if i is None else int(self.simbolos['seq'][i])
+
+    def ler_geral(self):
+        registro = self._ler(self.geral, 0, self._ultimo_geral)
+        # Sem nenhuma leitura consistente: registro zerado (nada publicado)
+        return registro if registro is not None else np.zeros((), GERAL)[()]
+
+    def ler_status(self, symbol, geral=None):
+        i = self._procurar(symbol)
+        registro = None if i is None else self._ler(self.simbolos, i, self._ultimos_simbolos)
+        if registro is None or registro['symbol'] != symbol.encode():
+            # Símbolo ainda não publicado: sequência de gale padrão
+            geral = geral if geral is not None else self.ler_geral()
+            status = {campo: "---" for campo in CAMPOS_NUMERICOS + ('direcao',)}
+            status['gales'] = _gales(geral)
+        else:
+            status = {campo: _valor(float(registro[campo])) for campo in CAMPOS_NUMERICOS}
+            status['direcao'] = registro['direcao'].decode()
+            status['gales'] = _gales(registro)
+        status['symbol'] = symbol
+        return status
+
+    def ler_estatisticas(self, geral=None):
+        geral = geral if geral is not None else self.ler_geral()
+        return {campo: geral[campo].item() for campo in CAMPOS_ESTATISTICAS}
+
+    def ler_config(self, geral=None):
+        geral = geral if geral is not None else self.ler_geral()
+        return {
+            'simbolos': [s.decode() for s in geral['simbolos'][:geral['n_simbolos']]],
+            'interval': geral['interval'].decode(),
+            'profit_perc': float(geral['profit_perc']),
+            'loss_perc': float(geral['loss_perc']),
+            'gale': _gales(geral),
+            'max_gale': int(geral['max_gale']),
+            'emergency_stop_losses': int(geral['emergency_stop_losses']),
+            'versao': int(geral['config_versao']),
+            'sobrescritas': json.loads(geral['sobrescritas'].decode() or '{}'),
+        }
@@ -0,0 +1,153 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque, OrderedDict
+
+from mercado import ClienteWS, WS_URL
+
+# A Binance expira a listenKey em 60 minutos sem renovação
+INTERVALO_KEEPALIVE = 30 * 60
+STATUS_FINAIS = ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED')
+
+
+# Consome o user data stream e mantém em memória o livro de posições
+# (ACCOUNT_UPDATE) e o registro de execuções (ORDER_TRADE_UPDATE). Ordens
+# abertas ficam em `ordens` até um status final; daí passam para
+# `finalizadas`, limitada às `max_finalizadas` mais recentes (e retiradas
+# quando aguardar_ordem as consome)
+class StreamUsuario(ClienteWS):
+    def __init__(self, api, base_url=WS_URL, max_fills=1000, max_finalizadas=1000):
+        super().__init__('stream-usuario')
+        self.api = api
+        self.base_url = base_url.rstrip('/')
+        self.listen_key = None
+        self.posicoes = {}
+        self.ordens = {}
+        self.finalizadas = OrderedDict()
+        self.max_finalizadas = max_finalizadas
+        self.fills = deque(maxlen=max_fills)
+        self.ao_ordem = []
+        self.sincronizado = False
+        self._cond = threading.Condition()
+        self._keepalive = None
+
+    async def url(self):
+        self.listen_key = await self.api.aguardar(self.api.cliente.criar_listen_key())
+        return f"{self.base_url}/ws/{self.listen_key}"
+
+    async def ao_conectar(self):
+        self._keepalive = asyncio.ensure_future(self._manter_vivo())
+        # Foto inicial via REST; eventos que chegarem nesse meio tempo ficam na
+        # fila do websocket e são aplicados depois, por serem mais novos
+        posicoes = await self.api.aguardar(self.api.cliente.posicoes())
+        with self._cond:
+            for pos in posicoes:
+                self._gravar_posicao(pos['symbol'], pos['positionAmt'], pos['entryPrice'])
+            self.sincronizado = True
+            self._cond.notify_all()
+
+    async def ao_desconectar(self):
+        self.sincronizado = False
+        if self._keepalive:
+            self._keepalive.cancel()
+            self._keepalive = None
+
+    async def _manter_vivo(self):
+        while True:
+            await asyncio.sleep(INTERVALO_KEEPALIVE)
+            try:
+                await self.api.aguardar(self.api.cliente.renovar_listen_key())
+            except Exception as e:
+                logging.error(f"{self.nome}: erro ao renovar listenKey: {e}")
+                self.reconectar()
+
+    async def ao_receber(self, msg):
+        evento = msg.get('e')
+        if evento == 'ACCOUNT_UPDATE':
+            with self._cond:
+                for p in msg['a'].get('P', []):
+                    self._gravar_posicao(p['s'], p['pa'], p['ep'])
+                self._cond.notify_all()
+        elif evento == 'ORDER_TRADE_UPDATE':
+            self._ordem(msg['o'], msg.get('E'))
+        elif evento == 'listenKeyExpired':
+            logging.warning(f"{self.nome}: listenKey expirada, reconectando")
+            self.reconectar()
+
+    def _gravar_posicao(self, symbol, quantidade, preco_entrada):
+        self.posicoes[symbol] = {
+            "symbol": symbol,
+            "positionAmt": quantidade,
+            "entryPrice": preco_entrada,
+            "atualizado_em": time.time()
+        }
+
+    def _ordem(self, o, evento_ms):
+        ordem = {
+            "symbol": o['s'],
+            "order_id": o['i'],
+            "client_order_id": o['c'],
+            "lado": o['S'],
+            "tipo": o['o'],
+            "status": o['X'],
+            "quantidade_executada": float(o['z']),
+            "preco_medio": float(o['ap']),
+            "evento_ms": evento_ms
+        }
+        with self._cond:
+            self._guardar(ordem)
+            if o['x'] == 'TRADE':
+                self.fills.append({
+                    "symbol": o['s'],
+                    "order_id": o['i'],
+                    "lado": o['S'],
+                    "preco": float(o['L']),
+                    "quantidade": float(o['l']),
+                    "comissao": float(o.get('n', 0)),
+                    "lucro_realizado": float(o.get('rp', 0)),
+                    "horario_ms": o.get('T', evento_ms)
+                })
+            self._cond.notify_all()
+        for cb in self.ao_ordem:
+            try:
+                cb(ordem)
+            except Exception as e:
+                logging.error(f"{self.nome}: erro em callback de ordem: {e}")
+
+    def _guardar(self, ordem):
+        order_id = ordem['order_id']
+        if ordem['status'] in STATUS_FINAIS:
+            self.ordens.pop(order_id, None)
+            self.finalizadas[order_id] = ordem
+            self.finalizadas.move_to_end(order_id)
+            while len(self.finalizadas) > self.max_finalizadas:
+                self.finalizadas.popitem(last=False)
+        elif order_id not in self.finalizadas:
+            self.ordens[order_id] = ordem
+
+    # ================= CONSULTAS ================= #
+
+    def posicao(self, symbol):
+        pos = self.posicoes.get(symbol)
+        if pos and float(pos['positionAmt']) != 0:
+            return pos
+        return None
+
+    def aguardar_ordem(self, order_id, timeout):
+        # Espera a ordem chegar a um status final e devolve (consumindo) o
+        # registro dela; no timeout, o último registro ainda aberto, se houver
+        with self._cond:
+            if self._cond.wait_for(lambda: order_id in self.finalizadas, timeout):
+                return self.finalizadas.pop(order_id)
+            return self.ordens.get(order_id)
+
+    def aguardar_posicao(self, symbol, aberta, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: (self.posicao(symbol) is not None) == aberta, timeout)
+
+    def corrigir_posicao(self, pos):
+        # Aplica uma leitura REST quando o evento do stream não chegou a tempo
+        with self._cond:
+            self._gravar_posicao(pos['symbol'], pos['positionAmt'], pos['entryPrice'])
+            self._cond.notify_all()
@@ -0,0 +1,161 @@
+import time
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from cliente_async import BaldePeso, ClienteBinanceAsync, ErroAPIBinance, ERRO_TIMESTAMP, ERRO_TRANSPORTE
+
+
+# ================= SERVIDOR DE TESTE ================= #
+# Um único endpoint cuja resposta (status, corpo, cabeçalhos e atraso) é
+# definida pelo teste; as requisições recebidas ficam em `pedidos`
+
+class ServidorTeste:
+    def __init__(self):
+        self.status = 200
+        self.corpo = {'serverTime': 1}
+        self.cabecalhos = {}
+        self.texto = None  # resposta crua no lugar do JSON
+        self.atraso = 0
+        self.pedidos = []
+
+    async def _responder(self, request):
+        self.pedidos.append(request.query)
+        if self.atraso:
+            await asyncio.sleep(self.atraso)
+        if self.texto is not None:
+            return web.Response(text=self.texto, status=self.status)
+        return web.json_response(self.corpo, status=self.status, headers=self.cabecalhos)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_route('*', '/fapi/v1/time', self._responder)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *args):
+        await self.runner.cleanup()
+
+
+def com_cliente(teste, timeout=5):
+    # Roda `teste(servidor, cliente)` num loop próprio e fecha tudo no final
+    async def rodar():
+        async with ServidorTeste() as servidor:
+            cliente = ClienteBinanceAsync('chave', 'segredo', base_url=servidor.url, timeout=timeout)
+            try:
+                return await teste(servidor, cliente)
+            finally:
+                await cliente.fechar()
+    return asyncio.run(rodar())
+
+
+# ================= ORÇAMENTO DE PESO ================= #
+
+def test_reserva_dentro_do_limite():
+    balde = BaldePeso(limite=100, margem=0.5)
+    assert balde.limite == 50
+    asyncio.run(balde.reservar(20))
+    asyncio.run(balde.reservar(30))
+    assert balde.usado == 50
+
+
+def test_reserva_acima_do_limite_espera_o_minuto_seguinte():
+    balde = BaldePeso(limite=10, margem=1)
+    asyncio.run(balde.reservar(8))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(balde.reservar(5), 0.2))
+    assert balde.usado == 8
+
+    # Virada do minuto: o orçamento zera e a reserva passa
+    balde.minuto -= 1
+    asyncio.run(balde.reservar(5))
+    assert balde.usado == 5
+
+
+def test_bloqueio_segura_as_reservas():
+    balde = BaldePeso(limite=10, margem=1)
+    balde.bloquear(0.3)
+    inicio = time.time()
+    asyncio.run(balde.reservar(1))
+    assert time.time() - inicio >= 0.25
+    # Um bloqueio menor não encurta o que já está em vigor
+    balde.bloquear(5)
+    balde.bloquear(1)
+    assert balde.bloqueado_ate - time.time() > 4
+
+
+# ================= RESPOSTAS DA API ================= #
+
+def test_peso_usado_sincronizado_pelo_cabecalho():
+    async def teste(servidor, cliente):
+        servidor.cabecalhos = {'X-MBX-USED-WEIGHT-1M': '1500'}
+        assert await cliente.server_time() == 1
+        assert cliente.balde.usado == 1500
+        # O cabeçalho nunca reduz o que já foi reservado localmente
+        servidor.cabecalhos = {'X-MBX-USED-WEIGHT-1M': '3'}
+        await cliente.server_time()
+        assert cliente.balde.usado == 1501
+    com_cliente(teste)
+
+
+@pytest.mark.parametrize('status', [418, 429])
+def test_retry_after_bloqueia_o_cliente(status):
+    async def teste(servidor, cliente):
+        servidor.status = status
+        servidor.corpo = {'code': -1003, 'msg': 'Too many requests'}
+        servidor.cabecalhos = {'Retry-After': '7'}
+        with pytest.raises(ErroAPIBinance) as erro:
+            await cliente.server_time()
+        assert (erro.value.status_code, erro.value.code) == (status, -1003)
+        assert 6 < cliente.balde.bloqueado_ate - time.time() <= 7
+    com_cliente(teste)
+
+
+def test_erro_sem_json():
+    async def teste(servidor, cliente):
+        servidor.status = 502
+        servidor.texto = '<html>502 Bad Gateway</html>'
+        with pytest.raises(ErroAPIBinance) as erro:
+            await cliente.server_time()
+        assert (erro.value.status_code, erro.value.message) == (502, '<html>502 Bad Gateway</html>')
+        assert cliente.balde.bloqueado_ate == 0
+    com_cliente(teste)
+
+
+def test_erro_de_timestamp_avisa_os_callbacks():
+    async def teste(servidor, cliente):
+        avisos = []
+        cliente.ao_erro_timestamp.append(lambda: avisos.append(1))
+        servidor.status = 400
+        servidor.corpo = {'code': ERRO_TIMESTAMP, 'msg': 'Timestamp outside of recvWindow'}
+        with pytest.raises(ErroAPIBinance):
+            await cliente.requisicao('GET', '/fapi/v1/time', assinado=True)
+        assert avisos == [1]
+        assert 'signature' in servidor.pedidos[0] and 'timestamp' in servidor.pedidos[0]
+    com_cliente(teste)
+
+
+def test_timeout_vira_erro_de_transporte():
+    async def teste(servidor, cliente):
+        servidor.atraso = 1
+        with pytest.raises(ErroAPIBinance) as erro:
+            await cliente.server_time()
+        assert (erro.value.status_code, erro.value.code) == (0, ERRO_TRANSPORTE)
+    com_cliente(teste, timeout=0.2)
+
+
+def test_falha_de_conexao_vira_erro_de_transporte():
+    async def teste():
+        cliente = ClienteBinanceAsync('', '', base_url='http://127.0.0.1:9', timeout=1)
+        try:
+            with pytest.raises(ErroAPIBinance) as erro:
+                await cliente.server_time()
+        finally:
+            await cliente.fechar()
+        assert erro.value.code == ERRO_TRANSPORTE
+    asyncio.run(teste())
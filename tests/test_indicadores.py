@@ -0,0 +1,169 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicadores as ind
+
+# Tolerância: as versões vetorizadas só mudam a ordem das operações em ponto flutuante
+TOLERANCIA = 1e-9
+
+
+# ================= REFERÊNCIAS (LAÇOS) ================= #
+# Implementações diretas, candle a candle, do resultado pretendido. O
+# Heikin-Ashi é o do calcular_heikin_ashi antigo com a semente corrigida: o
+# primeiro candle também é convertido e o open parte de (open[0] + close[0]) / 2
+
+def ha_laco(o, h, l, c):
+    n = len(o)
+    ha_open, ha_high, ha_low, ha_close = [0.0] * n, [0.0] * n, [0.0] * n, [0.0] * n
+    for i in range(n):
+        ha_close[i] = (o[i] + h[i] + l[i] + c[i]) / 4
+        ha_open[i] = (o[0] + c[0]) / 2 if i == 0 else (ha_open[i - 1] + ha_close[i - 1]) / 2
+        ha_high[i] = max(h[i], ha_open[i], ha_close[i])
+        ha_low[i] = min(l[i], ha_open[i], ha_close[i])
+    return ha_open, ha_high, ha_low, ha_close
+
+
+def sma_laco(x, periodo):
+    return [sum(x[i - periodo + 1:i + 1]) / periodo if i >= periodo - 1 else math.nan for i in range(len(x))]
+
+
+def ema_laco(x, periodo):
+    alpha = 2 / (periodo + 1)
+    saida = []
+    for i, v in enumerate(x):
+        saida.append(v if i == 0 else saida[-1] + alpha * (v - saida[-1]))
+    return saida
+
+
+def atr_laco(h, l, c, periodo):
+    tr = [h[i] - l[i] if i == 0 else max(h[i] - l[i], abs(h[i] - c[i - 1]), abs(l[i] - c[i - 1]))
+          for i in range(len(h))]
+    saida = [math.nan] * len(tr)
+    for i in range(periodo - 1, len(tr)):
+        saida[i] = sum(tr[:periodo]) / periodo if i == periodo - 1 else saida[i - 1] + (tr[i] - saida[i - 1]) / periodo
+    return saida
+
+
+def rsi_laco(c, periodo):
+    saida = [math.nan] * len(c)
+    if len(c) <= periodo:
+        return saida
+    delta = [c[i] - c[i - 1] for i in range(1, len(c))]
+    ganho = sum(max(d, 0) for d in delta[:periodo]) / periodo
+    perda = sum(max(-d, 0) for d in delta[:periodo]) / periodo
+    for i in range(periodo, len(c)):
+        if i > periodo:
+            d = delta[i - 1]
+            ganho += (max(d, 0) - ganho) / periodo
+            perda += (max(-d, 0) - perda) / periodo
+        saida[i] = 100.0 if perda == 0 else 100 - 100 / (1 + ganho / perda)
+    return saida
+
+
+# ================= SÉRIES ================= #
+
+def candles_aleatorios(n, semente):
+    rng = np.random.default_rng(semente)
+    c = 3000 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    o = np.concatenate(([3000.0], c[:-1])) if n else c.copy()
+    pavio = np.abs(rng.normal(0, 0.002, (2, n))) * c
+    return o, np.maximum(o, c) + pavio[0], np.minimum(o, c) - pavio[1], c
+
+
+def candles_constantes(n, preco=100.0):
+    x = np.full(n, preco)
+    return x, x.copy(), x.copy(), x.copy()
+
+
+SERIES = [
+    pytest.param(candles_aleatorios(500, 1), id='aleatoria-500'),
+    pytest.param(candles_aleatorios(37, 2), id='aleatoria-37'),
+    pytest.param(candles_aleatorios(0, 3), id='vazia'),
+    pytest.param(candles_aleatorios(1, 4), id='um-candle'),
+    pytest.param(candles_aleatorios(2, 5), id='dois-candles'),
+    pytest.param(candles_constantes(50), id='constante'),
+    pytest.param(candles_constantes(1), id='constante-1'),
+]
+
+
+def iguais(obtido, esperado):
+    np.testing.assert_allclose(np.asarray(obtido, dtype=np.float64), np.asarray(esperado, dtype=np.float64),
+                               rtol=TOLERANCIA, atol=TOLERANCIA, equal_nan=True)
+
+
+# ================= TESTES ================= #
+
+@pytest.mark.parametrize('serie', SERIES)
+def test_heikin_ashi_igual_ao_laco(serie):
+    o, h, l, c = serie
+    for obtido, esperado in zip(ind.heikin_ashi(o, h, l, c), ha_laco(o.tolist(), h.tolist(), l.tolist(), c.tolist())):
+        assert len(obtido) == len(o)
+        iguais(obtido, esperado)
+
+
+@pytest.mark.parametrize('serie', SERIES)
+def test_heikin_ashi_incremental_igual_ao_vetorizado(serie):
+    o, h, l, c = serie
+    if len(o) < 2:
+        pytest.skip("a atualização parte de um candle anterior")
+    ha_open, ha_high, ha_low, ha_close = ind.heikin_ashi(o, h, l, c)
+    anterior = (ha_open[0], ha_close[0])
+    for i in range(1, len(o)):
+        atual = ind.heikin_ashi_atualizar(*anterior, o[i], h[i], l[i], c[i])
+        iguais(atual, (ha_open[i], ha_high[i], ha_low[i], ha_close[i]))
+        anterior = (atual[0], atual[3])
+
+
+def test_heikin_ashi_constante():
+    # Preço parado: todos os candles HA ficam no próprio preço
+    for valores in ind.heikin_ashi(*candles_constantes(20)):
+        iguais(valores, np.full(20, 100.0))
+
+
+@pytest.mark.parametrize('serie', SERIES)
+@pytest.mark.parametrize('periodo', [1, 2, 14, 200])
+def test_sma(serie, periodo):
+    c = serie[3]
+    iguais(ind.sma(c, periodo), sma_laco(c.tolist(), periodo))
+    iguais(ind.sma_ultimo(c, periodo), pd.Series(c, dtype=np.float64).rolling(window=periodo).mean().iloc[-1]
+           if len(c) else math.nan)
+
+    rolante = ind.SMARolante(periodo)
+    iguais([rolante.atualizar(v) for v in c.tolist()], sma_laco(c.tolist(), periodo))
+
+
+@pytest.mark.parametrize('serie', SERIES)
+@pytest.mark.parametrize('periodo', [2, 9, 50])
+def test_ema(serie, periodo):
+    c = serie[3]
+    esperado = ema_laco(c.tolist(), periodo)
+    obtido = ind.ema(c, periodo)
+    iguais(obtido, esperado)
+    for i in range(1, len(c)):
+        iguais(ind.ema_atualizar(obtido[i - 1], c[i], periodo), esperado[i])
+
+
+@pytest.mark.parametrize('serie', SERIES)
+@pytest.mark.parametrize('periodo', [1, 14])
+def test_atr(serie, periodo):
+    o, h, l, c = serie
+    esperado = atr_laco(h.tolist(), l.tolist(), c.tolist(), periodo)
+    obtido = ind.atr(h, l, c, periodo)
+    iguais(obtido, esperado)
+    for i in range(periodo, len(c)):
+        iguais(ind.atr_atualizar(obtido[i - 1], h[i], l[i], c[i], c[i - 1], periodo), esperado[i])
+
+
+@pytest.mark.parametrize('serie', SERIES)
+@pytest.mark.parametrize('periodo', [2, 14])
+def test_rsi(serie, periodo):
+    c = serie[3]
+    iguais(ind.rsi(c, periodo), rsi_laco(c.tolist(), periodo))
+
+
+def test_rsi_constante():
+    # Sem perdas o RSI satura em 100 (sem divisão por zero)
+    iguais(ind.rsi(np.full(30, 100.0), 14)[14:], np.full(16, 100.0))
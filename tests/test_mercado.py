@@ -0,0 +1,144 @@
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+from websockets.asyncio.server import serve
+
+from candles import BufferCandles, intervalo_em_ms
+from mercado import StreamMercado
+
+MINUTO = intervalo_em_ms('1m')
+
+
+# Servidor websocket local no lugar do fstream da Binance: registra o caminho
+# de cada conexão (os streams assinados) e envia as mensagens pedidas pelo teste
+class ServidorFalso:
+    def __init__(self):
+        self.caminhos = []
+        self.conexoes = []
+        self.loop = asyncio.new_event_loop()
+        self._pronto = threading.Event()
+        threading.Thread(target=self._executar, daemon=True).start()
+        self._pronto.wait(5)
+
+    def _executar(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._iniciar())
+        self.loop.run_forever()
+
+    async def _iniciar(self):
+        self.servidor = await serve(self._conexao, '127.0.0.1', 0)
+        self.url = f"ws://127.0.0.1:{self.servidor.sockets[0].getsockname()[1]}"
+        self._pronto.set()
+
+    async def _conexao(self, ws):
+        self.caminhos.append(ws.request.path)
+        self.conexoes.append(ws)
+        await ws.wait_closed()
+
+    def _executar_no_loop(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    def enviar(self, dados, stream=None):
+        self._executar_no_loop(self.conexoes[-1].send(json.dumps({'stream': stream, 'data': dados})))
+
+    def derrubar(self):
+        self._executar_no_loop(self.conexoes[-1].close())
+
+    def fechar(self):
+        self.servidor.close()
+        self._executar_no_loop(self.servidor.wait_closed())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def esperar(condicao, timeout=5):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if condicao():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def kline(t, preco, fechado=False, interval='1m'):
+    return {'e': 'kline', 's': 'ETHUSDT', 'E': t, 'k': {
+        't': t, 'T': t + MINUTO - 1, 'i': interval, 'o': str(preco), 'h': str(preco + 1), 'l': str(preco - 1), 'c': str(preco),
+        'v': '1', 'x': fechado}}
+
+
+@pytest.fixture
+def servidor():
+    s = ServidorFalso()
+    yield s
+    s.fechar()
+
+
+# Pedido depois do servidor: o pytest encerra o stream antes de fechar o servidor
+@pytest.fixture
+def stream(servidor):
+    s = StreamMercado(['ETHUSDT'], '1m', base_url=servidor.url)
+    s.iniciar()
+    assert s.conectado.wait(5) and esperar(lambda: servidor.conexoes)
+    yield s
+    s.parar()
+    esperar(lambda: not s.conectado.is_set())
+
+
+def test_assina_os_streams_e_recebe_preco(servidor, stream):
+    assert servidor.caminhos == ['/stream?streams=ethusdt@markPrice@1s/ethusdt@bookTicker/ethusdt@kline_1m']
+    servidor.enviar({'e': 'bookTicker', 's': 'ETHUSDT', 'b': '100', 'a': '102'})
+    assert esperar(lambda: stream.preco('ETHUSDT') == 101.0)
+    assert stream.book['ETHUSDT'] == (100.0, 102.0)
+
+
+def test_reconecta_depois_de_queda(servidor, stream):
+    servidor.derrubar()
+    assert esperar(lambda: len(servidor.caminhos) == 2 and stream.conectado.is_set())
+    assert servidor.caminhos[1] == servidor.caminhos[0]
+    servidor.enviar({'e': 'markPriceUpdate', 's': 'ETHUSDT', 'p': '123.5'})
+    assert esperar(lambda: stream.preco('ETHUSDT') == 123.5)
+
+
+def test_reassina_ao_mudar_simbolos_e_intervalo(servidor, stream):
+    stream.atualizar(['ETHUSDT', 'btcusdt'], '5m')
+    assert esperar(lambda: len(servidor.caminhos) == 2 and stream.conectado.is_set())
+    assert servidor.caminhos[1] == ('/stream?streams=ethusdt@markPrice@1s/ethusdt@bookTicker/ethusdt@kline_5m/'
+                                    'btcusdt@markPrice@1s/btcusdt@bookTicker/btcusdt@kline_5m')
+    # Mesma assinatura: não reconecta
+    stream.atualizar(['ETHUSDT', 'BTCUSDT'], '5m')
+    time.sleep(0.2)
+    assert len(servidor.caminhos) == 2
+
+
+def test_buraco_depois_da_reconexao_pede_nova_semeadura(servidor, stream):
+    # O buffer alimentado pelo stream, como no bot (ao_kline)
+    inicio = 1_700_000_040_000
+    buffer = BufferCandles('1m', 10)
+    buffer.semear([[inicio + i * MINUTO, 100, 101, 99, 100, 1] for i in range(5)])
+    stream.ao_kline.append(lambda symbol, k, fechado: buffer.atualizar(k))
+
+    servidor.enviar(kline(inicio + 5 * MINUTO, 100))
+    assert esperar(lambda: buffer.tamanho == 6)
+    assert not buffer.precisa_semear
+
+    # Queda com candles perdidos: o primeiro candle depois da reconexão deixa um buraco
+    servidor.derrubar()
+    assert esperar(lambda: len(servidor.caminhos) == 2 and stream.conectado.is_set())
+    servidor.enviar(kline(inicio + 8 * MINUTO, 100))
+    assert esperar(lambda: buffer.tamanho == 7)
+    assert buffer.precisa_semear
+
+
+def test_ignora_klines_de_outro_intervalo(servidor, stream):
+    # Depois de uma troca de intervalo, a conexão antiga ainda pode entregar
+    # klines do intervalo anterior enquanto fecha
+    recebidos = []
+    stream.ao_kline.append(lambda symbol, k, fechado: recebidos.append(k[0]))
+    inicio = 1_700_000_100_000
+    servidor.enviar(kline(inicio, 100, interval='5m'))
+    servidor.enviar(kline(inicio + MINUTO, 100))
+    assert esperar(lambda: recebidos)
+    time.sleep(0.1)
+    assert recebidos == [inicio + MINUTO]
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+import relogio
+from relogio import SincronizadorRelogio
+from cliente_async import ClienteBinanceAsync, ErroAPIBinance, ERRO_TIMESTAMP
+
+
+# Relógio local e servidor simulados: cada consulta segue o roteiro de
+# (ida_ms, volta_ms) e o servidor responde no meio do caminho, adiantado
+# `offset_ms` em relação ao relógio local
+class RelogioFalso:
+    def __init__(self, offset_ms, roteiro=()):
+        self.t = 1_700_000_000.0
+        self.offset_ms = offset_ms
+        self.roteiro = list(roteiro)
+
+    def agora(self):
+        return self.t
+
+    def consultar(self):
+        ida, volta = self.roteiro.pop(0) if self.roteiro else (10, 10)
+        self.t += ida / 1000
+        servidor = self.t * 1000 + self.offset_ms
+        self.t += volta / 1000
+        return servidor
+
+
+def sincronizador(relogio_falso, **kwargs):
+    return SincronizadorRelogio(relogio_falso.consultar, agora=relogio_falso.agora, **kwargs)
+
+
+def test_ida_e_volta_simetrica_da_o_offset_exato():
+    falso = RelogioFalso(offset_ms=-350.0, roteiro=[(20, 20)] * 4)
+    s = sincronizador(falso)
+    assert s.sincronizar(rajada=4)
+    assert s.offset_ms == pytest.approx(-350.0)
+    assert s.rtt_ms == pytest.approx(40.0)
+    assert s.agora_servidor_ms() == pytest.approx(falso.t * 1000 - 350.0)
+
+
+def test_estimativa_usa_as_amostras_de_menor_rtt():
+    # Ida e volta assimétricas deslocam o ponto médio em (ida - volta) / 2;
+    # só as rápidas e simétricas devem pesar
+    roteiro = [(5, 5)] * 4 + [(180, 20)] * 8 + [(1400, 100)]
+    falso = RelogioFalso(offset_ms=1200.0, roteiro=roteiro)
+    s = sincronizador(falso)
+    assert s.sincronizar(rajada=len(roteiro))
+    assert s.offset_ms == pytest.approx(1200.0)
+    # A amostra acima de RTT_MAXIMO_MS fica fora até da mediana do RTT
+    assert s.rtt_ms == pytest.approx(200.0)
+
+
+def test_sem_amostra_valida_mantem_o_offset():
+    falso = RelogioFalso(offset_ms=500.0, roteiro=[(10, 10)] * 2)
+    s = sincronizador(falso)
+    s.sincronizar(rajada=2)
+
+    falso.offset_ms = 9000.0
+    lenta = relogio.RTT_MAXIMO_MS
+    falso.roteiro = [(lenta, lenta)] * 3
+    assert not s.sincronizar(rajada=3, reiniciar=True)
+    assert s.offset_ms == pytest.approx(500.0)
+
+
+def test_salto_do_relogio_local_so_aparece_com_amostras_novas():
+    falso = RelogioFalso(offset_ms=0.0)
+    s = sincronizador(falso)
+    s.sincronizar(rajada=12)
+
+    # Relógio local atrasado 2 s de uma vez: poucas amostras novas não mudam
+    # a mediana das antigas, uma ressincronização do zero sim
+    falso.t -= 2
+    falso.offset_ms = 2000.0
+    s.sincronizar(rajada=4)
+    assert s.offset_ms == pytest.approx(0.0)
+    s.sincronizar(rajada=4, reiniciar=True)
+    assert s.offset_ms == pytest.approx(2000.0)
+
+
+# ================= RESSINCRONIZAÇÃO FORÇADA ================= #
+
+def test_erro_de_timestamp_forca_ressincronizacao():
+    falso = RelogioFalso(offset_ms=0.0)
+    s = sincronizador(falso, intervalo=3600)
+    s.sincronizar(rajada=12)
+    falso.offset_ms = -1500.0
+
+    atualizado = threading.Event()
+    s.ao_atualizar.append(lambda offset_ms, rtt_ms: atualizado.set())
+    s.iniciar()
+
+    # A Binance rejeita o timestamp; ligado como no bot, o cliente acorda o
+    # sincronizador, que descarta as amostras antigas
+    async def rejeitar(request):
+        return web.json_response({'code': ERRO_TIMESTAMP, 'msg': 'Timestamp outside of recvWindow'}, status=400)
+
+    async def requisitar():
+        app = web.Application()
+        app.router.add_get('/fapi/v1/order', rejeitar)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        cliente = ClienteBinanceAsync('chave', 'segredo', base_url=f"http://127.0.0.1:{porta}")
+        cliente.ao_erro_timestamp.append(s.forcar)
+        try:
+            with pytest.raises(ErroAPIBinance):
+                await cliente.consultar_ordem(symbol='ETHUSDT', orderId=1)
+        finally:
+            await cliente.fechar()
+            await runner.cleanup()
+
+    asyncio.run(requisitar())
+    assert atualizado.wait(5)
+    assert s.offset_ms == pytest.approx(-1500.0)
+    assert len(s.amostras) == relogio.RELOGIO_RAJADA
@@ -0,0 +1,231 @@
+import os
+import hmac
+import json
+import time
+import logging
+import traceback
+
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, g
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import config
+import registro
+import metricas
+from db import buscar_operacoes, contar_operacoes
+
+# Chave das sessões; definida uma vez por processo se não vier do .env
+# (com gunicorn, o master define uma só para todos os workers)
+SECRET_KEY = os.getenv('FLASK_SECRET_KEY') or os.urandom(24)
+# Operações exibidas por página na tabela do painel
+LIMITE_TABELA = 100
+# Token para o Prometheus ler /metrics sem sessão (Authorization: Bearer);
+# vazio exige o login do painel
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+# Pares oferecidos na configuração do painel, além dos já configurados
+SIMBOLOS_PAINEL = [s.strip().upper() for s in os.getenv(
+    'SIMBOLOS_PAINEL', 'BTCUSDT,ETHUSDT,BNBUSDT,SOLUSDT,ADAUSDT,XRPUSDT,DOGEUSDT,LTCUSDT,LINKUSDT,AVAXUSDT'
+).split(',') if s.strip()]
+
+
+def ler_log(linhas, nivel=None, desde=None, logger=None):
+    return registro.formatar(registro.consultar(linhas, nivel, desde, logger)) or "Sem logs disponíveis."
+
+
+def _nome_par(symbol):
+    return f"{symbol[:-4]}/{symbol[-4:]}" if symbol.endswith('USDT') else symbol
+
+
+def _instante(texto):
+    # Epoch em segundos ou "YYYY-MM-DD HH:MM:SS" (horário local)
+    if not texto:
+        return None
+    try:
+        return float(texto)
+    except ValueError:
+        return time.mktime(time.strptime(texto, "%Y-%m-%d %H:%M:%S"))
+
+
+# Painel web. `bot` é o módulo do motor de trading (bot-v1) ou, com o motor em
+# outro processo, o processo_motor.MotorRemoto: as rotas só leem o status
+# publicado por ele e repassam os comandos (fechamento, configuração).
+# O template é compilado uma vez pelo Jinja e reaproveitado em todas as requisições.
+def criar_app(bot):
+    app = Flask(__name__)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
+    app.secret_key = SECRET_KEY
+
+    @app.before_request
+    def iniciar_cronometro():
+        g.inicio = time.perf_counter()
+
+    @app.after_request
+    def registrar_duracao(resposta):
+        # Respostas em streaming (SSE) contam só até o início do envio
+        rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+        metricas.registrar('bot_http_segundos', rota, time.perf_counter() - g.inicio)
+        return resposta
+
+    @app.route('/')
+    def index():
+        if not session.get('autenticado'):
+            return render_template('index.html')
+        symbol = request.args.get('symbol', bot.SYMBOL)
+        log_content = ler_log(30)
+
+        pagina = request.args.get('pagina', 0, type=int)
+        operacoes = buscar_operacoes(limite=LIMITE_TABELA, offset=pagina * LIMITE_TABELA)
+
+        contexto = bot.montar_status(symbol)
+        contexto.update(bot.resumo_estatisticas())
+        contexto["log"] = log_content
+        contexto["operacoes"] = operacoes
+        contexto["pagina"] = pagina
+
+        simbolos = bot.SYMBOLS
+        contexto.update({
+            "symbol": symbol,
+            "symbols": simbolos,
+            "simbolos_disponiveis": [(s, _nome_par(s)) for s in dict.fromkeys(list(simbolos) + SIMBOLOS_PAINEL)],
+            "max_simbolos": config.MAX_SIMBOLOS,
+            "limite_tabela": LIMITE_TABELA,
+            "interval": bot.INTERVAL,
+            "profit_perc": bot.PROFIT_PERC,
+            "loss_perc": bot.LOSS_PERC,
+            "gale": ','.join(map(str, bot.GALE)),
+            "max_gale": bot.MAX_GALE,
+            "emergency_stop": bot.EMERGENCY_STOP_LOSSES,
+            "sobrescritas": json.dumps(bot.SOBRESCRITAS) if bot.SOBRESCRITAS else "",
+            "config_versao": bot.CONFIG_VERSAO
+        })
+
+        return render_template('index.html', **contexto)
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        password = request.form.get('password')
+        if password == os.getenv('BOT_PASSWORD', 'admin123'):  # Senha configurável via .env
+            session['autenticado'] = True
+            return redirect(url_for('index'))
+        return "Senha incorreta", 401
+
+    @app.route('/logout')
+    def logout():
+        session.pop('autenticado', None)
+        return redirect(url_for('index'))
+
+    @app.route('/forcar_fechamento', methods=['POST'])
+    def forcar_fechamento():
+        symbol = request.form.get('symbol', bot.SYMBOL)
+        try:
+            bot.forcar_fechamento(symbol)
+            return redirect(url_for('index', symbol=symbol))
+        except Exception:
+            logging.error("❌ Erro ao forçar fechamento:")
+            logging.error(traceback.format_exc())
+            return "Erro ao forçar fechamento", 500
+
+    @app.route('/atualizar_config', methods=['POST'])
+    def atualizar_config():
+        try:
+            mudancas = dict(
+                simbolos=[s.strip().upper() for s in request.form.getlist('symbols') if s.strip()],
+                interval=request.form.get('timeframe') or request.form.get('interval', bot.INTERVAL),
+                profit_perc=float(request.form.get('profit_perc', bot.PROFIT_PERC)),
+                loss_perc=float(request.form.get('loss_perc', bot.LOSS_PERC)),
+                gale=[float(x) for x in request.form.get('gale', ','.join(map(str, bot.GALE))).split(',')],
+                max_gale=int(request.form.get('max_gale', bot.MAX_GALE)),
+                emergency_stop_losses=int(request.form.get('emergency_stop', bot.EMERGENCY_STOP_LOSSES))
+            )
+            # Ajustes por símbolo em JSON; campo ausente mantém os atuais
+            texto = request.form.get('sobrescritas')
+            if texto is not None:
+                mudancas['sobrescritas'] = json.loads(texto) if texto.strip() else {}
+            # Validada aqui para responder ao painel (com o motor em outro
+            # processo o comando é assíncrono); o motor valida de novo ao publicar
+            config.montar(**{**mudancas, 'simbolos': mudancas['simbolos'] or bot.SYMBOLS})
+        except ValueError as e:
+            return f"Configuração inválida: {e}", 400
+        try:
+            bot.atualizar_config(**mudancas)
+            return redirect(url_for('index'))
+        except Exception as e:
+            logging.error(f"Erro ao atualizar configs: {e}")
+            return "Erro ao atualizar configurações", 500
+
+    @app.route('/status_json')
+    def status_json():
+        if not session.get('autenticado'):
+            return jsonify({"error": "Não autorizado"}), 401
+
+        symbol = request.args.get('symbol', bot.SYMBOL)
+        data = bot.montar_status(symbol)
+        data.update(bot.resumo_estatisticas())
+        return jsonify(data)
+
+    @app.route('/eventos')
+    def eventos():
+        if not session.get('autenticado'):
+            return jsonify({"error": "Não autorizado"}), 401
+
+        symbol = request.args.get('symbol', bot.SYMBOL)
+        publicador = bot.publicador
+        if not publicador.tem_canal(symbol):
+            publicador.publicar(symbol, bot.montar_status(symbol))
+            publicador.publicar(symbol, bot.resumo_estatisticas())
+        # Cada conexão só repassa mensagens já serializadas pelo publicador
+        return Response(publicador.assinar(symbol), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/operacoes')
+    def operacoes_json():
+        if not session.get('autenticado'):
+            return jsonify({"error": "Não autorizado"}), 401
+
+        filtros = {
+            "symbol": request.args.get('symbol'),
+            "inicio": request.args.get('inicio'),
+            "fim": request.args.get('fim'),
+            "resultado": request.args.get('resultado'),
+        }
+        pagina = request.args.get('pagina', 0, type=int)
+        limite = min(request.args.get('limite', LIMITE_TABELA, type=int), 1000)
+        colunas = ["id", "data", "preco_abertura", "preco_fechamento", "direcao", "quantidade", "resultado", "roi", "lucro_usdt", "symbol"]
+        linhas = buscar_operacoes(limite=limite, offset=pagina * limite, **filtros)
+        return jsonify({
+            "total": contar_operacoes(**filtros),
+            "pagina": pagina,
+            "operacoes": [dict(zip(colunas, linha)) for linha in linhas]
+        })
+
+    @app.route('/logs')
+    def logs():
+        if not session.get('autenticado'):
+            return "Acesso não autorizado", 401
+        # Custo proporcional às linhas devolvidas: buffer em memória no processo do
+        # motor, leitura do arquivo a partir do fim nos workers
+        limite = min(request.args.get('limite', 50, type=int), registro.LOG_MEMORIA)
+        try:
+            registros = registro.consultar(limite, request.args.get('nivel'),
+                                           _instante(request.args.get('desde')), request.args.get('logger'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if request.args.get('formato') == 'json':
+            return jsonify(registros)
+        return registro.formatar(registros) or "Sem logs disponíveis."
+
+    def _token_metricas():
+        cabecalho = request.headers.get('Authorization', '')
+        return bool(METRICAS_TOKEN) and hmac.compare_digest(cabecalho.encode(), f"Bearer {METRICAS_TOKEN}".encode())
+
+    @app.route('/metrics')
+    def metrics():
+        # Formato Prometheus: as requisições deste processo web e, com o motor
+        # em outro processo, o último arquivo de métricas gravado por ele
+        if not session.get('autenticado') and not _token_metricas():
+            return Response("Não autorizado", status=401, headers={'WWW-Authenticate': 'Bearer'})
+        texto = metricas.exportar()
+        if hasattr(bot, 'metricas_motor'):
+            texto += bot.metricas_motor()
+        return Response(texto, mimetype='text/plain; version=0.0.4')
+
+    return app
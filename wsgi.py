@@ -0,0 +1,14 @@
+import importlib
+
+import processo_motor
+from web import criar_app
+
+if processo_motor.processo:
+    # Motor em processo próprio, iniciado pelo master do gunicorn (gunicorn.conf.py)
+    app = criar_app(processo_motor.remoto())
+else:
+    # Fora do gunicorn: motor numa thread deste processo. bot-v1.py não é
+    # importável pelo nome com hífen
+    bot = importlib.import_module('bot-v1')
+    bot.iniciar_motor()
+    app = criar_app(bot)